@@ -7,27 +7,19 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import logging
 
+from utils.gcp_clients import get_firestore_client as get_shared_firestore_client
+
 # Import native Firestore client
 try:
     from google.cloud import firestore
     import os
-    import subprocess
     
     # Ensure we're using the correct project
     os.environ['GOOGLE_CLOUD_PROJECT'] = 'agentiqware-prod'
     
-    # Try to ensure application default credentials are available
-    try:
-        result = subprocess.run(['gcloud', 'auth', 'application-default', 'print-access-token'], 
-                              capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            logging.info("Application default credentials are available")
-        else:
-            logging.warning("Application default credentials may not be available")
-    except Exception as e:
-        logging.warning(f"Could not check application default credentials: {e}")
-    
-    # Initialize client as None, will be created when needed
+    # Initialize client as None, will be created when needed. Credentials are
+    # resolved then too: shelling out to gcloud here cost every cold start
+    # up to 5 seconds.
     db = None
     logging.info("Firestore module imported, client will be initialized on demand")
     
@@ -51,7 +43,7 @@ def get_firestore_client():
             logger.info(f"GOOGLE_CLOUD_PROJECT: {os.environ.get('GOOGLE_CLOUD_PROJECT', 'Not set')}")
             
             # Simple direct initialization like our test script
-            db = firestore.Client(project='agentiqware-prod')
+            db = get_shared_firestore_client(project='agentiqware-prod')
             print(f"[DEBUG] Firestore client created successfully")
             logger.info("Firestore client created successfully")
             
@@ -131,7 +123,8 @@ async def get_components():
         os.chdir(project_root)
         print(f"[DEBUG] Working from project root: {os.getcwd()}")
         
-        direct_db = firestore.Client(project='agentiqware-prod')
+        # Shared process-wide client; only the first request pays for creating it
+        direct_db = get_shared_firestore_client(project='agentiqware-prod')
         print(f"[DEBUG] Firestore connection successful")
         
         # Restore working directory
@@ -23,6 +23,12 @@ class FlowResponse(BaseModel):
     definition: dict
     created_at: datetime
     updated_at: datetime
+    validation: Optional[dict] = None
+
+def validate_definition(definition: dict) -> dict:
+    """Validation report for a flow definition; saving doesn't require a valid flow"""
+    from services.flow_engine import validate_flow_definition
+    return validate_flow_definition(definition).to_dict()
 
 @router.get("/", response_model=List[FlowResponse])
 async def get_flows(token: str = Depends(security)):
@@ -40,9 +46,15 @@ async def create_flow(flow: FlowCreate, token: str = Depends(security)):
         description=flow.description,
         definition=flow.definition,
         created_at=datetime.now(),
-        updated_at=datetime.now()
+        updated_at=datetime.now(),
+        validation=validate_definition(flow.definition)
     )
 
+@router.post("/validate")
+async def validate_flow(flow: FlowCreate, token: str = Depends(security)):
+    """Check a flow definition before saving or running it"""
+    return validate_definition(flow.definition)
+
 @router.get("/{flow_id}", response_model=FlowResponse)
 async def get_flow(flow_id: str, token: str = Depends(security)):
     """Get a specific flow"""
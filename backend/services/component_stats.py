@@ -0,0 +1,147 @@
+# =====================================
+# Component Timing Statistics
+# =====================================
+#
+# Historical run times per component type, used to estimate how long a flow
+# will take before it runs. Each finished execution adds its traced node
+# timings to one Firestore document per type with server-side increments,
+# so instances never read before they write. Reads are cached in-process.
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from utils.startup import timed_import
+
+@dataclass
+class TimingStats:
+    """Run time totals of one component type, in milliseconds"""
+    count: int = 0
+    total_ms: float = 0.0
+    total_sq_ms: float = 0.0
+    max_ms: float = 0.0
+    
+    @property
+    def mean_ms(self) -> Optional[float]:
+        return self.total_ms / self.count if self.count else None
+    
+    @property
+    def stddev_ms(self) -> Optional[float]:
+        if not self.count:
+            return None
+        variance = self.total_sq_ms / self.count - (self.total_ms / self.count) ** 2
+        return max(variance, 0.0) ** 0.5
+    
+    def add(self, run_ms: float):
+        self.count += 1
+        self.total_ms += run_ms
+        self.total_sq_ms += run_ms * run_ms
+        self.max_ms = max(self.max_ms, run_ms)
+    
+    def merge(self, other: 'TimingStats'):
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.total_sq_ms += other.total_sq_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'total_sq_ms': self.total_sq_ms,
+            'max_ms': self.max_ms
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TimingStats':
+        return cls(
+            count=int(data.get('count', 0)),
+            total_ms=float(data.get('total_ms', 0.0)),
+            total_sq_ms=float(data.get('total_sq_ms', 0.0)),
+            max_ms=float(data.get('max_ms', 0.0))
+        )
+
+def summarize_timings(history: Iterable[Dict[str, Any]]) -> Dict[str, TimingStats]:
+    """Per-type totals of the traced nodes in an execution history"""
+    stats: Dict[str, TimingStats] = {}
+    for entry in history:
+        run_ms = (entry.get('timing') or {}).get('run_ms')
+        if run_ms is None or entry.get('cache_hit') or entry.get('node_type') is None:
+            continue
+        stats.setdefault(entry['node_type'], TimingStats()).add(run_ms)
+    return stats
+
+class ComponentStatsStore:
+    """component_stats/{node_type} documents, with a read cache
+    
+    client_factory is called per operation, so a swapped Firestore client
+    (emulator, test double) is picked up.
+    """
+    
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        collection: str = 'component_stats',
+        ttl_seconds: float = 300
+    ):
+        self.client_factory = client_factory
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._cache: Dict[str, Tuple[float, TimingStats]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, samples: Dict[str, TimingStats]):
+        """Add an execution's per-type totals"""
+        if not samples:
+            return
+        
+        firestore = timed_import('google.cloud.firestore')
+        client = self.client_factory()
+        batch = client.batch()
+        for node_type, stats in samples.items():
+            batch.set(client.collection(self.collection).document(node_type), {
+                'node_type': node_type,
+                'count': firestore.Increment(stats.count),
+                'total_ms': firestore.Increment(stats.total_ms),
+                'total_sq_ms': firestore.Increment(stats.total_sq_ms),
+                'max_ms': firestore.Maximum(stats.max_ms)
+            }, merge=True)
+        batch.commit()
+        
+        # Cached totals stay approximately current without a re-read
+        with self._lock:
+            for node_type, stats in samples.items():
+                cached = self._cache.get(node_type)
+                if cached is not None:
+                    cached[1].merge(stats)
+    
+    def load(self, node_types: Iterable[str]) -> Dict[str, TimingStats]:
+        """Totals per type; types never recorded are missing from the result"""
+        now = time.monotonic()
+        result = {}
+        missing: List[str] = []
+        with self._lock:
+            for node_type in set(node_types):
+                cached = self._cache.get(node_type)
+                if cached is not None and now - cached[0] <= self.ttl_seconds:
+                    if cached[1].count:
+                        result[node_type] = cached[1]
+                else:
+                    missing.append(node_type)
+        
+        if missing:
+            collection = self.client_factory().collection(self.collection)
+            for node_type in missing:
+                snapshot = collection.document(node_type).get()
+                stats = TimingStats.from_dict(snapshot.to_dict() or {}) if snapshot.exists else TimingStats()
+                with self._lock:
+                    self._cache[node_type] = (now, stats)
+                if stats.count:
+                    result[node_type] = stats
+        
+        return result
+    
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
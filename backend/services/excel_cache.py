@@ -0,0 +1,333 @@
+# =====================================
+# Excel Parquet Cache
+# =====================================
+#
+# The same workbooks are read by many flows, many times a day. The first
+# read of a (source version, sheet) converts the whole sheet once (streamed
+# into the file chunk by chunk where the engine allows) and keeps a
+# Parquet copy in a local directory; later reads memory-map that copy and
+# take only the columns and rows they asked for. A source version is a
+# local file's path, size and mtime or a GCS object's generation, so an
+# edited workbook gets a new entry and the stale one ages out of the
+# size-capped, least-recently-used store.
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+import pandas as pd
+
+from services.excel_reader import (
+    ASSEMBLE_CHUNK_ROWS, ExcelChunks, ExcelReadOptions, iter_excel_chunks, read_excel, resolve_engine
+)
+
+# Bump to invalidate every stored entry when the key or file layout changes
+EXCEL_CACHE_FORMAT_VERSION = 1
+
+def local_identity(path: str) -> Tuple[Any, ...]:
+    """Version of a local workbook: absolute path, size and mtime"""
+    stat = os.stat(path)
+    return ('file', os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+def gcs_identity(url: str, generation: Any) -> Tuple[Any, ...]:
+    """Version of a GCS workbook: its URL and object generation"""
+    return ('gcs', url, str(generation))
+
+def select_rows(frame: pd.DataFrame, options: ExcelReadOptions) -> pd.DataFrame:
+    """Apply the options' columns, row window and dtypes to a whole sheet"""
+    if options.columns:
+        missing = [column for column in options.columns if column not in frame.columns]
+        if missing:
+            raise ValueError(f"Columns not in sheet {options.sheet_name!r}: {', '.join(missing)}")
+        frame = frame[options.columns]
+    stop = None if options.max_rows is None else options.skip_rows + options.max_rows
+    frame = frame.iloc[options.skip_rows:stop].reset_index(drop=True)
+    hints = {column: dtype for column, dtype in options.dtypes.items() if column in frame.columns}
+    return frame.astype(hints) if hints else frame
+
+def write_parquet_chunks(chunks: Iterable[pd.DataFrame], staging_path: str) -> bool:
+    """Write DataFrames into one Parquet file, a row group each; False if Parquet cannot hold them
+    
+    The first chunk fixes the schema. Headers that aren't text, columns
+    mixing numbers and text, and later chunks that don't fit the schema
+    leave no file behind.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    writer = None
+    written = False
+    try:
+        for chunk in chunks:
+            if writer is None:
+                if not all(isinstance(column, str) for column in chunk.columns):
+                    return False
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(staging_path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+        written = writer is not None
+    except (pa.ArrowException, TypeError, ValueError):
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+        if not written and os.path.exists(staging_path):
+            os.remove(staging_path)
+    return written
+
+def convert_to_parquet(
+    source: Union[str, bytes],
+    options: ExcelReadOptions,
+    staging_path: str,
+    select: bool = True
+) -> Tuple[Optional[pd.DataFrame], bool]:
+    """Convert a whole sheet into a Parquet file; runs in the CPU pool
+    
+    openpyxl reads stream the sheet into the file ASSEMBLE_CHUNK_ROWS rows
+    at a time, so it is never in memory whole; other engines parse it in
+    one go. Returns the options' selection (when select is set) and whether
+    the Parquet file was written.
+    """
+    whole_sheet = ExcelReadOptions(
+        sheet_name=options.sheet_name,
+        header_row=options.header_row,
+        engine=options.engine
+    )
+    
+    if resolve_engine(source, options.engine) == 'openpyxl':
+        written = write_parquet_chunks(iter_excel_chunks(source, whole_sheet, ASSEMBLE_CHUNK_ROWS), staging_path)
+        if not select:
+            return None, written
+        return (read_parquet(staging_path, options) if written else read_excel(source, options)), written
+    
+    frame = read_excel(source, whole_sheet)
+    written = write_parquet_chunks([frame], staging_path)
+    return (select_rows(frame, options) if select else None), written
+
+def _parquet_file(path: str, options: ExcelReadOptions):
+    import pyarrow.parquet as pq
+    
+    parquet = pq.ParquetFile(path, memory_map=True)
+    if options.columns:
+        names = set(parquet.schema_arrow.names)
+        missing = [column for column in options.columns if column not in names]
+        if missing:
+            raise ValueError(f"Columns not in sheet {options.sheet_name!r}: {', '.join(missing)}")
+    return parquet
+
+def _to_frame(table: Any, options: ExcelReadOptions) -> pd.DataFrame:
+    frame = table.to_pandas()
+    hints = {column: dtype for column, dtype in options.dtypes.items() if column in frame.columns}
+    return frame.astype(hints) if hints else frame
+
+def read_parquet(path: str, options: ExcelReadOptions) -> pd.DataFrame:
+    """Read the options' columns and row window from a cached sheet"""
+    parquet = _parquet_file(path, options)
+    table = parquet.read(columns=options.columns)
+    return _to_frame(table.slice(options.skip_rows, options.max_rows), options)
+
+def iter_parquet_chunks(path: str, options: ExcelReadOptions, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream a cached sheet as chunk_size-row DataFrames, decoding one batch at a time"""
+    import pyarrow as pa
+    
+    parquet = _parquet_file(path, options)
+    skip = options.skip_rows
+    remaining = options.max_rows
+    pending = []
+    pending_rows = 0
+    
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=options.columns):
+        if skip:
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            batch = batch.slice(skip)
+            skip = 0
+        if remaining is not None:
+            batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+        
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield _to_frame(table.slice(0, chunk_size), options)
+            pending = table.slice(chunk_size).to_batches()
+            pending_rows -= chunk_size
+        
+        if remaining == 0:
+            break
+    
+    if pending_rows:
+        yield _to_frame(pa.Table.from_batches(pending), options)
+
+class CachedExcelChunks(ExcelChunks):
+    """Streamed chunks of a sheet read from its Parquet copy
+    
+    If the copy has been evicted by the time the chunks are iterated, the
+    workbook it came from is streamed instead when a local path is known.
+    """
+    
+    def __init__(self, parquet_path: str, source: Optional[str], options: ExcelReadOptions, chunk_size: int):
+        self.parquet_path = parquet_path
+        self.source = source
+        self.options = options
+        self.chunk_size = chunk_size
+        stat = os.stat(parquet_path)
+        self.file_stat = (stat.st_size, stat.st_mtime_ns)
+    
+    def _available(self) -> bool:
+        if os.path.exists(self.parquet_path):
+            return True
+        if self.source is None:
+            raise FileNotFoundError(f"Cached sheet {self.parquet_path} was evicted before it was read")
+        return False
+    
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if self._available():
+            return iter_parquet_chunks(self.parquet_path, self.options, self.chunk_size)
+        return super().__iter__()
+    
+    def read_all(self) -> pd.DataFrame:
+        if self._available():
+            return read_parquet(self.parquet_path, self.options)
+        return super().read_all()
+    
+    def __repr__(self) -> str:
+        return f"CachedExcelChunks({self.parquet_path!r}, chunk_size={self.chunk_size})"
+
+class ExcelParquetCache:
+    """Local, size-capped LRU store of sheets converted to Parquet"""
+    
+    def __init__(self, directory: str, max_bytes: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, int]] = None
+        self._total_bytes = 0
+        
+        # Sheets Parquet cannot hold, so they are not converted on every read
+        self._uncacheable: set = set()
+    
+    @staticmethod
+    def key(identity: Tuple[Any, ...], options: ExcelReadOptions) -> str:
+        """Entry of a source version's sheet; columns and rows are selected at read time"""
+        payload = json.dumps(
+            [EXCEL_CACHE_FORMAT_VERSION, list(identity), options.sheet_name, options.header_row],
+            default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.parquet")
+    
+    def _index(self) -> Dict[str, int]:
+        """Entry sizes in least-recently-used order, read from disk once"""
+        if self._entries is None:
+            os.makedirs(self.directory, exist_ok=True)
+            found = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith('.parquet'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime_ns, entry.name[:-8], stat.st_size))
+            found.sort()
+            self._entries = {key: size for _, key, size in found}
+            self._total_bytes = sum(self._entries.values())
+        return self._entries
+    
+    def cacheable(self, key: str) -> bool:
+        return key not in self._uncacheable
+    
+    def lookup(self, key: str) -> Optional[str]:
+        """Path of an entry's Parquet file, marked recently used, or None (blocking)"""
+        with self._lock:
+            entries = self._index()
+            if key not in entries:
+                self.misses += 1
+                return None
+            
+            path = self._path(key)
+            try:
+                os.utime(path)
+            except OSError:
+                # Evicted by another process
+                self._total_bytes -= entries.pop(key)
+                self.misses += 1
+                return None
+            
+            entries[key] = entries.pop(key)
+            self.hits += 1
+            return path
+    
+    def staging_path(self, key: str) -> str:
+        """Where a conversion writes before add() moves it into place"""
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.tmp")
+    
+    def add(self, key: str, staging_path: str, written: bool) -> Optional[str]:
+        """Move a converted sheet into place, evicting old entries over the cap (blocking)
+        
+        written=False records that the sheet cannot be cached.
+        """
+        if not written:
+            with self._lock:
+                self._uncacheable.add(key)
+            return None
+        
+        with self._lock:
+            entries = self._index()
+            path = self._path(key)
+            os.replace(staging_path, path)
+            
+            self._total_bytes -= entries.pop(key, 0)
+            entries[key] = os.path.getsize(path)
+            self._total_bytes += entries[key]
+            
+            while self.max_bytes and self._total_bytes > self.max_bytes and len(entries) > 1:
+                oldest = next(iter(entries))
+                self._total_bytes -= entries.pop(oldest)
+                try:
+                    os.remove(self._path(oldest))
+                except OSError:
+                    pass
+            
+            return path
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            for key in list(self._index()):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries = {}
+            self._total_bytes = 0
+            self._uncacheable.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and size counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries or {}),
+            'bytes': self._total_bytes
+        }
+
+_excel_cache: Optional[ExcelParquetCache] = None
+_excel_cache_lock = threading.Lock()
+
+def get_excel_cache(directory: str, max_bytes: int) -> ExcelParquetCache:
+    """Get the process-wide Parquet cache; its location comes from the first caller"""
+    global _excel_cache
+    with _excel_cache_lock:
+        if _excel_cache is None:
+            _excel_cache = ExcelParquetCache(directory, max_bytes)
+        return _excel_cache
@@ -0,0 +1,183 @@
+# =====================================
+# Excel Reader
+# =====================================
+#
+# Workbooks are read with openpyxl in read-only mode, which streams rows out
+# of the sheet XML instead of building the whole workbook in memory. Only
+# the requested columns and row window become DataFrame data, and streaming
+# mode hands the sheet out as fixed-size DataFrame chunks that a foreach
+# node consumes one at a time. When python-calamine is installed, whole
+# sheets go through pandas' much faster calamine engine instead.
+
+import importlib.util
+import io
+import itertools
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+import pandas as pd
+
+# Rows per DataFrame when a whole sheet is assembled from streamed chunks
+ASSEMBLE_CHUNK_ROWS = 65536
+
+@dataclass
+class ExcelReadOptions:
+    """What to read from a sheet"""
+    sheet_name: Any = 0
+    
+    # Header names to keep, in this order (None keeps every column)
+    columns: Optional[List[str]] = None
+    
+    # 1-based row holding the column names; 0 means the sheet has none
+    header_row: int = 1
+    
+    # Data rows to skip after the header, and the most to read after that
+    skip_rows: int = 0
+    max_rows: Optional[int] = None
+    
+    dtypes: Dict[str, str] = field(default_factory=dict)
+    
+    # 'auto', 'openpyxl' (read-only streaming), 'calamine' or another pandas engine
+    engine: str = 'auto'
+
+def parse_columns(value: Any) -> Optional[List[str]]:
+    """Column list from a list or comma-separated text; empty means all columns"""
+    if isinstance(value, str):
+        value = [column.strip() for column in value.split(',')]
+    columns = [str(column) for column in (value or []) if str(column)]
+    return columns or None
+
+def parse_dtypes(value: Any) -> Dict[str, str]:
+    """dtype hints from a dict or 'column:dtype, column:dtype' text"""
+    if isinstance(value, dict):
+        return {str(column): str(dtype) for column, dtype in value.items()}
+    dtypes = {}
+    for pair in (value or '').split(','):
+        if ':' in pair:
+            column, dtype = pair.rsplit(':', 1)
+            dtypes[column.strip()] = dtype.strip()
+    return dtypes
+
+def _is_xlsx(source: Union[str, bytes]) -> bool:
+    """Office Open XML workbooks are zip files; .xls and .ods need other readers"""
+    if isinstance(source, bytes):
+        return source[:2] == b'PK'
+    return os.path.splitext(source)[1].lower() in ('.xlsx', '.xlsm', '.xltx', '.xltm')
+
+def resolve_engine(source: Union[str, bytes], engine: str = 'auto') -> Optional[str]:
+    """Engine for a source: calamine when installed, else openpyxl streaming for xlsx, else pandas' default"""
+    if engine and engine != 'auto':
+        return engine
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    return 'openpyxl' if _is_xlsx(source) else None
+
+def _open(source: Union[str, bytes]):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+def _frame(rows: List[tuple], names: List[Any], dtypes: Dict[str, str]) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows, columns=names)
+    hints = {column: dtype for column, dtype in dtypes.items() if column in frame.columns}
+    return frame.astype(hints) if hints else frame
+
+def iter_excel_chunks(source: Union[str, bytes], options: ExcelReadOptions, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream a sheet as chunk_size-row DataFrames with openpyxl in read-only mode
+    
+    Rows that are entirely blank are skipped, as pandas does.
+    """
+    import openpyxl
+    
+    workbook = openpyxl.load_workbook(_open(source), read_only=True, data_only=True)
+    try:
+        sheet_name = options.sheet_name
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        
+        if options.header_row:
+            header = next(itertools.islice(rows, options.header_row - 1, None), ())
+            names = [f"Unnamed: {index}" if name is None else name for index, name in enumerate(header)]
+        else:
+            names = None
+        
+        positions = None
+        if options.columns:
+            if names is None:
+                raise ValueError("Selecting columns by name needs a header row")
+            lookup = {str(name): index for index, name in enumerate(names)}
+            missing = [column for column in options.columns if column not in lookup]
+            if missing:
+                raise ValueError(f"Columns not in sheet {sheet_name!r}: {', '.join(missing)}")
+            positions = [lookup[column] for column in options.columns]
+            names = [names[position] for position in positions]
+        
+        rows = (row for row in rows if any(value is not None for value in row))
+        stop = None if options.max_rows is None else options.skip_rows + options.max_rows
+        rows = itertools.islice(rows, options.skip_rows, stop)
+        
+        batch = []
+        width = len(names) if names is not None else None
+        for row in rows:
+            if positions is not None:
+                row = tuple(row[position] if position < len(row) else None for position in positions)
+            elif width is not None and len(row) != width:
+                # Read-only rows stop at the last filled cell
+                row = (tuple(row) + (None,) * width)[:width]
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield _frame(batch, names, options.dtypes)
+                batch = []
+        if batch:
+            yield _frame(batch, names, options.dtypes)
+    finally:
+        workbook.close()
+
+def read_excel(source: Union[str, bytes], options: ExcelReadOptions) -> pd.DataFrame:
+    """Read a sheet's selected columns and rows into one DataFrame"""
+    engine = resolve_engine(source, options.engine)
+    if engine == 'openpyxl':
+        chunks = list(iter_excel_chunks(source, options, ASSEMBLE_CHUNK_ROWS))
+        if not chunks:
+            return pd.DataFrame(columns=options.columns)
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    
+    header = options.header_row - 1 if options.header_row else None
+    skip = range(options.header_row, options.header_row + options.skip_rows) if options.skip_rows else None
+    return pd.read_excel(
+        _open(source),
+        sheet_name=options.sheet_name,
+        engine=engine,
+        header=header,
+        usecols=options.columns,
+        skiprows=skip,
+        nrows=options.max_rows,
+        dtype=options.dtypes or None
+    )
+
+class ExcelChunks:
+    """A sheet read lazily as chunk_size-row DataFrames
+    
+    Iterating it (a foreach node over the variable) streams the sheet; each
+    iteration re-reads from the start. Local files are referenced by path,
+    with their size and mtime so a changed file is a different value.
+    """
+    
+    def __init__(self, source: Union[str, bytes], options: ExcelReadOptions, chunk_size: int):
+        self.source = source
+        self.options = options
+        self.chunk_size = chunk_size
+        self.file_stat = None
+        if isinstance(source, str):
+            stat = os.stat(source)
+            self.file_stat = (stat.st_size, stat.st_mtime_ns)
+    
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return iter_excel_chunks(self.source, self.options, self.chunk_size)
+    
+    def read_all(self) -> pd.DataFrame:
+        """The whole selection as one DataFrame"""
+        return read_excel(self.source, self.options)
+    
+    def __repr__(self) -> str:
+        source = self.source if isinstance(self.source, str) else f"<{len(self.source)} bytes>"
+        return f"ExcelChunks({source!r}, sheet={self.options.sheet_name!r}, chunk_size={self.chunk_size})"
@@ -0,0 +1,225 @@
+# =====================================
+# Execution Event Log
+# =====================================
+#
+# Node events are streamed to an append-only log while a flow runs instead
+# of being written in one document at the end. Events are buffered and
+# flushed in batches, either to an executions/{id}/events subcollection or
+# to a local JSON-lines file.
+
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+# Firestore allows at most 500 writes per batch
+FIRESTORE_MAX_BATCH = 500
+
+def to_json_safe(value: Any) -> Any:
+    """Convert a value to plain JSON types (tuples, numpy scalars, dates...)"""
+    return json.loads(json.dumps(value, default=str))
+
+def describe_variable(value: Any) -> Dict[str, Any]:
+    """Compact descriptor of a flow variable: type, shape and size"""
+    descriptor = {'type': type(value).__name__}
+    
+    if hasattr(value, 'shape') and hasattr(value, 'memory_usage'):
+        # pandas DataFrame / Series
+        descriptor['shape'] = list(value.shape)
+        usage = value.memory_usage(index=True)
+        descriptor['size'] = int(usage.sum() if hasattr(usage, 'sum') else usage)
+    elif isinstance(value, (list, tuple, set, dict)):
+        descriptor['shape'] = [len(value)]
+        descriptor['size'] = sys.getsizeof(value)
+    elif isinstance(value, (str, bytes)):
+        descriptor['shape'] = [len(value)]
+        descriptor['size'] = sys.getsizeof(value)
+        if isinstance(value, str) and len(value) <= 256:
+            descriptor['value'] = value
+    else:
+        descriptor['size'] = sys.getsizeof(value)
+        if value is None or isinstance(value, (bool, int, float)):
+            descriptor['value'] = value
+    
+    return descriptor
+
+# =====================================
+# Backends
+# =====================================
+
+class EventLogBackend:
+    """Append-only storage for execution events"""
+    
+    name = 'base'
+    
+    def write(self, events: List[Dict[str, Any]]):
+        """Append a batch of events (blocking)"""
+        raise NotImplementedError
+    
+    def read(self) -> List[Dict[str, Any]]:
+        """Read every event written so far, in order"""
+        raise NotImplementedError
+    
+    def location(self) -> str:
+        """Where the events are stored"""
+        raise NotImplementedError
+    
+    def next_seq(self) -> int:
+        """Sequence number following the last stored event"""
+        events = self.read()
+        return events[-1]['seq'] + 1 if events else 0
+
+class FirestoreEventLog(EventLogBackend):
+    """Events stored in the executions/{execution_id}/events subcollection"""
+    
+    name = 'firestore'
+    
+    def __init__(self, client, execution_id: str):
+        self.client = client
+        self.execution_id = execution_id
+        self.collection = (
+            client.collection('executions').document(execution_id).collection('events')
+        )
+    
+    def write(self, events: List[Dict[str, Any]]):
+        for start in range(0, len(events), FIRESTORE_MAX_BATCH):
+            batch = self.client.batch()
+            for event in events[start:start + FIRESTORE_MAX_BATCH]:
+                batch.set(self.collection.document(f"{event['seq']:08d}"), event)
+            batch.commit()
+    
+    def read(self) -> List[Dict[str, Any]]:
+        return [doc.to_dict() for doc in self.collection.order_by('seq').stream()]
+    
+    def next_seq(self) -> int:
+        query = self.collection.order_by('seq', direction='DESCENDING').limit(1)
+        for doc in query.stream():
+            return doc.to_dict()['seq'] + 1
+        return 0
+    
+    def location(self) -> str:
+        return f"executions/{self.execution_id}/events"
+
+class LocalFileEventLog(EventLogBackend):
+    """Events stored as JSON lines in a local file"""
+    
+    name = 'local'
+    
+    def __init__(self, directory: str, execution_id: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{execution_id}.events.jsonl")
+    
+    def write(self, events: List[Dict[str, Any]]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def location(self) -> str:
+        return self.path
+
+# =====================================
+# Buffered Log
+# =====================================
+
+class ExecutionEventLog:
+    """Buffers events and flushes them every batch_size events or flush_interval_ms
+    
+    Backend writes go through run (the engine's IO lane; a worker thread by
+    default). A batch whose write fails goes back to the buffer.
+    """
+    
+    def __init__(
+        self,
+        backend: EventLogBackend,
+        batch_size: int = 50,
+        flush_interval_ms: int = 1000,
+        start_seq: int = 0,
+        run: Optional[Callable[..., Awaitable[Any]]] = None
+    ):
+        self.backend = backend
+        self.run = run or asyncio.to_thread
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        
+        # A resumed execution continues the sequence of its earlier events
+        self.events_written = start_seq
+        self._seq = start_seq
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the periodic flush timer on the running loop"""
+        self._flush_lock = asyncio.Lock()
+        if self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_periodically())
+    
+    async def append(self, event_type: str, **data):
+        """Append an event, flushing when the batch is full or the interval elapsed"""
+        event = to_json_safe({
+            'seq': self._seq,
+            'type': event_type,
+            'timestamp': time.time(),
+            **data
+        })
+        self._seq += 1
+        self._buffer.append(event)
+        
+        if (len(self._buffer) >= self.batch_size or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            await self.flush()
+    
+    async def flush(self):
+        """Write buffered events to the backend"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            events, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            
+            try:
+                await self.run(self.backend.write, events)
+            except BaseException:
+                # Kept for the next flush, ahead of events appended meanwhile
+                self._buffer[:0] = events
+                raise
+            self.events_written += len(events)
+    
+    async def close(self):
+        """Stop the timer and flush what is left"""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.flush()
+    
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                await self.flush()
+    
+    def summary(self) -> Dict[str, Any]:
+        """Descriptor of the log for the execution summary document"""
+        return {
+            'backend': self.backend.name,
+            'location': self.backend.location(),
+            'events': self.events_written + len(self._buffer)
+        }
@@ -0,0 +1,5 @@
+# Built-in component executors
+#
+# Each module is imported by the flow engine's executor registry the first
+# time a flow uses one of its node types, so flows that never touch
+# DataFrames don't pay for importing pandas.
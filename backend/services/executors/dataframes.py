@@ -0,0 +1,309 @@
+# =====================================
+# DataFrame Executors
+# =====================================
+
+import os
+import uuid
+from dataclasses import replace
+from typing import Dict, Any, Iterator, Optional, Set
+
+import pandas as pd
+
+from services.excel_cache import (
+    CachedExcelChunks,
+    ExcelParquetCache,
+    convert_to_parquet,
+    gcs_identity,
+    get_excel_cache,
+    local_identity,
+    read_parquet
+)
+from services.excel_reader import (
+    ExcelChunks,
+    ExcelReadOptions,
+    iter_excel_chunks,
+    parse_columns,
+    parse_dtypes,
+    read_excel,
+    resolve_engine
+)
+from services.flow_engine import ComponentExecutor, ExecutionLane, FlowEngineConfig, get_object_store
+from services.frame_join import (
+    JOIN_MODES,
+    MAX_PARTITIONS,
+    arrow_file_shape,
+    concat_partitioned,
+    join_many,
+    join_many_partitioned,
+    source_rows,
+    source_size
+)
+from services.object_store import ObjectInfo, ObjectStore
+from services.variable_store import VariableStore
+
+class DataFrameMergeExecutor(ComponentExecutor):
+    """Executor for DataFrame merge component
+    
+    Without 'on', frames are concatenated along 'direction'. With 'on' (key
+    columns, comma-separated) they are joined left to right with 'how'
+    (inner, left, right or outer). When the inputs and their result would
+    not fit the variable memory budget, or out_of_core is 'yes', joins and
+    vertical concats go through hash-partitioned Arrow files: spilled inputs
+    are read from their spill files and the result is stored spilled.
+    """
+    
+    # The frames already live in this process (or in its spill files), so
+    # the work goes to a thread rather than being pickled to a worker process
+    lane = ExecutionLane.IO
+    outputs = {'handler': ''}
+    required = ('handler', 'dataframes')
+    reads_spill_files = True
+    
+    @classmethod
+    def variable_reads(cls, node_config: Dict[str, Any]) -> Set[str]:
+        """Referenced variables plus the plain names listed in 'dataframes'"""
+        names = super().variable_reads(node_config)
+        dataframes = node_config.get('dataframes', '')
+        if isinstance(dataframes, str) and '${' not in dataframes:
+            names.update(name.strip() for name in dataframes.split(',') if name.strip())
+        return names
+    
+    def partition_count(self, total_bytes: int, budget: int) -> int:
+        """Partitions per side, so one partition pair is a small share of the budget"""
+        partitions = int(self.config.get('partitions') or 0)
+        if not partitions:
+            partitions = -(-total_bytes * 4 // budget) if budget else 8
+        return min(max(partitions, 2), MAX_PARTITIONS)
+    
+    async def execute(self) -> Dict[str, Any]:
+        handler = self.resolve_config('handler', '')
+        dataframes_str = self.resolve_config('dataframes', '')
+        direction = self.config.get('direction', 'horizontal')
+        on = parse_columns(self.resolve_config('on', None))
+        how = self.resolve_config('how', 'inner') or 'inner'
+        if on and how not in JOIN_MODES:
+            raise ValueError(f"Unknown join mode {how!r}; expected one of {', '.join(JOIN_MODES)}")
+        
+        # Parse dataframe references
+        df_names = [df.strip() for df in dataframes_str.split(',')]
+        names = [df_name for df_name in df_names if df_name in self.variables]
+        
+        if not names:
+            raise ValueError("No dataframes found to merge")
+        
+        # Spilled inputs stay in their Arrow files until a merge needs them in memory
+        store = self.variables if isinstance(self.variables, VariableStore) else None
+        sources = [(store.spill_file(name) if store else None) or self.variables[name] for name in names]
+        
+        out_of_core = False
+        if store is not None and (on or direction != 'horizontal') and len(sources) > 1:
+            total_bytes = sum(source_size(source) for source in sources)
+            budget = store.memory_budget_bytes
+            out_of_core = self.config.get('out_of_core') == 'yes' or bool(budget and total_bytes * 2 > budget)
+        
+        if out_of_core:
+            from pyarrow.lib import ArrowException
+            
+            output_path = os.path.join(store.spill_directory(), f"merge_{uuid.uuid4().hex}.arrow")
+            partitions = self.partition_count(total_bytes, budget)
+            try:
+                if on:
+                    steps = await self.offload(
+                        join_many_partitioned, sources, names, on, how, output_path, partitions
+                    )
+                    merge_stats = {'joins': [step.to_dict() for step in steps]}
+                else:
+                    await self.offload(concat_partitioned, sources, output_path)
+                    merge_stats = {}
+            except ArrowException:
+                # Columns Arrow cannot hold (mixed-type objects) are merged in memory
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                out_of_core = False
+            else:
+                shape = await self.offload(arrow_file_shape, output_path)
+                store.put_spilled(handler, output_path, {
+                    'type': 'DataFrame', 'shape': shape, 'size': os.path.getsize(output_path)
+                })
+        
+        if not out_of_core:
+            if store is not None:
+                dataframes = [await store.load(name, self.offload) for name in names]
+            else:
+                dataframes = [self.variables[name] for name in names]
+            
+            if len(dataframes) == 1:
+                # Nothing to merge; copy-on-write makes sharing the frame safe
+                result_df = dataframes[0]
+                merge_stats = {}
+            elif on:
+                result_df, steps = await self.offload(join_many, dataframes, names, on, how)
+                merge_stats = {'joins': [step.to_dict() for step in steps]}
+            elif direction == 'horizontal':
+                result_df = await self.offload(pd.concat, dataframes, axis=1)
+                merge_stats = {}
+            else:
+                result_df = await self.offload(pd.concat, dataframes, axis=0, ignore_index=True)
+                merge_stats = {}
+            shape = list(result_df.shape)
+            
+            # Store result
+            self.variables[handler] = result_df
+        
+        return {
+            'status': 'success',
+            'merged_shape': shape,
+            'merge_stats': dict(
+                merge_stats,
+                rows_in=[source_rows(source) for source in sources],
+                rows_out=shape[0],
+                out_of_core=out_of_core
+            ),
+            'result_variable': handler
+        }
+
+class ObjectExcelChunks(ExcelChunks):
+    """Streamed chunks of a gs:// workbook, read with ranged requests
+    
+    openpyxl seeks to the zip entries it needs (the central directory,
+    workbook, shared strings and the one sheet), so the rest of the object
+    is never fetched and nothing is added to the object cache. Every
+    iteration reads the version that was stat'ed.
+    """
+    
+    def __init__(self, info: ObjectInfo, options: ExcelReadOptions, chunk_size: int):
+        self.info = info
+        self.source = info.url
+        self.options = options
+        self.chunk_size = chunk_size
+        self.file_stat = (info.size, info.generation)
+    
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        with get_object_store().open(self.info.url, self.info) as f:
+            yield from iter_excel_chunks(f, self.options, self.chunk_size)
+    
+    def read_all(self) -> pd.DataFrame:
+        # The engine is picked by the object's extension, not the file handle
+        options = replace(self.options, engine=resolve_engine(self.info.url, self.options.engine))
+        with get_object_store().open(self.info.url, self.info) as f:
+            return read_excel(f, options)
+    
+    def __repr__(self) -> str:
+        return f"ObjectExcelChunks({self.info.url!r}, sheet={self.options.sheet_name!r}, chunk_size={self.chunk_size})"
+
+class ExcelReaderExecutor(ComponentExecutor):
+    """Executor for Excel reader component
+    
+    Reads only the listed columns and the skip_rows/max_rows window. With
+    chunk_size the destination holds an ExcelChunks instead of a DataFrame:
+    the sheet is streamed as chunk_size-row DataFrames when a foreach node
+    iterates it, so the whole sheet is never in memory at once. A gs://
+    workbook streamed without the Parquet cache is read in byte ranges
+    rather than downloaded.
+    """
+    
+    lane = ExecutionLane.CPU
+    outputs = {'destination': 'excel_data'}
+    required = ('excel_file_name',)
+    
+    def read_options(self) -> ExcelReadOptions:
+        max_rows = self.resolve_config('max_rows', None)
+        return ExcelReadOptions(
+            sheet_name=self.resolve_config('sheet_name', 'Sheet1'),
+            columns=parse_columns(self.resolve_config('columns', None)),
+            header_row=int(self.resolve_config('header_row', 1) or 0),
+            skip_rows=int(self.resolve_config('skip_rows', 0) or 0),
+            max_rows=int(max_rows) if max_rows not in (None, '') else None,
+            dtypes=parse_dtypes(self.resolve_config('dtypes', None)),
+            engine=self.resolve_config('engine', 'auto') or 'auto'
+        )
+    
+    def parquet_cache(self) -> Optional[ExcelParquetCache]:
+        """The process-wide Parquet cache, unless disabled for the engine or with data.parquet_cache"""
+        engine = self.context.get('engine')
+        config = engine.config if engine is not None else FlowEngineConfig()
+        if not config.EXCEL_CACHE_ENABLED or self.config.get('parquet_cache', 'yes') == 'no':
+            return None
+        return get_excel_cache(config.EXCEL_CACHE_DIR, config.EXCEL_CACHE_MAX_MB * 1024 * 1024)
+    
+    async def execute(self) -> Dict[str, Any]:
+        file_name = self.resolve_config('excel_file_name', '')
+        destination = self.config.get('destination', 'excel_data')
+        chunk_size = int(self.resolve_config('chunk_size', 0) or 0)
+        options = self.read_options()
+        cache = self.parquet_cache()
+        
+        # Locate the Excel file; a gs:// object is only downloaded when the cache cannot serve it
+        if file_name.startswith('gs://'):
+            # Google Cloud Storage; the generation identifies the version
+            store = self.object_store()
+            info = await self.offload(store.stat, file_name, lane=ExecutionLane.IO)
+            local_path = None
+        else:
+            # Local file
+            store = info = None
+            local_path = file_name
+        
+        source = None
+        df = None
+        parquet_path = None
+        cache_status = 'bypass'
+        if cache is not None:
+            if info is not None:
+                identity = gcs_identity(file_name, info.generation)
+            else:
+                identity = await self.offload(local_identity, local_path, lane=ExecutionLane.IO)
+            key = ExcelParquetCache.key(identity, options)
+            
+            if cache.cacheable(key):
+                parquet_path = await self.offload(cache.lookup, key, lane=ExecutionLane.IO)
+                cache_status = 'hit' if parquet_path else 'miss'
+            
+            if cache_status == 'miss':
+                source = await self.workbook_path(store, info, local_path)
+                staging_path = cache.staging_path(key)
+                df, written = await self.offload(
+                    convert_to_parquet, source, options, staging_path, select=chunk_size <= 0
+                )
+                parquet_path = await self.offload(cache.add, key, staging_path, written, lane=ExecutionLane.IO)
+        
+        if chunk_size > 0:
+            if parquet_path is not None:
+                chunks = CachedExcelChunks(parquet_path, source or local_path, options, chunk_size)
+            elif info is not None and source is None:
+                chunks = ObjectExcelChunks(info, options, chunk_size)
+            else:
+                chunks = ExcelChunks(source or await self.workbook_path(store, info, local_path), options, chunk_size)
+            self.variables[destination] = chunks
+            return {
+                'status': 'success',
+                'streaming': True,
+                'chunk_size': chunk_size,
+                'parquet_cache': cache_status,
+                'result_variable': destination
+            }
+        
+        if df is None:
+            if parquet_path is not None:
+                # Memory-mapped and decoded by pyarrow without the GIL, so a thread will do
+                df = await self.offload(read_parquet, parquet_path, options, lane=ExecutionLane.IO)
+            else:
+                source = source or await self.workbook_path(store, info, local_path)
+                df = await self.offload(read_excel, source, options)
+        
+        # Store in variables
+        self.variables[destination] = df
+        
+        return {
+            'status': 'success',
+            'rows': len(df),
+            'columns': len(df.columns),
+            'parquet_cache': cache_status,
+            'result_variable': destination
+        }
+    
+    async def workbook_path(self, store: Optional[ObjectStore], info: Optional[ObjectInfo], local_path: Optional[str]) -> str:
+        """The workbook to parse: the local file, or the object store's copy of a gs:// object"""
+        if info is None:
+            return local_path
+        return await self.offload(store.local_path, info.url, info, lane=ExecutionLane.IO)
@@ -0,0 +1,64 @@
+# =====================================
+# File Executors
+# =====================================
+
+from typing import Dict, Any
+
+from services.file_index import FileWalk
+from services.flow_engine import ComponentExecutor, ExecutionLane, FlowEngineConfig
+
+class FileSearchExecutor(ComponentExecutor):
+    """Executor for file search component
+    
+    max_depth limits how many subfolder levels are searched and max_results
+    stops the search early. use_index reuses directory listings from earlier
+    searches of the same folder where the directories are unchanged. With
+    lazy, the result variable holds a FileWalk that searches as a foreach
+    node iterates it, instead of the list of paths.
+    """
+    
+    lane = ExecutionLane.IO
+    outputs = {'result': 'file_search_result'}
+    required = ('folder',)
+    
+    async def execute(self) -> Dict[str, Any]:
+        folder = self.resolve_config('folder', '')
+        pattern = self.resolve_config('pattern', '*.*')
+        include_subfolders = self.config.get('include_subfolders', 'no') == 'yes'
+        max_depth = self.resolve_config('max_depth', None)
+        max_results = int(self.resolve_config('max_results', 0) or 0)
+        
+        index_dir = None
+        if self.config.get('use_index', 'no') == 'yes':
+            engine = self.context.get('engine')
+            index_dir = (engine.config if engine is not None else FlowEngineConfig()).FILE_INDEX_DIR
+        
+        search = FileWalk(
+            folder,
+            pattern,
+            recursive=include_subfolders,
+            max_depth=int(max_depth) if max_depth not in (None, '') else None,
+            max_results=max_results or None,
+            index_dir=index_dir
+        )
+        
+        # Store result in variable
+        result_var = self.config.get('result', 'file_search_result')
+        
+        if self.config.get('lazy', 'no') == 'yes':
+            self.variables[result_var] = search
+            return {
+                'status': 'success',
+                'lazy': True,
+                'result_variable': result_var
+            }
+        
+        files = await self.offload(list, search)
+        self.variables[result_var] = files
+        
+        return {
+            'status': 'success',
+            'files_found': len(files),
+            'truncated': bool(max_results) and len(files) >= max_results,
+            'result_variable': result_var
+        }
@@ -0,0 +1,42 @@
+# =====================================
+# Logic Executors
+# =====================================
+
+from typing import Dict, Any
+
+from services.flow_engine import ComponentExecutor
+
+def evaluate_condition(left_value: Any, operator: str, right_value: Any) -> bool:
+    """Compare two resolved values with a condition node operator"""
+    if operator == '==':
+        return left_value == right_value
+    elif operator == '!=':
+        return left_value != right_value
+    elif operator == '>':
+        return float(left_value) > float(right_value)
+    elif operator == '<':
+        return float(left_value) < float(right_value)
+    elif operator == '>=':
+        return float(left_value) >= float(right_value)
+    elif operator == '<=':
+        return float(left_value) <= float(right_value)
+    elif operator == 'contains':
+        return str(right_value) in str(left_value)
+    return False
+
+class ConditionalExecutor(ComponentExecutor):
+    """Executor for conditional branching"""
+    
+    async def execute(self) -> Dict[str, Any]:
+        left_value = self.resolve_config('left_value', '')
+        operator = self.config.get('operator', '==')
+        right_value = self.resolve_config('right_value', '')
+        
+        # Evaluate condition
+        result = evaluate_condition(left_value, operator, right_value)
+        
+        return {
+            'status': 'success',
+            'condition_result': result,
+            'next_branch': 'true' if result else 'false'
+        }
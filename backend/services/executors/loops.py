@@ -0,0 +1,189 @@
+# =====================================
+# Loop Executors
+# =====================================
+#
+# for / foreach / loop nodes run their body subgraph (FlowPlan.loops, compiled
+# once with the flow) on every iteration. Break and continue nodes end an
+# iteration by raising LoopControl. DataFrames and file lists are iterated
+# lazily, by row or in chunks, instead of being copied into a list first;
+# sources that read files as they go are pulled on the IO lane.
+
+import itertools
+import os
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from services.flow_engine import ComponentExecutor, ExecutionLane, LoopControl
+from services.executors.logic import evaluate_condition
+from services.interpolation import Reference
+from services.variable_store import VariableStore, is_dataframe, iterate_frame
+
+def _number(value: Any) -> Any:
+    """Parse a loop bound, keeping whole numbers as ints"""
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+# Marks the end of iterations() when items are pulled through offload()
+_DONE = object()
+
+def _in_memory(collection: Any) -> bool:
+    """Whether iterating a collection never touches the disk"""
+    return is_dataframe(collection) or isinstance(collection, (list, tuple, dict, set, range))
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _directory_files(folder: str) -> Iterator[str]:
+    """Paths of the files in a folder, in directory order, read as the loop goes"""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield entry.path
+
+def iterate_collection(collection: Any, chunk_size: int = 0) -> Iterator[Any]:
+    """Items of a foreach collection, or lists of chunk_size items
+    
+    DataFrames yield row dicts (or chunk_size-row DataFrames), dicts yield
+    {'key', 'value'} pairs and a folder path yields the files in it.
+    """
+    if is_dataframe(collection):
+        return iterate_frame(collection, chunk_size)
+    
+    if isinstance(collection, str):
+        if not os.path.isdir(collection):
+            raise ValueError(f"Cannot loop over text {collection[:50]!r}; expected a list, DataFrame or folder")
+        items = _directory_files(collection)
+    elif isinstance(collection, dict):
+        items = ({'key': key, 'value': value} for key, value in collection.items())
+    else:
+        items = iter(collection)
+    
+    return _chunks(items, chunk_size) if chunk_size else items
+
+class LoopExecutor(ComponentExecutor):
+    """Base class for loop nodes: runs the body once per iteration"""
+    
+    has_body = True
+    cacheable = False
+    
+    # Config key naming the variable each iteration's value is stored in
+    variable_key: Optional[str] = None
+    
+    # Lane the next value is pulled on; iterations() switches it to IO for
+    # sources that read files (folders, spilled frames, Excel chunks, walks)
+    iteration_lane = ExecutionLane.INLINE
+    
+    def iterations(self) -> Iterator[Any]:
+        """Values of successive iterations, produced lazily"""
+        raise NotImplementedError
+    
+    async def execute(self) -> Dict[str, Any]:
+        engine = self.context['engine']
+        max_iterations = int(self.config.get('max_iterations') or engine.config.LOOP_MAX_ITERATIONS)
+        name = self.config.get(self.variable_key, self.outputs.get(self.variable_key)) if self.variable_key else None
+        
+        count = 0
+        stopped_by_break = False
+        iterator = iter(self.iterations())
+        while True:
+            value = await self.offload(next, iterator, _DONE, lane=self.iteration_lane)
+            if value is _DONE:
+                break
+            if count >= max_iterations:
+                raise RuntimeError(f"Loop {self.node_id} exceeded {max_iterations} iterations")
+            if name:
+                self.variables[name] = value
+            count += 1
+            
+            if await engine.run_loop_body(self.node_id) == 'break':
+                stopped_by_break = True
+                break
+        
+        return {
+            'status': 'success',
+            'iterations': count,
+            'stopped_by_break': stopped_by_break
+        }
+
+class ForLoopExecutor(LoopExecutor):
+    """Executor for for loops: counter from start_from to end_to (inclusive) by step"""
+    
+    outputs = {'counter': 'counter'}
+    variable_key = 'counter'
+    required = ('end_to',)
+    
+    def iterations(self) -> Iterator[Any]:
+        value = _number(self.resolve_config('start_from', 0))
+        end = _number(self.resolve_config('end_to', 0))
+        step = _number(self.resolve_config('step', 1) or 1)
+        if step == 0:
+            raise ValueError("Loop step cannot be 0")
+        
+        while (step > 0 and value <= end) or (step < 0 and value >= end):
+            yield value
+            value += step
+
+class ForEachLoopExecutor(LoopExecutor):
+    """Executor for foreach loops over a list, dict, DataFrame or folder
+    
+    With chunk_size, each iteration gets a list (or DataFrame) of up to that
+    many items. Spilled DataFrames are read slice by slice from their file.
+    """
+    
+    outputs = {'item': 'item'}
+    variable_key = 'item'
+    required = ('collection',)
+    
+    def iterations(self) -> Iterator[Any]:
+        chunk_size = int(self.config.get('chunk_size') or 0)
+        
+        template = self.templates.get('collection')
+        if (
+            isinstance(template, Reference) and not template.path
+            and isinstance(self.variables, VariableStore) and self.variables.is_spilled(template.name)
+        ):
+            self.iteration_lane = ExecutionLane.IO
+            return self.variables.iter_frame(template.name, chunk_size)
+        
+        collection = self.resolve_config('collection', [])
+        if not _in_memory(collection):
+            self.iteration_lane = ExecutionLane.IO
+        return iterate_collection(collection, chunk_size)
+
+class WhileLoopExecutor(LoopExecutor):
+    """Executor for loop nodes: repeats while the optional condition holds, until a break"""
+    
+    outputs = {'index': ''}
+    variable_key = 'index'
+    
+    def iterations(self) -> Iterator[Any]:
+        for index in itertools.count():
+            # Re-resolved every iteration, so the body can change the outcome
+            if 'left_value' in self.config:
+                left_value = self.resolve_config('left_value', '')
+                right_value = self.resolve_config('right_value', '')
+                if not evaluate_condition(left_value, self.config.get('operator', '=='), right_value):
+                    return
+            yield index
+
+class BreakExecutor(ComponentExecutor):
+    """Executor for break: ends the enclosing loop"""
+    
+    cacheable = False
+    loop_control = True
+    
+    async def execute(self) -> Dict[str, Any]:
+        raise LoopControl('break')
+
+class ContinueExecutor(ComponentExecutor):
+    """Executor for continue: ends the current iteration of the enclosing loop"""
+    
+    cacheable = False
+    loop_control = True
+    
+    async def execute(self) -> Dict[str, Any]:
+        raise LoopControl('continue')
@@ -0,0 +1,52 @@
+# =====================================
+# Desktop Automation Executors
+# =====================================
+
+from typing import Dict, Any
+
+from services.flow_engine import ComponentExecutor, ExecutionLane
+
+class RPAAutomationExecutor(ComponentExecutor):
+    """Base executor for RPA automation components"""
+    
+    lane = ExecutionLane.UI
+    cacheable = False
+    
+    async def execute_mouse_click(self) -> Dict[str, Any]:
+        import pyautogui
+        
+        x = int(self.resolve_config('x', 0))
+        y = int(self.resolve_config('y', 0))
+        button = self.config.get('button', 'left')
+        clicks = int(self.config.get('clicks', 1))
+        
+        await self.offload(pyautogui.click, x=x, y=y, button=button, clicks=clicks)
+        
+        return {
+            'status': 'success',
+            'action': 'mouse_click',
+            'position': {'x': x, 'y': y}
+        }
+    
+    async def execute_keyboard_input(self) -> Dict[str, Any]:
+        import pyautogui
+        
+        text = self.resolve_config('text', '')
+        delay = float(self.config.get('delay', 0.1))
+        special_keys = self.config.get('special_keys', [])
+        
+        def type_text():
+            # Handle special keys
+            for key in special_keys:
+                pyautogui.press(key)
+            
+            # Type text
+            pyautogui.typewrite(text, interval=delay)
+        
+        await self.offload(type_text)
+        
+        return {
+            'status': 'success',
+            'action': 'keyboard_input',
+            'text_length': len(text)
+        }
@@ -0,0 +1,229 @@
+# =====================================
+# File Search
+# =====================================
+#
+# A directory walker for file search nodes. It uses os.scandir, compiles
+# the pattern once, and produces matches lazily, so a search can stop at
+# max_results or a depth limit without listing the whole tree. An optional
+# persistent index keeps each directory's listing with the directory's
+# mtime. A later search of the same tree stats each directory and only
+# re-scans the ones whose entries changed, which on network shares is most
+# of the cost.
+
+import fnmatch
+import glob
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Callable, Iterator, List, Optional, Tuple
+
+# Bump to discard stored indexes when their layout changes
+FILE_INDEX_FORMAT_VERSION = 2
+
+# Listings taken this soon after a directory changed may have missed a
+# change within the same mtime tick (coarse on network shares), so they
+# are re-scanned next time
+RACY_WINDOW_NS = 2 * 10**9
+
+Listing = Tuple[List[str], List[str]]
+
+def compile_pattern(pattern: str) -> Callable[[str], bool]:
+    """Name matcher for a glob pattern, case-insensitive where the platform's paths are"""
+    regex = re.compile(fnmatch.translate(os.path.normcase(pattern)))
+    return lambda name: regex.match(os.path.normcase(name)) is not None
+
+def scan_directory(directory: str) -> Optional[Listing]:
+    """Names of the files and subdirectories in a directory; None if it cannot be read
+    
+    Symlinked directories are listed with the files, so they can match but
+    are not descended into and links cannot make the walk loop.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file() or entry.is_symlink():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return files, subdirs
+
+class DirectoryIndex:
+    """Directory listings of one tree, reused while each directory's mtime is unchanged"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.scanned = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        
+        # directory -> (mtime_ns, scanned_at_ns, files, subdirs)
+        self._listings: Dict[str, Tuple[int, int, List[str], List[str]]] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == FILE_INDEX_FORMAT_VERSION:
+                self._listings = {directory: tuple(listing) for directory, listing in data['directories'].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def listing(self, directory: str) -> Optional[Listing]:
+        """A directory's files and subdirectories, from the index when still current (blocking)"""
+        # Keyed like the index itself, so relative and absolute searches share listings
+        directory = os.path.abspath(directory)
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        
+        with self._lock:
+            cached = self._listings.get(directory)
+        if cached is not None and cached[0] == mtime_ns and cached[1] - mtime_ns > RACY_WINDOW_NS:
+            self.reused += 1
+            return cached[2], cached[3]
+        
+        scanned_at_ns = time.time_ns()
+        listing = scan_directory(directory)
+        self.scanned += 1
+        with self._lock:
+            previous = self._listings.get(directory)
+            if listing is None:
+                self._dirty = self._forget(directory) or self._dirty
+            else:
+                # Subdirectories that are gone take their listings with them
+                if previous is not None:
+                    for name in set(previous[3]) - set(listing[1]):
+                        self._forget(os.path.join(directory, name))
+                self._listings[directory] = (mtime_ns, scanned_at_ns, listing[0], listing[1])
+                self._dirty = True
+        return listing
+    
+    def _forget(self, directory: str) -> bool:
+        """Drop a directory's listing and those of everything under it; caller holds the lock"""
+        prefix = os.path.join(directory, '')
+        stale = [key for key in self._listings if key == directory or key.startswith(prefix)]
+        for key in stale:
+            del self._listings[key]
+        return bool(stale)
+    
+    def save(self):
+        """Write the index if any listing changed (blocking)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'format': FILE_INDEX_FORMAT_VERSION, 'directories': dict(self._listings)}
+            self._dirty = False
+        
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+_indexes: Dict[str, DirectoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_directory_index(index_dir: str, root: str) -> DirectoryIndex:
+    """The process-wide index of the tree under root, loaded from index_dir on first use"""
+    root = os.path.abspath(root)
+    path = os.path.join(index_dir, hashlib.sha1(root.encode('utf-8')).hexdigest() + '.json')
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = DirectoryIndex(path)
+        return index
+
+def walk_files(
+    folder: str,
+    pattern: str = '*',
+    recursive: bool = False,
+    max_depth: Optional[int] = None,
+    max_results: Optional[int] = None,
+    index: Optional[DirectoryIndex] = None
+) -> Iterator[str]:
+    """Paths under folder whose names match pattern, produced as they are found
+    
+    As with glob, matching subfolders are produced too, after the files of
+    the folder they are in. max_depth counts subfolder levels below folder
+    (0 is folder only). Names starting with '.' only match patterns that
+    do, and hidden folders are not descended into. Patterns with a path
+    separator are handed to glob.
+    """
+    if '/' in pattern or os.sep in pattern:
+        search_pattern = os.path.join(folder, '**', pattern) if recursive else os.path.join(folder, pattern)
+        yield from itertools.islice(glob.iglob(search_pattern, recursive=recursive), max_results or None)
+        return
+    
+    matches_name = compile_pattern(pattern)
+    include_hidden = pattern.startswith('.')
+    list_directory = index.listing if index is not None else scan_directory
+    if not recursive:
+        max_depth = 0
+    
+    found = 0
+    stack = [(folder, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        listing = list_directory(directory)
+        if listing is None:
+            continue
+        files, subdirs = listing
+        
+        for name in itertools.chain(files, subdirs):
+            if (include_hidden or not name.startswith('.')) and matches_name(name):
+                yield os.path.join(directory, name)
+                found += 1
+                if max_results and found >= max_results:
+                    return
+        
+        if max_depth is None or depth < max_depth:
+            stack.extend(
+                (os.path.join(directory, name), depth + 1)
+                for name in reversed(subdirs) if not name.startswith('.')
+            )
+
+class FileWalk:
+    """A file search, run each time it is iterated
+    
+    Stored in place of the list of paths when a search node is lazy, so a
+    foreach node can start on the first files before the walk finishes.
+    Foreach pulls each path on the IO lane, since the walk stats and lists
+    directories as it goes.
+    """
+    
+    def __init__(
+        self,
+        folder: str,
+        pattern: str = '*',
+        recursive: bool = False,
+        max_depth: Optional[int] = None,
+        max_results: Optional[int] = None,
+        index_dir: Optional[str] = None
+    ):
+        self.folder = folder
+        self.pattern = pattern
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.max_results = max_results
+        self.index_dir = index_dir
+    
+    def __iter__(self) -> Iterator[str]:
+        index = get_directory_index(self.index_dir, self.folder) if self.index_dir else None
+        try:
+            yield from walk_files(self.folder, self.pattern, self.recursive, self.max_depth, self.max_results, index)
+        finally:
+            if index is not None:
+                index.save()
+    
+    def __repr__(self) -> str:
+        return f"FileWalk({self.folder!r}, {self.pattern!r}, recursive={self.recursive})"
@@ -29,29 +29,277 @@ redis==4.6.0
 import json
 import os
 import asyncio
+import functools
+import hashlib
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, asdict
-import pandas as pd
+from typing import Dict, Any, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, field, asdict
+from enum import Enum
 import traceback
 
-from google.cloud import firestore
-from google.cloud import storage
-from google.cloud import pubsub_v1
-from google.cloud import tasks_v2
-from google.cloud import logging as cloud_logging
+_import_started = time.perf_counter()
 
-# Initialize clients
-db = firestore.Client(database="firestore-native")
-storage_client = storage.Client()
-publisher = pubsub_v1.PublisherClient()
-tasks_client = tasks_v2.CloudTasksClient()
-logging_client = cloud_logging.Client()
+from services.checkpoints import (
+    CheckpointStore,
+    FirestoreCheckpointStore,
+    LocalCheckpointStore,
+    remove_checkpoint_files
+)
+from services.component_stats import ComponentStatsStore, TimingStats, summarize_timings
+from services.execution_log import (
+    ExecutionEventLog,
+    FirestoreEventLog,
+    LocalFileEventLog,
+    describe_variable
+)
+from services.job_queue import (
+    CloudTasksQueueBackend,
+    Job,
+    JobPriority,
+    JobQueue,
+    MemoryQueueBackend,
+    QueueFull,
+    RedisQueueBackend
+)
+from services.interpolation import Template, TemplateError, compile_config, compile_template, template_references
+from services.object_store import GCSObjectBackend, LocalObjectBackend, ObjectStore
+from services.result_cache import NodeResultCache, node_cache_key
+from services.tracing import NodeSpan, Tracer
+from services.variable_store import VariableStore, is_dataframe
+from utils.gcp_clients import (
+    get_firestore_client,
+    get_logging_client,
+    get_publisher_client,
+    get_storage_client,
+    get_tasks_client
+)
+from utils.startup import record_import, report_cold_start, timed_import
+
+# Clients are created on first use, not at import, to keep cold starts short.
+# Assigning db swaps in another Firestore client (emulator, test double).
+FIRESTORE_DATABASE = os.environ.get('FIRESTORE_DATABASE', 'firestore-native')
+db = None
+
+def get_db():
+    """Get the flow engine's Firestore client, creating it on first use"""
+    global db
+    if db is None:
+        db = get_firestore_client(database=FIRESTORE_DATABASE)
+    return db
+
+# =====================================
+# Engine Configuration
+# =====================================
+
+@dataclass
+class FlowEngineConfig:
+    """Flow engine tuning knobs"""
+    
+    # Flow definition and plan cache
+    FLOW_CACHE_SIZE: int = int(os.environ.get('FLOW_CACHE_SIZE', '128'))
+    FLOW_CACHE_TTL_SECONDS: float = float(os.environ.get('FLOW_CACHE_TTL_SECONDS', '60'))
+    
+    # Scheduling
+    MAX_CONCURRENCY: int = int(os.environ.get('FLOW_MAX_CONCURRENCY', '8'))
+    
+    # Batch executions: items run concurrently, and failed items listed in the summary
+    BATCH_MAX_CONCURRENCY: int = int(os.environ.get('FLOW_BATCH_MAX_CONCURRENCY', '16'))
+    BATCH_MAX_REPORTED_ERRORS: int = int(os.environ.get('FLOW_BATCH_MAX_REPORTED_ERRORS', '100'))
+    
+    # Worker pools (CPU_POOL_SIZE=0 runs CPU work on threads instead of processes)
+    IO_POOL_SIZE: int = int(os.environ.get('FLOW_IO_POOL_SIZE', '16'))
+    CPU_POOL_SIZE: int = int(os.environ.get('FLOW_CPU_POOL_SIZE', str(os.cpu_count() or 1)))
+    
+    # Execution event log ('firestore' subcollection or 'local' JSON-lines file)
+    EVENT_LOG_BACKEND: str = os.environ.get('FLOW_EVENT_LOG_BACKEND', 'firestore')
+    EVENT_LOG_DIR: str = os.environ.get('FLOW_EVENT_LOG_DIR', '/tmp/agentiqware/events')
+    EVENT_LOG_BATCH_SIZE: int = int(os.environ.get('FLOW_EVENT_LOG_BATCH_SIZE', '50'))
+    EVENT_LOG_FLUSH_MS: int = int(os.environ.get('FLOW_EVENT_LOG_FLUSH_MS', '1000'))
+    
+    # Variables (0 disables the budget)
+    VARIABLE_MEMORY_BUDGET_MB: int = int(os.environ.get('FLOW_VARIABLE_MEMORY_BUDGET_MB', '1024'))
+    VARIABLE_SPILL_DIR: str = os.environ.get('FLOW_VARIABLE_SPILL_DIR', '/tmp/agentiqware/spill')
+    FREE_UNUSED_VARIABLES: bool = os.environ.get('FLOW_FREE_UNUSED_VARIABLES', 'true').lower() == 'true'
+    
+    # Checkpoints ('local' directory or 'firestore' collection), taken every
+    # N completed nodes and after nodes with data.checkpoint (0 = flagged only)
+    CHECKPOINT_BACKEND: str = os.environ.get('FLOW_CHECKPOINT_BACKEND', 'local')
+    CHECKPOINT_DIR: str = os.environ.get('FLOW_CHECKPOINT_DIR', '/tmp/agentiqware/checkpoints')
+    CHECKPOINT_EVERY_NODES: int = int(os.environ.get('FLOW_CHECKPOINT_EVERY_NODES', '0'))
+    
+    # Node result memoization, opted into with data.cache or the flow's cache_results
+    RESULT_CACHE_DIR: str = os.environ.get('FLOW_RESULT_CACHE_DIR', '/tmp/agentiqware/results')
+    RESULT_CACHE_MAX_MB: int = int(os.environ.get('FLOW_RESULT_CACHE_MAX_MB', '2048'))
+    
+    # Directory listings kept for file search nodes with use_index
+    FILE_INDEX_DIR: str = os.environ.get('FLOW_FILE_INDEX_DIR', '/tmp/agentiqware/file_index')
+    
+    # gs:// objects ('gcs', or 'local' to serve them from
+    # OBJECT_STORE_LOCAL_ROOT/<bucket>/<path>) and the local cache of downloads
+    OBJECT_STORE_BACKEND: str = os.environ.get('FLOW_OBJECT_STORE_BACKEND', 'gcs')
+    OBJECT_STORE_LOCAL_ROOT: str = os.environ.get('FLOW_OBJECT_STORE_LOCAL_ROOT', '/tmp/agentiqware/buckets')
+    OBJECT_CACHE_DIR: str = os.environ.get('FLOW_OBJECT_CACHE_DIR', '/tmp/agentiqware/objects')
+    OBJECT_CACHE_MAX_MB: int = int(os.environ.get('FLOW_OBJECT_CACHE_MAX_MB', '4096'))
+    
+    # Parquet copies of Excel sheets, reused while the workbook is unchanged
+    EXCEL_CACHE_ENABLED: bool = os.environ.get('FLOW_EXCEL_CACHE', 'true').lower() == 'true'
+    EXCEL_CACHE_DIR: str = os.environ.get('FLOW_EXCEL_CACHE_DIR', '/tmp/agentiqware/excel')
+    EXCEL_CACHE_MAX_MB: int = int(os.environ.get('FLOW_EXCEL_CACHE_MAX_MB', '4096'))
+    
+    # Loop nodes fail past this many iterations unless the node sets max_iterations
+    LOOP_MAX_ITERATIONS: int = int(os.environ.get('FLOW_LOOP_MAX_ITERATIONS', '1000000'))
+    
+    # Timeouts in seconds (0 = none). Nodes override theirs with data.timeout
+    # (loop nodes only time out when they set it) and flows their deadline
+    # with deadline_seconds
+    NODE_TIMEOUT_SECONDS: float = float(os.environ.get('FLOW_NODE_TIMEOUT_SECONDS', '600'))
+    FLOW_DEADLINE_SECONDS: float = float(os.environ.get('FLOW_DEADLINE_SECONDS', '0'))
+    
+    # Per-node tracing spans, written at the end of each execution in the
+    # listed formats ('chrome' trace events, 'otlp' JSON)
+    TRACE_ENABLED: bool = os.environ.get('FLOW_TRACE_ENABLED', 'true').lower() == 'true'
+    TRACE_DIR: str = os.environ.get('FLOW_TRACE_DIR', '/tmp/agentiqware/traces')
+    TRACE_FORMATS: str = os.environ.get('FLOW_TRACE_FORMATS', 'chrome,otlp')
+    TRACE_MAX_SPANS: int = int(os.environ.get('FLOW_TRACE_MAX_SPANS', '100000'))
+    # Retention for TRACE_DIR: oldest trace files are pruned after each export (0 = keep all)
+    TRACE_MAX_FILES: int = int(os.environ.get('FLOW_TRACE_MAX_FILES', '200'))
+    TRACE_MAX_MB: int = int(os.environ.get('FLOW_TRACE_MAX_MB', '256'))
+    
+    # Static validation before a flow runs, and per-component run times
+    # collected for runtime estimates
+    VALIDATE_FLOWS: bool = os.environ.get('FLOW_VALIDATE', 'true').lower() == 'true'
+    COMPONENT_STATS_ENABLED: bool = os.environ.get('FLOW_COMPONENT_STATS', 'true').lower() == 'true'
+    
+    # Execution job queue ('memory', 'redis' or 'cloud_tasks'); a full queue
+    # rejects submissions with a retry-after hint
+    QUEUE_BACKEND: str = os.environ.get('FLOW_QUEUE_BACKEND', 'memory')
+    QUEUE_WORKERS: int = int(os.environ.get('FLOW_QUEUE_WORKERS', '4'))
+    QUEUE_MAX_DEPTH: int = int(os.environ.get('FLOW_QUEUE_MAX_DEPTH', '100'))
+    QUEUE_WAIT_SECONDS: int = int(os.environ.get('FLOW_QUEUE_WAIT_SECONDS', '540'))
+    QUEUE_NAME: str = os.environ.get('FLOW_QUEUE_NAME', 'flow-executions')
+    QUEUE_REDIS_URL: str = os.environ.get('FLOW_QUEUE_REDIS_URL', 'redis://localhost:6379/0')
+    QUEUE_TASKS_LOCATION: str = os.environ.get('FLOW_QUEUE_TASKS_LOCATION', 'us-central1')
+    QUEUE_TASKS_URL: str = os.environ.get('FLOW_QUEUE_TASKS_URL', '')
+    QUEUE_TASKS_SERVICE_ACCOUNT: str = os.environ.get('FLOW_QUEUE_TASKS_SERVICE_ACCOUNT', '')
+
+# =====================================
+# Executor Pools
+# =====================================
+
+class ExecutionLane(Enum):
+    """Where an executor's blocking work runs"""
+    INLINE = "inline"  # On the event loop; the executor never blocks
+    IO = "io"          # Thread pool for file, network and storage calls
+    CPU = "cpu"        # Process pool for parsing and number crunching
+    UI = "ui"          # Single thread so desktop actions never interleave
+
+class ExecutorPools:
+    """Process-wide pools that blocking executor work is dispatched to"""
+    
+    def __init__(self, config: Optional[FlowEngineConfig] = None):
+        self.config = config or FlowEngineConfig()
+        self._pools: Dict[ExecutionLane, Executor] = {}
+        self._lock = threading.Lock()
+        
+        # Submitted, unfinished work of each pool, to know when a stuck pool is safe to kill
+        self._inflight: Dict[Executor, Set[Future]] = {}
+        self.retired = 0
+    
+    def get(self, lane: ExecutionLane) -> Executor:
+        """Get the pool for a lane, creating it on first use"""
+        with self._lock:
+            pool = self._pools.get(lane)
+            if pool is None:
+                pool = self._create(lane)
+                self._pools[lane] = pool
+            return pool
+    
+    def _create(self, lane: ExecutionLane) -> Executor:
+        if lane == ExecutionLane.CPU and self.config.CPU_POOL_SIZE > 0:
+            return ProcessPoolExecutor(max_workers=self.config.CPU_POOL_SIZE)
+        if lane == ExecutionLane.UI:
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix='flow-ui')
+        if lane == ExecutionLane.CPU:
+            return ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='flow-cpu')
+        return ThreadPoolExecutor(max_workers=self.config.IO_POOL_SIZE, thread_name_prefix='flow-io')
+    
+    def submit(self, lane: ExecutionLane, func, *args, **kwargs) -> Future:
+        """Queue a blocking callable on a lane's pool"""
+        pool = self.get(lane)
+        future = pool.submit(functools.partial(func, *args, **kwargs))
+        with self._lock:
+            self._inflight.setdefault(pool, set()).add(future)
+        future.add_done_callback(functools.partial(self._finished, pool))
+        return future
+    
+    def _finished(self, pool: Executor, future: Future):
+        with self._lock:
+            inflight = self._inflight.get(pool)
+            if inflight is not None:
+                inflight.discard(future)
+    
+    async def run(self, lane: ExecutionLane, func, *args, **kwargs) -> Any:
+        """Run a blocking callable on a lane without stalling the event loop"""
+        if lane == ExecutionLane.INLINE:
+            return func(*args, **kwargs)
+        
+        return await asyncio.wrap_future(self.submit(lane, func, *args, **kwargs))
+    
+    def retire(self, lane: ExecutionLane, stuck: Iterable[Future]):
+        """Replace a lane's pool after calls on it timed out
+        
+        Only the single-thread UI lane and the CPU lane are replaced; the IO
+        pool has threads to spare. New work goes to a fresh pool instead of
+        queueing behind the stuck calls, and the old pool finishes whatever
+        else it holds. Processes are terminated when the stuck calls are all
+        the old pool has left; threads cannot be stopped.
+        """
+        if lane not in (ExecutionLane.UI, ExecutionLane.CPU):
+            return
+        
+        stuck = set(stuck)
+        with self._lock:
+            pool = self._pools.get(lane)
+            inflight = self._inflight.get(pool, set())
+            if pool is None or not inflight & stuck:
+                return
+            del self._pools[lane]
+            self._inflight.pop(pool, None)
+            others = inflight - stuck
+            self.retired += 1
+        
+        pool.shutdown(wait=False)
+        if isinstance(pool, ProcessPoolExecutor) and not others:
+            for process in list((getattr(pool, '_processes', None) or {}).values()):
+                process.terminate()
+    
+    def shutdown(self, wait: bool = True):
+        """Shut down every pool created so far"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=wait)
+
+_executor_pools: Optional[ExecutorPools] = None
+_executor_pools_lock = threading.Lock()
+
+def get_executor_pools(config: Optional[FlowEngineConfig] = None) -> ExecutorPools:
+    """Get the process-wide executor pools; pool sizes come from the first caller"""
+    global _executor_pools
+    with _executor_pools_lock:
+        if _executor_pools is None:
+            _executor_pools = ExecutorPools(config)
+        return _executor_pools
 
 # =====================================
 # Component Registry
 # =====================================
 
+
 @dataclass
 class ComponentDefinition:
     """Component definition from JSON"""
@@ -62,190 +310,1352 @@ class ComponentDefinition:
     executor_class: str
 
 class ComponentExecutor:
-    """Base class for component executors"""
+    """Base class for component executors
+    
+    Executors declare the lane their blocking work belongs to and hand that
+    work to offload() so the event loop stays free.
+    """
+    
+    lane = ExecutionLane.INLINE
+    
+    # Whether results may be memoized; executors with effects outside the
+    # flow variables (desktop input) opt out
+    cacheable = True
+    
+    # Loop executors run a body subgraph, compiled into FlowPlan.loops
+    has_body = False
+    
+    # Break and continue, which only mean something inside a loop body
+    loop_control = False
+    
+    # Executors that read spilled DataFrames straight from their spill files;
+    # the engine doesn't load their inputs back into memory first
+    reads_spill_files = False
+    
+    # Config keys naming the variables the node writes, with their defaults
+    outputs: Dict[str, str] = {}
+    
+    # Config keys a node must set, checked before the flow runs
+    required: Tuple[str, ...] = ()
     
-    def __init__(self, node_config: Dict[str, Any], context: Dict[str, Any]):
+    def __init__(
+        self,
+        node_config: Dict[str, Any],
+        context: Dict[str, Any],
+        templates: Optional[Dict[str, Template]] = None
+    ):
         self.config = node_config
         self.context = context
+        self.node_id: Optional[str] = None
         self.variables = context.get('variables', {})
+        self.templates = templates if templates is not None else compile_config(node_config)
+        
+        # Set when the node times out or the execution is cancelled; long
+        # offloaded work can poll it to stop early
+        self.cancel_event = threading.Event()
+        self._work: Dict[Future, ExecutionLane] = {}
     
     async def execute(self) -> Dict[str, Any]:
         """Execute the component logic"""
         raise NotImplementedError
     
-    def resolve_variable(self, value: str) -> Any:
-        """Resolve variable references like ${variable_name}"""
-        if isinstance(value, str) and value.startswith('${') and value.endswith('}'):
-            var_name = value[2:-1]
-            return self.variables.get(var_name, value)
-        return value
+    @classmethod
+    def variable_reads(cls, node_config: Dict[str, Any]) -> Set[str]:
+        """Variables a node with this config reads"""
+        return template_references(compile_config(node_config).values())
+    
+    @classmethod
+    def variable_writes(cls, node_config: Dict[str, Any]) -> Set[str]:
+        """Variables a node with this config writes"""
+        names = set()
+        for key, default in cls.outputs.items():
+            name = node_config.get(key, default)
+            if isinstance(name, str) and name:
+                names.add(name)
+        return names
+    
+    def resolve_variable(self, value: Any) -> Any:
+        """Resolve variable references like ${name}, ${name.path[0]} or text with ${name} in it"""
+        return compile_template(value).resolve(self.variables)
+    
+    def resolve_config(self, key: str, default: Any = None) -> Any:
+        """Resolve a config value through its precompiled template"""
+        template = self.templates.get(key)
+        if template is None:
+            return self.resolve_variable(default)
+        return template.resolve(self.variables)
+    
+    def time_remaining(self) -> Optional[float]:
+        """Seconds left before the flow's deadline, if it has one"""
+        deadline = self.context.get('deadline')
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+    
+    def object_store(self) -> ObjectStore:
+        """The process-wide store gs:// objects are read through"""
+        engine = self.context.get('engine')
+        return get_object_store(engine.config if engine is not None else None)
+    
+    async def offload(self, func, *args, lane: Optional[ExecutionLane] = None, **kwargs) -> Any:
+        """Run blocking work on this executor's lane (or an explicit one)"""
+        pools = self.context.get('pools') or get_executor_pools()
+        lane = lane or self.lane
+        if lane == ExecutionLane.INLINE:
+            return func(*args, **kwargs)
+        
+        future = pools.submit(lane, func, *args, **kwargs)
+        self._work[future] = lane
+        future.add_done_callback(lambda done: self._work.pop(done, None))
+        return await asyncio.wrap_future(future)
+    
+    def cancel_work(self):
+        """Stop this node's pool work after a timeout or cancellation
+        
+        Queued calls are dropped; lanes stuck on running calls are retired.
+        """
+        self.cancel_event.set()
+        pools = self.context.get('pools') or get_executor_pools()
+        running: Dict[ExecutionLane, List[Future]] = {}
+        for future, lane in list(self._work.items()):
+            if not future.cancel():
+                running.setdefault(lane, []).append(future)
+        for lane, futures in running.items():
+            pools.retire(lane, futures)
 
 # =====================================
-# Component Executors
+# Executor Registry
 # =====================================
 
-class FileSearchExecutor(ComponentExecutor):
-    """Executor for file search component"""
+# Entry point group third-party packages register executors under, e.g.
+#   [project.entry-points."agentiqware.executors"]
+#   pdf_reader = "acme_rpa.pdf:PdfReaderExecutor"
+EXECUTOR_ENTRY_POINT_GROUP = 'agentiqware.executors'
+
+@dataclass(frozen=True)
+class ExecutorSpec:
+    """Where a component type's executor lives; imported on first use"""
+    module: str
+    attr: str
+    method: str = 'execute'
     
-    async def execute(self) -> Dict[str, Any]:
-        import glob
-        import os
-        
-        folder = self.resolve_variable(self.config.get('folder', ''))
-        pattern = self.resolve_variable(self.config.get('pattern', '*.*'))
-        include_subfolders = self.config.get('include_subfolders', 'no') == 'yes'
-        
-        if include_subfolders:
-            search_pattern = os.path.join(folder, '**', pattern)
-            files = glob.glob(search_pattern, recursive=True)
-        else:
-            search_pattern = os.path.join(folder, pattern)
-            files = glob.glob(search_pattern)
+    @classmethod
+    def parse(cls, target: str) -> 'ExecutorSpec':
+        """Parse 'package.module:Class' or 'package.module:Class.method'"""
+        module, _, attr = target.partition(':')
+        attr, _, method = attr.partition('.')
+        if not module or not attr:
+            raise ValueError(f"Invalid executor reference: {target}")
+        return cls(module, attr, method or 'execute')
+    
+    def load(self) -> type:
+        """Import the executor class"""
+        return getattr(timed_import(self.module), self.attr)
+
+class ExecutorRegistry:
+    """Component type -> executor mapping with lazy imports and entry point plugins"""
+    
+    def __init__(self):
+        self._specs: Dict[str, ExecutorSpec] = {}
+        self._loaded: Dict[str, Tuple[type, str]] = {}
+        self._lock = threading.Lock()
+        self._entry_points_loaded = False
+    
+    def register(self, node_type: str, executor: Any, method: Optional[str] = None):
+        """Register an executor class, ExecutorSpec or 'module:Class[.method]' string"""
+        with self._lock:
+            self._loaded.pop(node_type, None)
+            if isinstance(executor, ExecutorSpec):
+                self._specs[node_type] = executor
+            elif isinstance(executor, str):
+                spec = ExecutorSpec.parse(executor)
+                self._specs[node_type] = ExecutorSpec(spec.module, spec.attr, method or spec.method)
+            else:
+                self._specs.pop(node_type, None)
+                self._loaded[node_type] = (executor, method or 'execute')
+    
+    def method_for(self, node_type: str) -> str:
+        """Entry method for a component type, without importing its executor"""
+        if node_type in self._loaded:
+            return self._loaded[node_type][1]
+        if node_type not in self._specs:
+            self.load_entry_points()
+        spec = self._specs.get(node_type)
+        return spec.method if spec else 'execute'
+    
+    def get(self, node_type: str) -> Optional[Tuple[type, str]]:
+        """Executor class and entry method for a component type, importing it on first use"""
+        binding = self._loaded.get(node_type)
+        if binding is not None:
+            return binding
+        
+        if node_type not in self._specs:
+            self.load_entry_points()
+        
+        with self._lock:
+            binding = self._loaded.get(node_type)
+            spec = self._specs.get(node_type)
+            if binding is None and spec is not None:
+                binding = (spec.load(), spec.method)
+                self._loaded[node_type] = binding
+            return binding
+    
+    def load_entry_points(self):
+        """Register executors advertised by installed packages (once; built-ins win)"""
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
         
-        # Store result in variable
-        result_var = self.config.get('result', 'file_search_result')
-        self.variables[result_var] = files
+        from importlib.metadata import entry_points
         
-        return {
-            'status': 'success',
-            'files_found': len(files),
-            'result_variable': result_var
-        }
+        try:
+            found = entry_points(group=EXECUTOR_ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10
+            found = entry_points().get(EXECUTOR_ENTRY_POINT_GROUP, [])
+        
+        for entry_point in found:
+            if entry_point.name not in self._specs and entry_point.name not in self._loaded:
+                self.register(entry_point.name, entry_point.value)
+    
+    def types(self) -> List[str]:
+        """Registered component types"""
+        self.load_entry_points()
+        return sorted(set(self._specs) | set(self._loaded))
+    
+    def __contains__(self, node_type: object) -> bool:
+        return node_type in self._loaded or node_type in self._specs
+
+executor_registry = ExecutorRegistry()
+
+def register_executor(node_type: str, executor: Any, method: Optional[str] = None):
+    """Register an executor for a component type in the process-wide registry"""
+    executor_registry.register(node_type, executor, method)
+
+# Built-in executors
+register_executor('file_search', 'services.executors.files:FileSearchExecutor')
+register_executor('dataframe_merge', 'services.executors.dataframes:DataFrameMergeExecutor')
+register_executor('excel_reader', 'services.executors.dataframes:ExcelReaderExecutor')
+register_executor('condition', 'services.executors.logic:ConditionalExecutor')
+register_executor('statements_for', 'services.executors.loops:ForLoopExecutor')
+register_executor('statements_foreach', 'services.executors.loops:ForEachLoopExecutor')
+register_executor('statements_loop', 'services.executors.loops:WhileLoopExecutor')
+register_executor('statements_loop_break', 'services.executors.loops:BreakExecutor')
+register_executor('statements_loop_continue', 'services.executors.loops:ContinueExecutor')
+register_executor('mouse_click', 'services.executors.rpa:RPAAutomationExecutor.execute_mouse_click')
+register_executor('keyboard_input', 'services.executors.rpa:RPAAutomationExecutor.execute_keyboard_input')
+
+# Executor classes stay importable from this module, loaded on access
+_EXECUTOR_EXPORTS = {
+    'FileSearchExecutor': 'file_search',
+    'DataFrameMergeExecutor': 'dataframe_merge',
+    'ExcelReaderExecutor': 'excel_reader',
+    'ConditionalExecutor': 'condition',
+    'ForLoopExecutor': 'statements_for',
+    'ForEachLoopExecutor': 'statements_foreach',
+    'WhileLoopExecutor': 'statements_loop',
+    'RPAAutomationExecutor': 'mouse_click'
+}
+
+# Clients formerly created at import time, now created on first access
+_CLIENT_EXPORTS = {
+    'storage_client': get_storage_client,
+    'publisher': get_publisher_client,
+    'tasks_client': get_tasks_client,
+    'logging_client': get_logging_client
+}
+
+def __getattr__(name: str) -> Any:
+    if name in _EXECUTOR_EXPORTS:
+        return executor_registry.get(_EXECUTOR_EXPORTS[name])[0]
+    if name in _CLIENT_EXPORTS:
+        return _CLIENT_EXPORTS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# =====================================
+# Execution Plan
+# =====================================
 
-class DataFrameMergeExecutor(ComponentExecutor):
-    """Executor for DataFrame merge component"""
+def flow_version_key(flow_data: Dict[str, Any]) -> str:
+    """Identify the version of a flow definition"""
+    version = flow_data.get('version') or flow_data.get('updated_at')
+    if version:
+        return str(version)
     
-    async def execute(self) -> Dict[str, Any]:
-        handler = self.resolve_variable(self.config.get('handler', ''))
-        dataframes_str = self.resolve_variable(self.config.get('dataframes', ''))
-        direction = self.config.get('direction', 'horizontal')
+    # Unversioned definitions are keyed by their content
+    payload = json.dumps(
+        {'nodes': flow_data.get('nodes', []), 'connections': flow_data.get('connections', [])},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def config_flag(value: Any) -> bool:
+    """A yes/no node option; the editor writes 'yes' or 'no', JSON flows may use booleans"""
+    return value is True or value == 'yes'
+
+# Loop node output ports leading into the loop body ('true' is what the editor draws)
+LOOP_BODY_PORTS = ('body', 'true')
+
+def connection_port(conn: Dict[str, Any]) -> str:
+    """Output port a connection leaves its source node from"""
+    return conn.get('fromOutput') or conn.get('condition') or 'default'
+
+def _loop_bodies(connections: List[Dict[str, Any]], loop_ids: List[str]) -> Dict[str, Tuple[Optional[str], Set[str]]]:
+    """Body entry and nodes of each outermost loop
+    
+    A body is everything reachable from the loop's body port up to the
+    connections leading back into the loop node. Loops nested in another
+    loop's body are left for the body's own compile.
+    """
+    successors: Dict[str, List[str]] = {}
+    entries: Dict[str, List[str]] = {loop_id: [] for loop_id in loop_ids}
+    for conn in connections:
+        successors.setdefault(conn.get('from'), []).append(conn.get('to'))
+        if conn.get('from') in entries and connection_port(conn) in LOOP_BODY_PORTS:
+            entries[conn.get('from')].append(conn.get('to'))
+    
+    bodies = {}
+    for loop_id, body_entries in entries.items():
+        body = set()
+        stack = list(body_entries)
+        while stack:
+            node_id = stack.pop()
+            if node_id == loop_id or node_id in body:
+                continue
+            body.add(node_id)
+            stack.extend(successors.get(node_id, []))
+        bodies[loop_id] = (body_entries[0] if body_entries else None, body)
+    
+    nested = set().union(*(body for _, body in bodies.values()))
+    return {loop_id: value for loop_id, value in bodies.items() if loop_id not in nested}
+
+def _topological_order(successors: Dict[str, List[str]], in_degree: Dict[str, int]) -> List[str]:
+    """Nodes in dependency order, ties in definition order; nodes on or after a cycle are left out"""
+    remaining = dict(in_degree)
+    ready = deque(node_id for node_id, degree in remaining.items() if degree == 0)
+    order = []
+    while ready:
+        node_id = ready.popleft()
+        order.append(node_id)
+        for next_node_id in successors.get(node_id, []):
+            remaining[next_node_id] -= 1
+            if remaining[next_node_id] == 0:
+                ready.append(next_node_id)
+    return order
+
+def _components(successors: Dict[str, List[str]]) -> List[List[str]]:
+    """Disconnected parts of a graph, each in definition order, ordered by their first node"""
+    parent = {node_id: node_id for node_id in successors}
+    
+    def find(node_id: str) -> str:
+        while parent[node_id] != node_id:
+            parent[node_id] = parent[parent[node_id]]
+            node_id = parent[node_id]
+        return node_id
+    
+    for node_id, next_node_ids in successors.items():
+        for next_node_id in next_node_ids:
+            parent[find(next_node_id)] = find(node_id)
+    
+    components: Dict[str, List[str]] = {}
+    for node_id in successors:
+        components.setdefault(find(node_id), []).append(node_id)
+    return list(components.values())
+
+def _component_waits(touches: List[Tuple[Set[str], Set[str], bool]]) -> Dict[int, List[int]]:
+    """Earlier components each component must wait for, given what each reads, writes and whether it uses the desktop
+    
+    Components conflict when one writes a variable the other reads or
+    writes, or both drive the desktop (UI lane). Waiting on the last
+    conflicting component per variable is enough: the waits chain.
+    """
+    last_writer: Dict[str, int] = {}
+    readers: Dict[str, List[int]] = {}
+    last_ui: Optional[int] = None
+    waits = {}
+    for index, (reads, writes, ui) in enumerate(touches):
+        after = {last_writer[name] for name in reads | writes if name in last_writer}
+        for name in writes:
+            after.update(readers.get(name, []))
+        if ui and last_ui is not None:
+            after.add(last_ui)
+        after.discard(index)
+        if after:
+            waits[index] = sorted(after)
+        
+        for name in writes:
+            last_writer[name] = index
+            readers[name] = []
+        for name in reads - writes:
+            readers.setdefault(name, []).append(index)
+        if ui:
+            last_ui = index
+    return waits
+
+def _branch_ordering(
+    order: List[str],
+    successors: Dict[str, List[str]],
+    reads: Dict[str, Set[str]],
+    writes: Dict[str, Set[str]],
+    component_of: Dict[str, int]
+) -> Dict[str, List[str]]:
+    """Ordering-only connections that serialize branches of a component sharing variables
+    
+    Two nodes of one component touching the same variable, at least one
+    writing it, that no path orders are on parallel branches (separate
+    components are ordered by _component_waits instead). The later one (in topological
+    order) waits for the earlier one and for the nodes after it that touch
+    the variable and that the later one does not lead to, so one branch is
+    done with the variable before the other starts.
+    """
+    ordering: Dict[str, List[str]] = {}
+    
+    def reaches(source: str, target: str) -> bool:
+        seen = {source}
+        stack = [source]
+        while stack:
+            node_id = stack.pop()
+            if node_id == target:
+                return True
+            for next_node_id in successors.get(node_id, []) + ordering.get(node_id, []):
+                if next_node_id not in seen:
+                    seen.add(next_node_id)
+                    stack.append(next_node_id)
+        return False
+    
+    touching: Dict[str, List[str]] = {}
+    for node_id in order:
+        for name in sorted(reads.get(node_id, set()) | writes.get(node_id, set())):
+            touching.setdefault(name, []).append(node_id)
+    
+    for name, members in touching.items():
+        for index, later in enumerate(members):
+            for earlier in members[:index]:
+                if component_of[earlier] != component_of[later]:
+                    continue
+                if name not in writes.get(earlier, ()) and name not in writes.get(later, ()):
+                    continue
+                if reaches(earlier, later) or reaches(later, earlier):
+                    continue
+                for node_id in members:
+                    if node_id == later or not (node_id == earlier or reaches(earlier, node_id)):
+                        continue
+                    if not reaches(later, node_id) and not reaches(node_id, later):
+                        ordering.setdefault(node_id, []).append(later)
+    return ordering
+
+@dataclass
+class FlowPlan:
+    """Compiled, indexed form of a flow definition"""
+    flow_id: str
+    version: str
+    nodes: Dict[str, Dict[str, Any]]
+    adjacency: Dict[str, Dict[str, List[str]]]
+    successors: Dict[str, List[str]]
+    in_degree: Dict[str, int]
+    executors: Dict[str, Optional[Tuple[type, str]]]
+    entry_node_id: Optional[str] = None
+    templates: Dict[str, Dict[str, Template]] = field(default_factory=dict)
+    reads: Dict[str, Set[str]] = field(default_factory=dict)
+    writes: Dict[str, Set[str]] = field(default_factory=dict)
+    readers: Dict[str, Set[str]] = field(default_factory=dict)
+    retained: Set[str] = field(default_factory=set)
+    cached: Set[str] = field(default_factory=set)
+    loops: Dict[str, 'FlowPlan'] = field(default_factory=dict)
+    loop_of: Dict[str, str] = field(default_factory=dict)
+    
+    # Every node without inputs, the topological order, and the disconnected
+    # components with the earlier components each must wait for
+    roots: List[str] = field(default_factory=list)
+    order: List[str] = field(default_factory=list)
+    components: List[List[str]] = field(default_factory=list)
+    component_of: Dict[str, int] = field(default_factory=dict)
+    component_waits: Dict[int, List[int]] = field(default_factory=dict)
+    
+    # Ordering-only connections between parallel branches that share
+    # variables: node -> nodes that wait for it without being activated by it
+    ordering: Dict[str, List[str]] = field(default_factory=dict)
+    
+    validation: Optional['ValidationReport'] = field(default=None, repr=False)
+    _pending_counts: Dict[Tuple[str, ...], Dict[str, int]] = field(default_factory=dict, repr=False)
+    
+    @classmethod
+    def compile(
+        cls,
+        flow_id: str,
+        flow_data: Dict[str, Any],
+        executors: Optional[Dict[str, type]] = None
+    ) -> 'FlowPlan':
+        """Build the node index, port adjacency, in-degrees and executor bindings
+        
+        executors overrides the registry for some component types; only the
+        types the flow uses are imported. Loop bodies are compiled into their
+        own sub-plans, and the outer graph keeps just the loop node.
+        """
+        executors = executors or {}
+        nodes = {}
+        for node in flow_data.get('nodes', []):
+            nodes[node.get('id')] = node
+        connections = [
+            conn for conn in flow_data.get('connections', [])
+            if conn.get('from') in nodes and conn.get('to') in nodes
+        ]
         
-        # Parse dataframe references
-        df_names = [df.strip() for df in dataframes_str.split(',')]
-        dataframes = []
+        def bind(node_type: str) -> Optional[Tuple[type, str]]:
+            if node_type in executors:
+                return (executors[node_type], executor_registry.method_for(node_type))
+            return executor_registry.get(node_type)
         
-        for df_name in df_names:
-            if df_name in self.variables:
-                dataframes.append(self.variables[df_name])
+        # Loop bodies: compiled once here, scheduled again on every iteration
+        loop_ids = [
+            node_id for node_id, node in nodes.items()
+            if getattr((bind(node.get('type')) or (None,))[0], 'has_body', False)
+        ]
+        loops = {}
+        in_body = set()
+        for loop_id, (entry_id, body_ids) in _loop_bodies(connections, loop_ids).items():
+            body_flow = {
+                'nodes': [node for node_id, node in nodes.items() if node_id in body_ids],
+                'connections': [
+                    conn for conn in connections
+                    if conn.get('from') in body_ids and conn.get('to') in body_ids
+                ],
+                'cache_results': flow_data.get('cache_results', False)
+            }
+            body = cls.compile(f"{flow_id}/{loop_id}", body_flow, executors)
+            body.entry_node_id = entry_id
+            loops[loop_id] = body
+            
+            # Including nested loops' bodies, which the body's plan cut out in turn
+            in_body |= body_ids
         
-        if not dataframes:
-            raise ValueError("No dataframes found to merge")
+        if loops:
+            nodes = {node_id: node for node_id, node in nodes.items() if node_id not in in_body}
+            connections = [
+                conn for conn in connections
+                if conn.get('from') in nodes and conn.get('to') in nodes
+                and not (conn.get('from') in loops and connection_port(conn) in LOOP_BODY_PORTS)
+            ]
         
-        # Merge dataframes
-        if direction == 'horizontal':
-            result_df = pd.concat(dataframes, axis=1)
-        else:
-            result_df = pd.concat(dataframes, axis=0, ignore_index=True)
+        adjacency = {node_id: {} for node_id in nodes}
+        successors = {node_id: [] for node_id in nodes}
+        in_degree = {node_id: 0 for node_id in nodes}
         
-        # Store result
-        self.variables[handler] = result_df
+        for conn in connections:
+            from_node = conn.get('from')
+            to_node = conn.get('to')
+            adjacency[from_node].setdefault(connection_port(conn), []).append(to_node)
+            successors[from_node].append(to_node)
+            in_degree[to_node] += 1
+        
+        bindings = {}
+        templates = {}
+        reads = {}
+        writes = {}
+        readers = {}
+        cached = set()
+        for node_id, node in nodes.items():
+            node_type = node.get('type')
+            node_config = node.get('data') or {}
+            bindings[node_id] = bind(node_type)
+            executor_class = bindings[node_id][0] if bindings[node_id] else None
+            
+            # Config templates are parsed once here, not on every resolve
+            templates[node_id] = compile_config(node_config)
+            
+            # Variable flow, used to free variables nothing downstream reads
+            executor_class = executor_class or ComponentExecutor
+            reads[node_id] = executor_class.variable_reads(node_config)
+            writes[node_id] = executor_class.variable_writes(node_config)
+            if node_id in loops:
+                # A loop reads and writes whatever its body does
+                reads[node_id] = reads[node_id].union(*loops[node_id].reads.values())
+                writes[node_id] = writes[node_id].union(*loops[node_id].writes.values())
+            for name in reads[node_id]:
+                readers.setdefault(name, set()).add(node_id)
+            
+            # Result memoization is opt-in, per node or for the whole flow
+            if executor_class.cacheable and config_flag(node_config.get('cache', flow_data.get('cache_results'))):
+                cached.add(node_id)
+        
+        # Body nodes are executed through this plan too, so index them here
+        loop_of = {}
+        for loop_id, body in list(loops.items()):
+            bindings.update(body.executors)
+            templates.update(body.templates)
+            reads.update(body.reads)
+            writes.update(body.writes)
+            cached |= body.cached
+            loop_of.update({node_id: loop_id for node_id in body.executors})
+            loop_of.update(body.loop_of)
+            loops.update(body.loops)
+        
+        # Runs start from every node with no incoming connections; a graph
+        # that is all cycle starts from its first node
+        roots = [node_id for node_id in nodes if in_degree[node_id] == 0]
+        if not roots and nodes:
+            roots = [next(iter(nodes))]
+        
+        # Disconnected components run side by side unless they share
+        # variables or the desktop, in which case definition order decides
+        components = _components(successors)
+        ui_nodes = set()
+        for node_id, binding in bindings.items():
+            if binding and getattr(binding[0], 'lane', None) == ExecutionLane.UI:
+                while node_id not in nodes:
+                    node_id = loop_of[node_id]
+                ui_nodes.add(node_id)
+        touches = [
+            (
+                set().union(*(reads[node_id] for node_id in members)),
+                set().union(*(writes[node_id] for node_id in members)),
+                any(node_id in ui_nodes for node_id in members)
+            )
+            for members in components
+        ]
         
-        return {
-            'status': 'success',
-            'merged_shape': result_df.shape,
-            'result_variable': handler
-        }
+        order = _topological_order(successors, in_degree)
+        component_of = {node_id: index for index, members in enumerate(components) for node_id in members}
+        
+        return cls(
+            flow_id=flow_id,
+            version=flow_version_key(flow_data),
+            nodes=nodes,
+            adjacency=adjacency,
+            successors=successors,
+            in_degree=in_degree,
+            executors=bindings,
+            entry_node_id=roots[0] if roots else None,
+            templates=templates,
+            reads=reads,
+            writes=writes,
+            readers=readers,
+            retained=set(flow_data.get('output_variables', [])),
+            cached=cached,
+            loops=loops,
+            loop_of=loop_of,
+            roots=roots,
+            order=order,
+            components=components,
+            component_of=component_of,
+            component_waits=_component_waits(touches),
+            ordering=_branch_ordering(order, successors, reads, writes, component_of)
+        )
+    
+    def pending_counts(self, *node_ids: str) -> Dict[str, int]:
+        """Incoming connection counts of the nodes reachable from the start nodes (memoized per start)"""
+        counts = self._pending_counts.get(node_ids)
+        if counts is None:
+            # Only connections from nodes reachable from the start can resolve
+            reachable = set(node_ids)
+            stack = list(node_ids)
+            while stack:
+                for next_node_id in self.next_nodes(stack.pop()):
+                    if next_node_id not in reachable:
+                        reachable.add(next_node_id)
+                        stack.append(next_node_id)
+            
+            counts = {reachable_id: 0 for reachable_id in reachable}
+            for reachable_id in reachable:
+                for next_node_id in self.next_nodes(reachable_id):
+                    counts[next_node_id] += 1
+            for node_id in node_ids:
+                counts[node_id] = 0
+            
+            # Start nodes can still have to wait for a parallel branch
+            for reachable_id in reachable:
+                for next_node_id in self.ordering.get(reachable_id, []):
+                    if next_node_id in counts:
+                        counts[next_node_id] += 1
+            for node_id in node_ids:
+                if not counts[node_id]:
+                    del counts[node_id]
+            self._pending_counts[node_ids] = counts
+        return dict(counts)
+    
+    def next_nodes(self, node_id: str, port: Optional[str] = None) -> List[str]:
+        """Get downstream node ids, optionally restricted to one output port"""
+        if port is None:
+            return self.successors.get(node_id, [])
+        return self.adjacency.get(node_id, {}).get(port, [])
+
+# =====================================
+# Flow Definition Cache
+# =====================================
 
-class ExcelReaderExecutor(ComponentExecutor):
-    """Executor for Excel reader component"""
+@dataclass
+class CachedFlow:
+    """A flow definition and its compiled plan"""
+    flow_id: str
+    version: str
+    definition: Dict[str, Any]
+    plan: Optional[FlowPlan] = None
     
-    async def execute(self) -> Dict[str, Any]:
-        file_name = self.resolve_variable(self.config.get('excel_file_name', ''))
-        sheet_name = self.resolve_variable(self.config.get('sheet_name', 'Sheet1'))
-        destination = self.config.get('destination', 'excel_data')
-        
-        # Read Excel file
-        if file_name.startswith('gs://'):
-            # Read from Google Cloud Storage
-            bucket_name = file_name.split('/')[2]
-            blob_path = '/'.join(file_name.split('/')[3:])
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(blob_path)
-            content = blob.download_as_bytes()
-            df = pd.read_excel(content, sheet_name=sheet_name)
-        else:
-            # Read from local file
-            df = pd.read_excel(file_name, sheet_name=sheet_name)
+    # Executor overrides the plan was bound with; other overrides compile their own
+    plan_executors: FrozenSet[Tuple[str, type]] = frozenset()
+    validated_at: float = 0.0
+
+class FlowDefinitionCache:
+    """In-process LRU + TTL cache in front of flows/{flow_id} reads
+    
+    Entries are trusted for ttl_seconds after they were last read from
+    Firestore. Re-reading an unchanged version keeps the compiled plan.
+    """
+    
+    def __init__(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size or FlowEngineConfig.FLOW_CACHE_SIZE
+        self.ttl_seconds = FlowEngineConfig.FLOW_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._entries: 'OrderedDict[str, CachedFlow]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, flow_id: str) -> Optional[CachedFlow]:
+        """Get a cached flow if it was validated within the TTL"""
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            if entry is None or time.monotonic() - entry.validated_at > self.ttl_seconds:
+                return None
+            self._entries.move_to_end(flow_id)
+            return entry
+    
+    def put(self, flow_id: str, definition: Dict[str, Any]) -> CachedFlow:
+        """Store a freshly read definition, keeping the plan if the version is unchanged"""
+        version = flow_version_key(definition)
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            if entry is None or entry.version != version:
+                entry = CachedFlow(flow_id=flow_id, version=version, definition=definition)
+                self._entries[flow_id] = entry
+            entry.validated_at = time.monotonic()
+            self._entries.move_to_end(flow_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return entry
+    
+    def plan_for(
+        self,
+        flow_id: str,
+        definition: Dict[str, Any],
+        executors: Optional[Dict[str, type]] = None
+    ) -> FlowPlan:
+        """Get the compiled plan for a definition, compiling it once per version and executor overrides"""
+        version = flow_version_key(definition)
+        overrides = frozenset((executors or {}).items())
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            if (
+                entry is not None and entry.version == version and entry.plan is not None
+                and entry.plan_executors == overrides
+            ):
+                self._entries.move_to_end(flow_id)
+                return entry.plan
+        
+        plan = FlowPlan.compile(flow_id, definition, executors)
+        
+        with self._lock:
+            entry = self._entries.get(flow_id)
+            if entry is None or entry.version != version:
+                entry = CachedFlow(flow_id=flow_id, version=version, definition=definition)
+                self._entries[flow_id] = entry
+            entry.plan = plan
+            entry.plan_executors = overrides
+            self._entries.move_to_end(flow_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        
+        return plan
+    
+    def invalidate(self, flow_id: Optional[str] = None):
+        """Drop one flow, or every flow when no id is given"""
+        with self._lock:
+            if flow_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(flow_id, None)
+    
+    def watch(self, client=None):
+        """Invalidate entries when flows documents change in Firestore
         
-        # Store in variables
-        self.variables[destination] = df
+        Useful when several instances share the same flows. Returns the
+        Firestore watch so the caller can unsubscribe().
+        """
+        def on_change(col_snapshot, changes, read_time):
+            for change in changes:
+                if change.type.name in ('MODIFIED', 'REMOVED'):
+                    self.invalidate(change.document.id)
         
+        return (client or get_db()).collection('flows').on_snapshot(on_change)
+
+flow_cache = FlowDefinitionCache()
+
+# =====================================
+# Flow Validation
+# =====================================
+
+@dataclass
+class ValidationIssue:
+    """A problem found in a flow definition; errors keep it from running"""
+    code: str
+    message: str
+    node_id: Optional[str] = None
+    severity: str = 'error'
+    
+    # Variable an undefined_variable issue is about; inputs given at run time clear it
+    variable: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+@dataclass
+class ValidationReport:
+    """Issues found in a flow definition, with a runtime estimate when stats were given"""
+    issues: List[ValidationIssue] = field(default_factory=list)
+    estimate: Optional[Dict[str, Any]] = None
+    
+    def errors(self, inputs: Iterable[str] = ()) -> List[ValidationIssue]:
+        """Errors left when the given variables are set before the flow starts"""
+        inputs = set(inputs)
+        return [
+            issue for issue in self.issues
+            if issue.severity == 'error' and (issue.variable is None or issue.variable not in inputs)
+        ]
+    
+    @property
+    def warnings(self) -> List[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == 'warning']
+    
+    def to_dict(self, inputs: Iterable[str] = ()) -> Dict[str, Any]:
+        errors = self.errors(inputs)
         return {
-            'status': 'success',
-            'rows': len(df),
-            'columns': len(df.columns),
-            'result_variable': destination
+            'valid': not errors,
+            'errors': [issue.to_dict() for issue in errors],
+            'warnings': [issue.to_dict() for issue in self.warnings],
+            'estimate': self.estimate
         }
 
-class ConditionalExecutor(ComponentExecutor):
-    """Executor for conditional branching"""
+class FlowValidationError(ValueError):
+    """A flow failed validation; raised before any of its nodes runs"""
     
-    async def execute(self) -> Dict[str, Any]:
-        left_value = self.resolve_variable(self.config.get('left_value', ''))
-        operator = self.config.get('operator', '==')
-        right_value = self.resolve_variable(self.config.get('right_value', ''))
-        
-        # Evaluate condition
-        result = False
-        if operator == '==':
-            result = left_value == right_value
-        elif operator == '!=':
-            result = left_value != right_value
-        elif operator == '>':
-            result = float(left_value) > float(right_value)
-        elif operator == '<':
-            result = float(left_value) < float(right_value)
-        elif operator == '>=':
-            result = float(left_value) >= float(right_value)
-        elif operator == '<=':
-            result = float(left_value) <= float(right_value)
-        elif operator == 'contains':
-            result = str(right_value) in str(left_value)
-        
+    def __init__(self, issues: List[ValidationIssue]):
+        self.issues = issues
+        summary = '; '.join(issue.message for issue in issues[:3])
+        more = f" (and {len(issues) - 3} more)" if len(issues) > 3 else ''
+        super().__init__(f"Invalid flow: {summary}{more}")
+
+def _on_cycles(plan: FlowPlan, leftover: Set[str]) -> Set[str]:
+    """Narrow the nodes left out of the plan's order to those on (or between) cycles"""
+    remaining = set(leftover)
+    changed = True
+    while changed:
+        changed = False
+        for node_id in list(remaining):
+            if not any(next_node_id in remaining for next_node_id in plan.successors.get(node_id, [])):
+                remaining.discard(node_id)
+                changed = True
+    return remaining
+
+def _reachable(plan: FlowPlan, starts: Iterable[str]) -> Set[str]:
+    reachable = set()
+    stack = list(starts)
+    while stack:
+        node_id = stack.pop()
+        if node_id not in reachable:
+            reachable.add(node_id)
+            stack.extend(plan.successors.get(node_id, []))
+    return reachable
+
+TYPE_NAMES = {str: 'a string', dict: 'an object', list: 'a list'}
+
+def _shape_issues(flow_data: Dict[str, Any]) -> List[ValidationIssue]:
+    """Fields of the wrong JSON type; the other checks assume there are none"""
+    issues = []
+    for key in ('nodes', 'connections', 'inputs'):
+        if key in flow_data and not isinstance(flow_data[key], list):
+            issues.append(ValidationIssue('invalid_type', f"Flow {key} must be a list"))
+    if issues:
+        return issues
+    
+    for index, node in enumerate(flow_data.get('nodes', [])):
+        if not isinstance(node, dict):
+            issues.append(ValidationIssue('invalid_type', f"Node #{index} must be an object"))
+            continue
+        node_id = node.get('id') if isinstance(node.get('id'), str) else None
+        for key, expected in (('id', str), ('type', str), ('data', dict)):
+            if node.get(key) is not None and not isinstance(node[key], expected):
+                issues.append(ValidationIssue(
+                    'invalid_type', f"Node {node_id or '#' + str(index)} {key} must be {TYPE_NAMES[expected]}", node_id
+                ))
+    
+    for index, conn in enumerate(flow_data.get('connections', [])):
+        if not isinstance(conn, dict):
+            issues.append(ValidationIssue('invalid_type', f"Connection #{index} must be an object"))
+            continue
+        for key in ('from', 'to', 'fromOutput'):
+            if conn.get(key) is not None and not isinstance(conn[key], str):
+                issues.append(ValidationIssue('invalid_type', f"Connection #{index} {key} must be a string"))
+    
+    for index, name in enumerate(flow_data.get('inputs', [])):
+        if not isinstance(name, str):
+            issues.append(ValidationIssue('invalid_type', f"Flow input #{index} must be a variable name"))
+    return issues
+
+def validate_flow_definition(
+    flow_data: Dict[str, Any],
+    executors: Optional[Dict[str, type]] = None,
+    plan: Optional[FlowPlan] = None,
+    stats: Optional[Dict[str, TimingStats]] = None
+) -> ValidationReport:
+    """Check a flow definition without running it
+    
+    Errors: fields of the wrong type (nothing else is checked then), nodes
+    without an id or type, duplicate ids, connections to missing nodes,
+    unknown component types, missing required config, output variable names
+    that aren't strings, break/continue outside a loop body, cycles not
+    broken by a loop node and variables no node sets (unless listed in the
+    flow's inputs). Warnings: nodes the run never reaches. With stats, the
+    report includes a runtime estimate.
+    """
+    issues = _shape_issues(flow_data)
+    if issues:
+        return ValidationReport(issues)
+    
+    nodes = {}
+    for index, node in enumerate(flow_data.get('nodes', [])):
+        node_id = node.get('id')
+        if not node_id:
+            issues.append(ValidationIssue('missing_id', f"Node #{index} has no id"))
+            continue
+        if node_id in nodes:
+            issues.append(ValidationIssue('duplicate_node', f"Node id {node_id} is used more than once", node_id))
+        if not node.get('type'):
+            issues.append(ValidationIssue('missing_type', f"Node {node_id} has no type", node_id))
+        nodes[node_id] = node
+    
+    for conn in flow_data.get('connections', []):
+        for end in ('from', 'to'):
+            if conn.get(end) not in nodes:
+                issues.append(ValidationIssue(
+                    'dangling_connection',
+                    f"Connection {conn.get('from')} -> {conn.get('to')} refers to missing node {conn.get(end)}",
+                    conn.get('from') if end == 'to' else conn.get('to')
+                ))
+    
+    plan = plan or FlowPlan.compile(flow_data.get('id', 'validation'), flow_data, executors)
+    
+    # Types and required config; body nodes are bound in the plan too
+    reads = {}
+    for node_id, binding in plan.executors.items():
+        node = nodes.get(node_id)
+        if node is None:
+            continue
+        config = node.get('data') or {}
+        if binding is None:
+            if node.get('type'):
+                issues.append(ValidationIssue(
+                    'unknown_type', f"Node {node_id} has unknown component type {node.get('type')}", node_id
+                ))
+            reads[node_id] = ComponentExecutor.variable_reads(config)
+            continue
+        
+        executor_class = binding[0]
+        reads[node_id] = executor_class.variable_reads(config)
+        for key in executor_class.required:
+            if config.get(key) in (None, ''):
+                issues.append(ValidationIssue(
+                    'missing_parameter', f"Node {node_id} ({node.get('type')}) needs {key}", node_id
+                ))
+        for key in executor_class.outputs:
+            if not isinstance(config.get(key, ''), str):
+                issues.append(ValidationIssue(
+                    'invalid_parameter', f"Node {node_id} ({node.get('type')}) {key} must be a variable name", node_id
+                ))
+        if executor_class.loop_control and node_id not in plan.loop_of:
+            issues.append(ValidationIssue(
+                'loop_control_outside_loop', f"Node {node_id} ({node.get('type')}) is not inside a loop body", node_id
+            ))
+    
+    # Loop bodies were cut out of the graph, so any cycle left has no loop node
+    for scope in [plan, *plan.loops.values()]:
+        cyclic = _on_cycles(scope, set(scope.nodes) - set(scope.order))
+        if cyclic:
+            issues.append(ValidationIssue(
+                'cycle', f"Nodes {', '.join(sorted(cyclic))} form a cycle without a loop node", sorted(cyclic)[0]
+            ))
+    
+    unreachable = set(plan.nodes) - _reachable(plan, plan.roots)
+    for body in plan.loops.values():
+        unreachable |= set(body.nodes) - _reachable(body, body.roots)
+    for node_id in sorted(unreachable):
+        issues.append(ValidationIssue(
+            'unreachable_node', f"Node {node_id} is only reachable through a cycle and never runs",
+            node_id, severity='warning'
+        ))
+    
+    written = set(flow_data.get('inputs', [])).union(*plan.writes.values())
+    for node_id in sorted(reads):
+        for name in sorted(reads[node_id] - written):
+            issues.append(ValidationIssue(
+                'undefined_variable', f"Node {node_id} reads ${{{name}}}, which no node sets", node_id, variable=name
+            ))
+    
+    report = ValidationReport(issues)
+    if stats is not None:
+        report.estimate = estimate_runtime(plan, stats)
+    return report
+
+def _constant_iterations(config: Dict[str, Any]) -> Optional[int]:
+    """Iterations of a loop whose bounds or collection are literal, else None"""
+    if isinstance(config.get('collection'), list):
+        return len(config['collection'])
+    try:
+        start = float(config.get('start_from', 0))
+        end = float(config['end_to'])
+        step = float(config.get('step', 1) or 1)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(int((end - start) // step) + 1, 0)
+
+def estimate_runtime(plan: FlowPlan, stats: Dict[str, TimingStats]) -> Dict[str, Any]:
+    """Expected run time from the historical mean run time of each component type
+    
+    Independent branches run concurrently, so the estimate is the slowest
+    path through the graph. Loop nodes with no history of their own cost
+    their body once per iteration when the count is literal (once otherwise).
+    """
+    unestimated = set()
+    approximate = False
+    
+    def node_ms(node_id: str, node: Dict[str, Any]) -> float:
+        nonlocal approximate
+        timing = stats.get(node.get('type'))
+        if timing is not None and timing.count:
+            return timing.mean_ms
+        if node_id in plan.loops:
+            iterations = _constant_iterations(node.get('data') or {})
+            approximate = approximate or iterations is None
+            return slowest_path(plan.loops[node_id])[0] * (1 if iterations is None else iterations)
+        unestimated.add(node.get('type'))
+        return 0.0
+    
+    def slowest_path(scope: FlowPlan) -> Tuple[float, List[str]]:
+        predecessors: Dict[str, List[str]] = {}
+        for node_id, next_node_ids in scope.successors.items():
+            for next_node_id in next_node_ids:
+                predecessors.setdefault(next_node_id, []).append(node_id)
+        
+        finish: Dict[str, Tuple[float, Optional[str]]] = {}
+        for node_id in scope.order:
+            start, previous = max(
+                ((finish[p][0], p) for p in predecessors.get(node_id, []) if p in finish),
+                default=(0.0, None)
+            )
+            finish[node_id] = (start + node_ms(node_id, scope.nodes[node_id]), previous)
+        if not finish:
+            return 0.0, []
+        
+        node_id = max(finish, key=lambda key: finish[key][0])
+        total = finish[node_id][0]
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = finish[node_id][1]
+        return total, path[::-1]
+    
+    total_ms, path = slowest_path(plan)
+    return {
+        'seconds': round(total_ms / 1000, 3),
+        'critical_path': path,
+        'unestimated_types': sorted(node_type for node_type in unestimated if node_type),
+        'approximate': approximate or bool(unestimated)
+    }
+
+# Historical per-type run times, fed by finished executions
+component_stats = ComponentStatsStore(get_db)
+
+# =====================================
+# Scheduler
+# =====================================
+
+@dataclass
+class SchedulerState:
+    """Inspectable state of a flow run"""
+    status: str = 'pending'
+    ready: deque = field(default_factory=deque)
+    running: List[str] = field(default_factory=list)
+    completed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    pending: Dict[str, int] = field(default_factory=dict)
+    activated: Dict[str, int] = field(default_factory=dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable snapshot of the scheduler state"""
         return {
-            'status': 'success',
-            'condition_result': result,
-            'next_branch': 'true' if result else 'false'
+            'status': self.status,
+            'ready': list(self.ready),
+            'running': list(self.running),
+            'completed': list(self.completed),
+            'skipped': list(self.skipped),
+            'pending': dict(self.pending),
+            'activated': dict(self.activated)
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SchedulerState':
+        """Rebuild a state from a to_dict() snapshot"""
+        return cls(
+            status=data.get('status', 'pending'),
+            ready=deque(data.get('ready', [])),
+            running=list(data.get('running', [])),
+            completed=list(data.get('completed', [])),
+            skipped=list(data.get('skipped', [])),
+            pending=dict(data.get('pending', {})),
+            activated=dict(data.get('activated', {}))
+        )
 
-class RPAAutomationExecutor(ComponentExecutor):
-    """Base executor for RPA automation components"""
+class NodeTimeoutError(TimeoutError):
+    """A node ran past its timeout or the flow's deadline"""
     
-    async def execute_mouse_click(self) -> Dict[str, Any]:
-        import pyautogui
-        
-        x = int(self.resolve_variable(self.config.get('x', 0)))
-        y = int(self.resolve_variable(self.config.get('y', 0)))
-        button = self.config.get('button', 'left')
-        clicks = int(self.config.get('clicks', 1))
-        
-        pyautogui.click(x=x, y=y, button=button, clicks=clicks)
+    def __init__(self, node_id: str, seconds: float, reason: str = 'timeout'):
+        limit = 'flow deadline' if reason == 'deadline' else f'{seconds:g}s timeout'
+        super().__init__(f"Node {node_id} exceeded the {limit}")
+        self.node_id = node_id
+        self.seconds = seconds
+        self.reason = reason
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {'node_id': self.node_id, 'seconds': self.seconds, 'reason': self.reason}
+
+class LoopControl(Exception):
+    """Raised by break and continue nodes to end the current loop iteration"""
+    
+    def __init__(self, action: str):
+        super().__init__(action)
+        self.action = action
+
+class FlowScheduler:
+    """Ready-queue DAG scheduler over a compiled flow plan
+    
+    A node becomes ready once every incoming connection is resolved. A
+    connection is active when its source ran and took that output port, and
+    dead when the source was skipped or took another branch. Nodes with only
+    dead inputs are skipped, so join nodes run exactly once. Ready nodes run
+    concurrently up to max_concurrency.
+    
+    A run from the plan's roots covers every disconnected component. The
+    roots of a component that must wait for earlier ones (plan.component_waits)
+    stay pending until those components have finished. Ordering-only
+    connections (plan.ordering) hold a node back until the other branch's
+    nodes have run or been skipped, but never activate or kill it.
+    """
+    
+    def __init__(
+        self,
+        plan: FlowPlan,
+        run_node,
+        state: Optional[SchedulerState] = None,
+        max_concurrency: Optional[int] = None,
+        on_skip=None,
+        on_complete=None,
+        on_dispatch=None
+    ):
+        self.plan = plan
+        self.run_node = run_node
+        self.on_skip = on_skip
+        self.on_complete = on_complete
+        self.on_dispatch = on_dispatch
+        self.state = state or SchedulerState()
+        self.max_concurrency = max(1, max_concurrency or FlowEngineConfig.MAX_CONCURRENCY)
+        self._pause_requested = False
+        
+        # When each ready node was queued, for on_dispatch(node_id, seconds_waited)
+        self._ready_since: Dict[str, float] = {}
+        
+        # Nodes of each component not yet run or skipped, and who waits on it
+        finished = set(self.state.completed) | set(self.state.skipped)
+        self._component_left = [
+            sum(1 for node_id in members if node_id not in finished) for members in plan.components
+        ]
+        self._waiters: Dict[int, List[int]] = {}
+        for index, waits in plan.component_waits.items():
+            for earlier in waits:
+                self._waiters.setdefault(earlier, []).append(index)
+    
+    def start(self, node_ids: Union[str, Iterable[str], None] = None):
+        """Queue the nodes the run starts from: by default every root of the plan"""
+        if isinstance(node_ids, str):
+            node_ids = [node_ids]
+        from_roots = node_ids is None
+        node_ids = tuple(self.plan.roots if from_roots else node_ids)
+        if not node_ids:
+            return
         
-        return {
-            'status': 'success',
-            'action': 'mouse_click',
-            'position': {'x': x, 'y': y}
-        }
+        self.state.pending = self.plan.pending_counts(*node_ids)
+        now = time.perf_counter()
+        for node_id in node_ids:
+            waits = self.plan.component_waits.get(self.plan.component_of.get(node_id)) if from_roots else None
+            if waits or node_id in self.state.pending:
+                # Released by _node_finished once the earlier components are
+                # done, and by _resolve_outputs after branches it is ordered behind
+                self.state.pending[node_id] = self.state.pending.get(node_id, 0) + len(waits or ())
+                self.state.activated[node_id] = 1
+            else:
+                self.state.ready.append(node_id)
+                self._ready_since[node_id] = now
+    
+    def pause(self):
+        """Stop starting new nodes; running nodes are allowed to finish"""
+        self._pause_requested = True
     
-    async def execute_keyboard_input(self) -> Dict[str, Any]:
-        import pyautogui
+    async def run(self) -> SchedulerState:
+        """Run queued nodes until the graph drains or a pause is requested"""
+        state = self.state
+        state.status = 'running'
+        self._pause_requested = False
+        tasks: Dict[asyncio.Task, str] = {}
         
-        text = self.resolve_variable(self.config.get('text', ''))
-        delay = float(self.config.get('delay', 0.1))
-        special_keys = self.config.get('special_keys', [])
+        # Nodes left running by a paused or interrupted run start over
+        state.ready.extendleft(reversed(state.running))
+        state.running = []
         
-        # Handle special keys
-        for key in special_keys:
-            pyautogui.press(key)
+        try:
+            while state.ready or tasks:
+                while state.ready and len(tasks) < self.max_concurrency and not self._pause_requested:
+                    node_id = state.ready.popleft()
+                    state.running.append(node_id)
+                    if self.on_dispatch:
+                        now = time.perf_counter()
+                        self.on_dispatch(node_id, now - self._ready_since.pop(node_id, now))
+                    task = asyncio.ensure_future(self.run_node(self.plan.nodes[node_id]))
+                    tasks[task] = node_id
+                
+                if not tasks:
+                    break
+                
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = tasks.pop(task)
+                    result = task.result()
+                    state.running.remove(node_id)
+                    state.completed.append(node_id)
+                    self._node_finished(node_id)
+                    self._resolve_outputs(node_id, result.get('next_branch') if result else None)
+                    if self.on_complete:
+                        # Node boundary: the state is consistent for this node
+                        await self.on_complete(node_id)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            state.status = 'failed'
+            raise
         
-        # Type text
-        pyautogui.typewrite(text, interval=delay)
+        state.status = 'paused' if state.ready else 'completed'
+        return state
+    
+    def _resolve_outputs(self, node_id: str, branch: Optional[str]):
+        """Resolve outgoing connections and release nodes whose inputs are all resolved"""
+        state = self.state
+        resolving = [(node_id, branch, False)]
+        
+        while resolving:
+            source_id, source_branch, source_skipped = resolving.pop()
+            for port, next_node_ids in self.plan.adjacency.get(source_id, {}).items():
+                # Nodes reporting a branch only activate that output port
+                active = not source_skipped and (source_branch is None or port == source_branch)
+                for next_node_id in next_node_ids:
+                    if next_node_id not in state.pending:
+                        continue
+                    if active:
+                        state.activated[next_node_id] = state.activated.get(next_node_id, 0) + 1
+                    self._input_resolved(next_node_id, resolving)
+            
+            # Ordering-only connections resolve whether the source ran or was skipped
+            for next_node_id in self.plan.ordering.get(source_id, []):
+                if next_node_id in state.pending:
+                    self._input_resolved(next_node_id, resolving)
+    
+    def _input_resolved(self, node_id: str, resolving: List[Tuple[str, Optional[str], bool]]):
+        """Count one input of a pending node as resolved; queue or skip it once all are"""
+        state = self.state
+        state.pending[node_id] -= 1
+        if state.pending[node_id] > 0:
+            return
         
-        return {
-            'status': 'success',
-            'action': 'keyboard_input',
-            'text_length': len(text)
-        }
+        del state.pending[node_id]
+        if state.activated.pop(node_id, 0):
+            state.ready.append(node_id)
+            self._ready_since[node_id] = time.perf_counter()
+        else:
+            # Dead inputs only: skip and propagate downstream
+            state.skipped.append(node_id)
+            self._node_finished(node_id)
+            resolving.append((node_id, None, True))
+            if self.on_skip:
+                self.on_skip(node_id)
+    
+    def _node_finished(self, node_id: str):
+        """Count a node as done for its component; release waiting components once it is finished"""
+        index = self.plan.component_of.get(node_id)
+        if index is None:
+            return
+        self._component_left[index] -= 1
+        if self._component_left[index]:
+            return
+        
+        state = self.state
+        roots = set(self.plan.roots)
+        for waiter in self._waiters.get(index, []):
+            for root_id in self.plan.components[waiter]:
+                if root_id not in roots or root_id not in state.pending:
+                    continue
+                # Roots have no connections to activate them
+                state.activated.setdefault(root_id, 1)
+                self._input_resolved(root_id, [])
+
+# =====================================
+# Node Result Cache
+# =====================================
+
+_result_cache: Optional[NodeResultCache] = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache(config: Optional[FlowEngineConfig] = None) -> NodeResultCache:
+    """Get the process-wide node result cache; its location comes from the first caller"""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            config = config or FlowEngineConfig()
+            _result_cache = NodeResultCache(config.RESULT_CACHE_DIR, config.RESULT_CACHE_MAX_MB * 1024 * 1024)
+        return _result_cache
+
+# =====================================
+# Object Store
+# =====================================
+
+_object_store: Optional[ObjectStore] = None
+_object_store_lock = threading.Lock()
+
+def get_object_store(config: Optional[FlowEngineConfig] = None) -> ObjectStore:
+    """Get the process-wide object store; its backend and cache come from the first caller"""
+    global _object_store
+    with _object_store_lock:
+        if _object_store is None:
+            config = config or FlowEngineConfig()
+            if config.OBJECT_STORE_BACKEND == 'local':
+                backend = LocalObjectBackend(config.OBJECT_STORE_LOCAL_ROOT)
+            else:
+                backend = GCSObjectBackend(get_storage_client)
+            _object_store = ObjectStore(backend, config.OBJECT_CACHE_DIR, config.OBJECT_CACHE_MAX_MB * 1024 * 1024)
+        return _object_store
+
+# =====================================
+# Checkpoints
+# =====================================
+
+def get_checkpoint_store(config: FlowEngineConfig) -> CheckpointStore:
+    """Checkpoint store for the configured backend"""
+    if config.CHECKPOINT_BACKEND == 'firestore':
+        return FirestoreCheckpointStore(get_db())
+    return LocalCheckpointStore(config.CHECKPOINT_DIR)
 
 # =====================================
 # Flow Engine
@@ -254,80 +1664,364 @@ class RPAAutomationExecutor(ComponentExecutor):
 class FlowEngine:
     """Main flow execution engine"""
     
-    def __init__(self, flow_id: str, user_id: str):
+    def __init__(self, flow_id: str, user_id: str, config: Optional[FlowEngineConfig] = None):
         self.flow_id = flow_id
         self.user_id = user_id
+        self.config = config or FlowEngineConfig()
         self.execution_id = None
+        self.started_at: Optional[str] = None
+        self.event_log: Optional[ExecutionEventLog] = None
+        self.plan: Optional[FlowPlan] = None
+        self.scheduler: Optional[FlowScheduler] = None
         self.context = {
-            'variables': {},
+            'variables': VariableStore(
+                self.config.VARIABLE_MEMORY_BUDGET_MB * 1024 * 1024,
+                self.config.VARIABLE_SPILL_DIR
+            ),
             'execution_history': [],
             'current_node': None
         }
-        self.executors = {
-            'file_search': FileSearchExecutor,
-            'dataframe_merge': DataFrameMergeExecutor,
-            'excel_reader': ExcelReaderExecutor,
-            'condition': ConditionalExecutor,
-            'mouse_click': RPAAutomationExecutor,
-            'keyboard_input': RPAAutomationExecutor
-        }
+        self.context['engine'] = self
+        self._pending_readers: Dict[str, Set[str]] = {}
+        self.checkpoints = get_checkpoint_store(self.config)
+        self.checkpoint_count = 0
+        self.result_cache = get_result_cache(self.config)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.checkpointing = True
+        self._nodes_since_checkpoint = 0
+        
+        # Checkpoints write files off the event loop; one at a time, so pruning
+        # never removes files a newer one still references
+        self._checkpoint_lock = asyncio.Lock()
+        
+        # Nodes run outside this engine's history: before a resume, or by batch items
+        self._nodes_executed_elsewhere = 0
+        
+        # Per-engine overrides of the executor registry
+        self.executors: Dict[str, type] = {}
+        
+        # Task running the execution, for cancel()
+        self._task: Optional[asyncio.Task] = None
+        
+        # Tracing: open node spans (loop nodes parent their body's spans) and ready-queue waits
+        self.tracer: Optional[Tracer] = None
+        self._node_spans: Dict[str, NodeSpan] = {}
+        self._queue_waits: Dict[str, float] = {}
+        
+        # Node run times of batch items, added to the component stats with this engine's own
+        self._timing_samples: Dict[str, TimingStats] = {}
     
     async def load_flow(self) -> Dict[str, Any]:
-        """Load flow definition from Firestore"""
-        flow_ref = db.collection('flows').document(self.flow_id)
+        """Load flow definition from the cache, falling back to Firestore"""
+        cached = flow_cache.get(self.flow_id)
+        if cached is not None:
+            return cached.definition
+        
+        flow_ref = get_db().collection('flows').document(self.flow_id)
         flow_doc = flow_ref.get()
         
         if not flow_doc.exists:
             raise ValueError(f"Flow {self.flow_id} not found")
         
-        return flow_doc.to_dict()
+        return flow_cache.put(self.flow_id, flow_doc.to_dict()).definition
     
     async def execute_node(self, node: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a single node"""
+        """Execute a single node inside a tracing span"""
+        node_id = node.get('id')
+        queue_wait = self._queue_waits.pop(node_id, None)
+        if self.tracer is None:
+            return await self._execute_node(node)
+        
+        parent = self._node_spans.get(self.plan.loop_of.get(node_id)) if self.plan else None
+        span = self.tracer.start_node(node_id, node.get('type'), queue_wait, parent.span if parent else None)
+        self._node_spans[node_id] = span
+        try:
+            return await self._execute_node(node, span)
+        except BaseException as e:
+            span.end(None if isinstance(e, LoopControl) else e)
+            raise
+        finally:
+            self._node_spans.pop(node_id, None)
+    
+    def on_node_dispatch(self, node_id: str, queue_wait: float):
+        """Remember how long a node waited in the ready queue, for its span"""
+        self._queue_waits[node_id] = queue_wait
+    
+    async def _execute_node(self, node: Dict[str, Any], span: Optional[NodeSpan] = None) -> Dict[str, Any]:
         node_type = node.get('type')
-        executor_class = self.executors.get(node_type)
+        binding = self.plan.executors.get(node.get('id')) if self.plan else None
+        if binding is None and node_type in self.executors:
+            binding = (self.executors[node_type], executor_registry.method_for(node_type))
+        elif binding is None:
+            binding = executor_registry.get(node_type)
         
-        if not executor_class:
+        if not binding:
             raise ValueError(f"Unknown node type: {node_type}")
         
-        # Create executor instance
-        executor = executor_class(node.get('data', {}), self.context)
-        
-        # Execute based on node type
-        if node_type == 'mouse_click':
-            result = await executor.execute_mouse_click()
-        elif node_type == 'keyboard_input':
-            result = await executor.execute_keyboard_input()
+        # Create executor instance and run its bound entry method
+        self.context['current_node'] = node.get('id')
+        executor_class, method_name = binding
+        templates = self.plan.templates.get(node.get('id')) if self.plan else None
+        
+        await self.load_spilled(node.get('id'), executor_class)
+        
+        # Memoized nodes with unchanged inputs restore their outputs instead of running
+        cache_key = None
+        cached = None
+        if self.plan and node.get('id') in self.plan.cached:
+            cache_key = await self.result_cache_key(node, executor_class, method_name)
+            if cache_key:
+                cached = await self.run_blocking(self.result_cache.get, cache_key)
+        
+        if cached is not None:
+            self.cache_hits += 1
+            for name, value in cached['outputs'].items():
+                self.context['variables'][name] = value
+            result = cached['result']
+        else:
+            executor = executor_class(node.get('data') or {}, self.context, templates)
+            executor.node_id = node.get('id')
+            timeout, reason = self.node_timeout(node, executor_class)
+            scope = asyncio.timeout(timeout)
+            try:
+                async with scope:
+                    result = await getattr(executor, method_name)()
+            except asyncio.CancelledError:
+                executor.cancel_work()
+                raise
+            except LoopControl as control:
+                # break/continue succeeded; the enclosing loop acts on it
+                await self.record_node(node, {'status': 'success', 'loop_control': control.action}, span)
+                raise
+            except Exception as e:
+                error = e
+                if scope.expired():
+                    # The node's own limit, not a TimeoutError raised inside it
+                    executor.cancel_work()
+                    error = NodeTimeoutError(node.get('id'), timeout, reason)
+                if self.event_log:
+                    details = {'timeout': error.to_dict()} if isinstance(error, NodeTimeoutError) else {}
+                    await self.event_log.append(
+                        'node_failed', node_id=node.get('id'), node_type=node_type, error=str(error), **details
+                    )
+                if error is e:
+                    raise
+                raise error from None
+            
+            if cache_key:
+                self.cache_misses += 1
+                variables = self.context['variables']
+                outputs = {
+                    name: variables[name]
+                    for name in self.plan.writes.get(node.get('id'), ())
+                    if name in variables
+                }
+                await self.run_blocking(self.result_cache.put, cache_key, result, outputs)
+        
+        if cache_key:
+            await self.record_node(node, result, span, cache_hit=cached is not None)
         else:
-            result = await executor.execute()
+            await self.record_node(node, result, span)
         
-        # Log execution
-        self.context['execution_history'].append({
+        self.release_variables(node.get('id'))
+        await self.enforce_memory_budget()
+        return result
+    
+    async def load_spilled(self, node_id: str, executor_class: type):
+        """Read the spilled DataFrames a node uses back into memory on the IO lane
+        
+        Loop nodes read their own variables as they iterate, and some
+        executors read spill files directly, so both are left alone.
+        """
+        variables = self.context['variables']
+        if not self.plan or not isinstance(variables, VariableStore):
+            return
+        if executor_class.has_body or executor_class.reads_spill_files:
+            return
+        for name in self.plan.reads.get(node_id, ()):
+            if variables.is_spilled(name):
+                await variables.load(name, self.run_blocking)
+    
+    async def enforce_memory_budget(self):
+        """Spill least recently used DataFrames over the memory budget, writing on the IO lane"""
+        variables = self.context['variables']
+        if isinstance(variables, VariableStore):
+            await variables.enforce_budget(self.run_blocking)
+    
+    def node_timeout(self, node: Dict[str, Any], executor_class: type) -> Tuple[Optional[float], Optional[str]]:
+        """Seconds a node may run and why: its own timeout, or what is left of the flow deadline"""
+        timeout = (node.get('data') or {}).get('timeout')
+        if timeout in (None, '') and not executor_class.has_body:
+            timeout = self.config.NODE_TIMEOUT_SECONDS
+        timeout = float(timeout) if timeout not in (None, '') and float(timeout) > 0 else None
+        reason = 'timeout' if timeout is not None else None
+        
+        deadline = self.context.get('deadline')
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise NodeTimeoutError(node.get('id'), 0, 'deadline')
+            if timeout is None or remaining < timeout:
+                timeout, reason = remaining, 'deadline'
+        return timeout, reason
+    
+    def check_flow(self, flow_data: Dict[str, Any], inputs: Iterable[str] = ()):
+        """Validate the plan (once per flow version) and raise FlowValidationError before anything runs
+        
+        Variables already set on the engine, and the given inputs, count as defined.
+        """
+        if not self.config.VALIDATE_FLOWS:
+            return
+        if self.plan.validation is None:
+            self.plan.validation = validate_flow_definition(flow_data, self.executors, self.plan)
+        errors = self.plan.validation.errors(set(inputs).union(self.context['variables']))
+        if errors:
+            raise FlowValidationError(errors)
+    
+    def start_deadline(self, flow_data: Dict[str, Any]):
+        """Start the flow-level deadline clock, if the flow or the config sets one"""
+        seconds = float(flow_data.get('deadline_seconds') or self.config.FLOW_DEADLINE_SECONDS or 0)
+        self.context['deadline'] = time.monotonic() + seconds if seconds > 0 else None
+    
+    def start_trace(self):
+        """Open the execution's root span, if tracing is enabled"""
+        if self.config.TRACE_ENABLED:
+            self.tracer = Tracer(f"flow {self.flow_id}", max_spans=self.config.TRACE_MAX_SPANS)
+            self.tracer.root.attributes.update({'flow.id': self.flow_id, 'execution.id': self.execution_id})
+    
+    async def export_trace(self, error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Close the trace and write it in the configured formats"""
+        if self.tracer is None:
+            return None
+        
+        self.tracer.finish(error)
+        formats = [name.strip() for name in self.config.TRACE_FORMATS.split(',') if name.strip()]
+        summary = self.tracer.summary()
+        try:
+            summary['files'] = await self.run_blocking(
+                self.tracer.export, self.config.TRACE_DIR, self.execution_id, formats,
+                self.config.TRACE_MAX_FILES, self.config.TRACE_MAX_MB * 1024 * 1024
+            )
+        except OSError as e:
+            # A full or read-only disk shouldn't fail the execution
+            summary['files'] = []
+            summary['export_error'] = str(e)
+        return summary
+    
+    def cancel(self):
+        """Cancel a running execution; running nodes drop their queued pool work"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+    
+    async def record_node(self, node: Dict[str, Any], result: Any, span: Optional[NodeSpan] = None, **extra):
+        """Append a completed node, with its span timings, to the execution history and event log"""
+        entry = {
             'node_id': node.get('id'),
-            'node_type': node_type,
+            'node_type': node.get('type'),
             'timestamp': datetime.utcnow().isoformat(),
-            'result': result
-        })
+            'result': result,
+            **extra
+        }
+        if span is not None:
+            entry['timing'] = span.end()
+        self.context['execution_history'].append(entry)
+        if self.event_log:
+            await self.event_log.append('node_completed', **entry)
+    
+    async def result_cache_key(self, node: Dict[str, Any], executor_class: type, method_name: str) -> Optional[str]:
+        """Content address of a node run: resolved config plus fingerprints of its inputs"""
+        node_id = node.get('id')
+        variables = self.context['variables']
+        try:
+            config = {key: template.resolve(variables) for key, template in self.plan.templates[node_id].items()}
+        except TemplateError:
+            return None
+        inputs = {name: variables[name] for name in self.plan.reads.get(node_id, ()) if name in variables}
+        
+        # Hashing DataFrames, walking folders and stat'ing objects is real
+        # work; keep it off the event loop
+        executor_name = f"{executor_class.__module__}.{executor_class.__qualname__}.{method_name}"
+        return await self.run_blocking(
+            node_cache_key, self.flow_id, node.get('type'), executor_name, config, inputs,
+            get_object_store(self.config).stat
+        )
+    
+    async def run_blocking(self, func, *args) -> Any:
+        """Run engine bookkeeping I/O on the IO lane"""
+        pools = self.context.get('pools') or get_executor_pools(self.config)
+        return await pools.run(ExecutionLane.IO, func, *args)
+    
+    def release_variables(self, node_id: str):
+        """Free variables no node still to run will read"""
+        if not self.plan or not self.config.FREE_UNUSED_VARIABLES:
+            return
         
-        return result
+        # Body nodes run again next iteration; their loop node frees for them
+        if node_id in self.plan.loop_of:
+            return
+        
+        variables = self.context['variables']
+        if not isinstance(variables, VariableStore):
+            return
+        
+        for name in self.plan.reads.get(node_id, ()):
+            readers = self._pending_readers.get(name)
+            if readers is not None:
+                readers.discard(node_id)
+        
+        for name in self.plan.reads.get(node_id, set()) | self.plan.writes.get(node_id, set()):
+            if name not in self.plan.retained and not self._pending_readers.get(name):
+                variables.free(name)
+    
+    @property
+    def nodes_executed(self) -> int:
+        """Nodes run by this execution, including those before a resume or by batch items"""
+        return self._nodes_executed_elsewhere + len(self.context['execution_history'])
     
     async def execute_flow(self) -> Dict[str, Any]:
         """Execute the complete flow"""
+        # Create execution record
+        self.execution_id = f"exec_{self.flow_id}_{datetime.utcnow().timestamp()}"
+        self.started_at = datetime.utcnow().isoformat()
+        return await self.run_execution()
+    
+    async def resume_execution(self, execution_id: str) -> Dict[str, Any]:
+        """Continue a failed or interrupted execution from its last checkpoint"""
+        checkpoint = await self.run_blocking(self.checkpoints.load, execution_id)
+        if checkpoint is None:
+            raise ValueError(f"No checkpoint for execution {execution_id}")
+        if checkpoint['flow_id'] != self.flow_id:
+            raise ValueError(f"Execution {execution_id} belongs to flow {checkpoint['flow_id']}")
+        
+        self.execution_id = execution_id
+        self.started_at = checkpoint['started_at']
+        return await self.run_execution(checkpoint)
+    
+    async def run_execution(self, checkpoint: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the flow from its entry node, or from a checkpoint"""
+        self._task = asyncio.current_task()
         try:
-            # Create execution record
-            self.execution_id = f"exec_{self.flow_id}_{datetime.utcnow().timestamp()}"
+            await self.start_execution_log(checkpoint)
             
-            # Load flow definition
+            # Load flow definition and its compiled plan
             flow_data = await self.load_flow()
-            nodes = flow_data.get('nodes', [])
-            connections = flow_data.get('connections', [])
+            self.plan = flow_cache.plan_for(self.flow_id, flow_data, self.executors)
+            if checkpoint is None:
+                # A resumed execution passed validation when it first started
+                self.check_flow(flow_data)
+            self.context['pools'] = get_executor_pools(self.config)
+            self.start_deadline(flow_data)
+            self.start_trace()
             
-            # Build execution graph
-            graph = self.build_execution_graph(nodes, connections)
+            state = None
+            if checkpoint is None:
+                self._pending_readers = {name: set(nodes) for name, nodes in self.plan.readers.items()}
+            else:
+                state = self.restore_checkpoint(checkpoint)
             
-            # Start execution from entry point
-            entry_node = self.find_entry_node(nodes, connections)
-            await self.execute_graph(entry_node, nodes, connections)
+            # Start from every root, or carry on where the checkpoint left off
+            await self.execute_graph(state=state)
             
             # Save execution results
             await self.save_execution_results('completed')
@@ -335,85 +2029,447 @@ class FlowEngine:
             return {
                 'status': 'success',
                 'execution_id': self.execution_id,
-                'nodes_executed': len(self.context['execution_history'])
+                'nodes_executed': self.nodes_executed
             }
             
+        except FlowValidationError as e:
+            await self.save_execution_results('invalid', str(e), validation=[issue.to_dict() for issue in e.issues])
+            raise
+        
+        except NodeTimeoutError as e:
+            await self.save_execution_results('timed_out', str(e), timeout=e.to_dict())
+            raise
+        
+        except asyncio.CancelledError:
+            await self.save_execution_results('cancelled', 'Execution cancelled')
+            raise
+        
         except Exception as e:
             # Log error
             await self.save_execution_results('failed', str(e))
             raise
     
-    def build_execution_graph(self, nodes: List[Dict], connections: List[Dict]) -> Dict:
-        """Build node execution graph"""
-        graph = {}
-        for conn in connections:
-            from_node = conn.get('from')
-            to_node = conn.get('to')
-            output = conn.get('fromOutput', 'default')
+    async def execute_graph(
+        self,
+        node_ids: Union[str, Iterable[str], None] = None,
+        state: Optional[SchedulerState] = None
+    ) -> SchedulerState:
+        """Execute nodes following the compiled plan, from every root, the given nodes or a saved state"""
+        self.scheduler = FlowScheduler(
+            self.plan,
+            self.execute_node,
+            state=state,
+            max_concurrency=self.config.MAX_CONCURRENCY,
+            on_skip=self.release_variables,
+            on_complete=self.on_node_complete,
+            on_dispatch=self.on_node_dispatch
+        )
+        if state is None:
+            self.scheduler.start(node_ids)
+        return await self.scheduler.run()
+    
+    async def run_loop_body(self, loop_node_id: str) -> Optional[str]:
+        """Run one iteration of a loop node's body; returns 'break' or 'continue' if a node said so"""
+        body = self.plan.loops.get(loop_node_id)
+        if body is None or not body.roots:
+            return None
+        
+        scheduler = FlowScheduler(
+            body,
+            self.execute_node,
+            max_concurrency=self.config.MAX_CONCURRENCY,
+            on_dispatch=self.on_node_dispatch
+        )
+        # Every node the loop's body port leads to starts each iteration
+        scheduler.start()
+        try:
+            await scheduler.run()
+        except LoopControl as control:
+            return control.action
+        return None
+    
+    async def on_node_complete(self, node_id: str):
+        """Checkpoint every CHECKPOINT_EVERY_NODES nodes and after flagged nodes"""
+        if not self.checkpointing or not isinstance(self.context['variables'], VariableStore):
+            return
+        
+        self._nodes_since_checkpoint += 1
+        every = self.config.CHECKPOINT_EVERY_NODES
+        flagged = config_flag((self.plan.nodes[node_id].get('data') or {}).get('checkpoint'))
+        if flagged or (every and self._nodes_since_checkpoint >= every):
+            await self.save_checkpoint()
+    
+    async def save_checkpoint(self) -> Dict[str, Any]:
+        """Snapshot the scheduler state and variable pointers to the checkpoint store"""
+        directory = os.path.join(self.config.CHECKPOINT_DIR, self.execution_id)
+        variables = self.context['variables']
+        
+        async with self._checkpoint_lock:
+            # Taken with the variables' values, before the files are written
+            # and other nodes move on
+            checkpoint = {
+                'execution_id': self.execution_id,
+                'flow_id': self.flow_id,
+                'user_id': self.user_id,
+                'flow_version': self.plan.version,
+                'sequence': self.checkpoint_count,
+                'started_at': self.started_at,
+                'created_at': datetime.utcnow().isoformat(),
+                'scheduler': self.scheduler.state.to_dict(),
+                'pending_readers': {name: sorted(nodes) for name, nodes in self._pending_readers.items()},
+                'nodes_executed': self.nodes_executed
+            }
+            self._nodes_since_checkpoint = 0
             
-            if from_node not in graph:
-                graph[from_node] = {}
+            # Unchanged variables keep their files, so this only writes new values
+            checkpoint['variables'] = await variables.checkpoint(directory, self.run_blocking)
             
-            if output not in graph[from_node]:
-                graph[from_node][output] = []
+            await self.run_blocking(self.checkpoints.save, self.execution_id, checkpoint)
+            await self.run_blocking(variables.prune_checkpoint_files, directory, checkpoint['variables'])
+            if self.event_log:
+                await self.event_log.append('checkpoint_saved', sequence=checkpoint['sequence'])
             
-            graph[from_node][output].append(to_node)
+            self.checkpoint_count += 1
+        return checkpoint
+    
+    def restore_checkpoint(self, checkpoint: Dict[str, Any]) -> SchedulerState:
+        """Restore variables and bookkeeping from a checkpoint; returns the scheduler state"""
+        if checkpoint['flow_version'] != self.plan.version:
+            raise ValueError(
+                f"Flow {self.flow_id} changed since execution {self.execution_id} was checkpointed"
+            )
+        
+        self.context['variables'].restore(checkpoint['variables'])
+        self._pending_readers = {name: set(nodes) for name, nodes in checkpoint['pending_readers'].items()}
+        self._nodes_executed_elsewhere = checkpoint['nodes_executed']
+        self.checkpoint_count = checkpoint['sequence'] + 1
+        return SchedulerState.from_dict(checkpoint['scheduler'])
+    
+    async def execute_batch(
+        self,
+        items: Any,
+        item_variable: str = 'item',
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Run the flow once per item under one execution record
+        
+        items is any iterable (file paths, dicts...) or a DataFrame, which is
+        mapped row by row. Every item runs on the same compiled plan with its
+        own variables, where the item is ${item} (item_variable) and its
+        position ${item_index}. A failed item doesn't stop the others.
+        """
+        self.execution_id = f"batch_{self.flow_id}_{datetime.utcnow().timestamp()}"
+        self.started_at = datetime.utcnow().isoformat()
+        self.checkpointing = False
         
-        return graph
+        try:
+            await self.start_execution_log()
+            flow_data = await self.load_flow()
+            self.plan = flow_cache.plan_for(self.flow_id, flow_data, self.executors)
+            self.check_flow(flow_data, inputs=(item_variable, 'item_index'))
+            self.context['pools'] = get_executor_pools(self.config)
+            self.start_deadline(flow_data)
+            self.start_trace()
+            
+            results = await self.map_items(items, item_variable, max_concurrency)
+            
+            failed = [result for result in results if result['status'] == 'failed']
+            batch = {
+                'items': len(results),
+                'succeeded': len(results) - len(failed),
+                'failed': len(failed),
+                'item_variable': item_variable,
+                'item_status': [result['status'] for result in results],
+                'errors': [
+                    {'index': result['index'], 'error': result['error']}
+                    for result in failed[:self.config.BATCH_MAX_REPORTED_ERRORS]
+                ]
+            }
+            status = 'completed' if not failed else ('failed' if len(failed) == len(results) else 'partial')
+            await self.save_execution_results(status, batch=batch)
+            
+            return {
+                'status': 'success' if not failed else status,
+                'execution_id': self.execution_id,
+                'items': batch['items'],
+                'succeeded': batch['succeeded'],
+                'failed': batch['failed'],
+                'nodes_executed': self.nodes_executed,
+                'results': results
+            }
+            
+        except FlowValidationError as e:
+            await self.save_execution_results('invalid', str(e), validation=[issue.to_dict() for issue in e.issues])
+            raise
+        
+        except Exception as e:
+            await self.save_execution_results('failed', str(e))
+            raise
     
-    def find_entry_node(self, nodes: List[Dict], connections: List[Dict]) -> Dict:
-        """Find the entry node (node with no incoming connections)"""
-        incoming = {conn.get('to') for conn in connections}
-        for node in nodes:
-            if node.get('id') not in incoming:
-                return node
-        return nodes[0] if nodes else None
+    async def map_items(self, items: Any, item_variable: str, max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Run the loaded plan for every item with bounded concurrency; results in item order"""
+        if is_dataframe(items):
+            columns = list(items.columns)
+            items = (dict(zip(columns, row)) for row in items.itertuples(index=False, name=None))
+        
+        # Workers pull from one shared iterator, so generators are never materialized
+        pending = enumerate(items)
+        results: List[Dict[str, Any]] = []
+        
+        async def worker():
+            for index, item in pending:
+                result = await self.run_batch_item(index, item, item_variable)
+                results.append(result)
+                
+                # Per-item details go to the event log; the summary keeps the status
+                event = {key: value for key, value in result.items() if key != 'outputs'}
+                if self.event_log:
+                    await self.event_log.append(f"item_{result['status']}", **event)
+        
+        concurrency = max(1, max_concurrency or self.config.BATCH_MAX_CONCURRENCY)
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        
+        results.sort(key=lambda result: result['index'])
+        return results
     
-    async def execute_graph(self, current_node: Dict, nodes: List[Dict], connections: List[Dict]):
-        """Execute nodes following the graph"""
-        if not current_node:
-            return
+    async def run_batch_item(self, index: int, item: Any, item_variable: str) -> Dict[str, Any]:
+        """Run one item on a child engine sharing this engine's plan, pools and caches"""
+        child = FlowEngine(self.flow_id, self.user_id, self.config)
+        child.execution_id = f"{self.execution_id}_{index}"
+        child.started_at = self.started_at
+        child.plan = self.plan
+        child.executors = self.executors
+        child.result_cache = self.result_cache
+        child.checkpointing = False
+        child.context['pools'] = self.context['pools']
+        child.context['deadline'] = self.context.get('deadline')
+        child.tracer = self.tracer
+        child._pending_readers = {name: set(nodes) for name, nodes in self.plan.readers.items()}
+        
+        variables = child.context['variables']
+        variables[item_variable] = item
+        variables['item_index'] = index
+        
+        started = time.perf_counter()
+        result = {'index': index}
+        try:
+            await child.execute_graph()
+            result['status'] = 'completed'
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            if isinstance(e, NodeTimeoutError):
+                result['timeout'] = e.to_dict()
+        finally:
+            result['nodes_executed'] = child.nodes_executed
+            result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            if self.plan.retained:
+                result['outputs'] = {
+                    name: variables[name] for name in self.plan.retained if name in variables
+                }
+            variables.close()
+            
+            self._nodes_executed_elsewhere += child.nodes_executed
+            for node_type, stats in summarize_timings(child.context['execution_history']).items():
+                self._timing_samples.setdefault(node_type, TimingStats()).merge(stats)
+            self.cache_hits += child.cache_hits
+            self.cache_misses += child.cache_misses
         
-        # Execute current node
-        result = await self.execute_node(current_node)
+        return result
+    
+    async def start_execution_log(self, checkpoint: Optional[Dict[str, Any]] = None):
+        """Write the running execution record and open its event log"""
+        if self.config.EVENT_LOG_BACKEND == 'local':
+            backend = LocalFileEventLog(self.config.EVENT_LOG_DIR, self.execution_id)
+        else:
+            backend = FirestoreEventLog(get_db(), self.execution_id)
+        
+        # A resumed execution appends after the events of its earlier attempts
+        start_seq = 0
+        if checkpoint:
+            start_seq = await self.run_blocking(backend.next_seq)
+        
+        self.event_log = ExecutionEventLog(
+            backend,
+            batch_size=self.config.EVENT_LOG_BATCH_SIZE,
+            flush_interval_ms=self.config.EVENT_LOG_FLUSH_MS,
+            start_seq=start_seq,
+            run=self.run_blocking
+        )
+        self.event_log.start()
+        if checkpoint:
+            await self.event_log.append('execution_resumed', checkpoint=checkpoint['sequence'])
         
-        # Find next nodes
-        node_id = current_node.get('id')
-        next_connections = [c for c in connections if c.get('from') == node_id]
+        document = get_db().collection('executions').document(self.execution_id)
+        await self.run_blocking(document.set, {
+            'execution_id': self.execution_id,
+            'flow_id': self.flow_id,
+            'user_id': self.user_id,
+            'status': 'running',
+            'start_time': self.started_at,
+            'resumed_from_checkpoint': checkpoint['sequence'] if checkpoint else None,
+            'event_log': self.event_log.summary()
+        })
+    
+    async def record_component_stats(self) -> Optional[Dict[str, Any]]:
+        """Add this execution's node run times to the per-type history runtime estimates use"""
+        if not self.config.COMPONENT_STATS_ENABLED:
+            return None
         
-        # Handle conditional branching
-        if current_node.get('type') == 'condition':
-            branch = result.get('next_branch', 'default')
-            next_connections = [c for c in next_connections if c.get('fromOutput') == branch]
+        samples = summarize_timings(self.context['execution_history'])
+        for node_type, stats in self._timing_samples.items():
+            samples.setdefault(node_type, TimingStats()).merge(stats)
+        if not samples:
+            return None
         
-        # Execute next nodes
-        for conn in next_connections:
-            next_node_id = conn.get('to')
-            next_node = next((n for n in nodes if n.get('id') == next_node_id), None)
-            if next_node:
-                await self.execute_graph(next_node, nodes, connections)
+        try:
+            await self.run_blocking(component_stats.record, samples)
+        except Exception as e:
+            # Estimates are best effort; the execution record still gets saved
+            return {'types': len(samples), 'error': str(e)}
+        return {'types': len(samples)}
     
-    async def save_execution_results(self, status: str, error: str = None):
-        """Save execution results to Firestore"""
+    async def save_execution_results(
+        self,
+        status: str,
+        error: str = None,
+        batch: Optional[Dict[str, Any]] = None,
+        timeout: Optional[Dict[str, Any]] = None,
+        validation: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Save the execution summary; node events live in the event log"""
+        event_log = None
+        if self.event_log:
+            await self.event_log.append('execution_finished', status=status, error=error)
+            await self.event_log.close()
+            event_log = self.event_log.summary()
+        
+        variables = self.context['variables']
+        if isinstance(variables, VariableStore):
+            descriptors = variables.descriptors()
+            variable_stats = variables.stats()
+            variables.close()
+            if self.checkpoint_count:
+                if status == 'completed':
+                    # Nothing left to resume
+                    await self.run_blocking(self.checkpoints.delete, self.execution_id)
+                    await self.run_blocking(
+                        remove_checkpoint_files, os.path.join(self.config.CHECKPOINT_DIR, self.execution_id)
+                    )
+        else:
+            descriptors = {name: describe_variable(value) for name, value in variables.items()}
+            variable_stats = None
+        
         execution_data = {
             'execution_id': self.execution_id,
             'flow_id': self.flow_id,
             'user_id': self.user_id,
             'status': status,
-            'start_time': self.context['execution_history'][0]['timestamp'] if self.context['execution_history'] else None,
+            'start_time': self.started_at,
             'end_time': datetime.utcnow().isoformat(),
-            'nodes_executed': len(self.context['execution_history']),
-            'execution_history': self.context['execution_history'],
-            'variables': self.context['variables'],
+            'nodes_executed': self.nodes_executed,
+            'event_log': event_log,
+            'variables': descriptors,
+            'variable_store': variable_stats,
+            'result_cache': (
+                {'hits': self.cache_hits, 'misses': self.cache_misses}
+                if self.cache_hits or self.cache_misses else None
+            ),
+            'checkpoint': self.checkpoint_count - 1 if self.checkpoint_count and status != 'completed' else None,
+            'batch': batch,
+            'timeout': timeout,
+            'validation': validation,
             'error': error
         }
         
-        db.collection('executions').document(self.execution_id).set(execution_data)
+        execution_data['trace'] = await self.export_trace(error)
+        execution_data['component_stats'] = await self.record_component_stats()
+        document = get_db().collection('executions').document(self.execution_id)
+        await self.run_blocking(document.set, execution_data)
+
+# =====================================
+# Execution Job Queue
+# =====================================
+
+async def run_flow_job(job: Job) -> Dict[str, Any]:
+    """Run a queued execution job"""
+    payload = job.payload
+    if job.kind == 'execute_flow':
+        engine = FlowEngine(payload['flow_id'], payload['user_id'])
+        return await engine.execute_flow()
+    
+    if job.kind == 'resume_flow':
+        engine = FlowEngine(payload['flow_id'], payload['user_id'])
+        return await engine.resume_execution(payload['execution_id'])
+    
+    if job.kind == 'execute_batch':
+        engine = FlowEngine(payload['flow_id'], payload['user_id'])
+        result = await engine.execute_batch(
+            payload['items'],
+            item_variable=payload.get('item_variable', 'item'),
+            max_concurrency=payload.get('max_concurrency')
+        )
+        # Outputs may hold DataFrames; the result carries per-item status only
+        for item_result in result['results']:
+            item_result.pop('outputs', None)
+        return result
+    
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue(config: Optional[FlowEngineConfig] = None) -> JobQueue:
+    """Get the process-wide job queue; its backend and worker count come from the first caller"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            config = config or FlowEngineConfig()
+            if config.QUEUE_BACKEND == 'redis':
+                redis = timed_import('redis')
+                backend = RedisQueueBackend(redis.Redis.from_url(config.QUEUE_REDIS_URL), f"agentiqware:{config.QUEUE_NAME}")
+            elif config.QUEUE_BACKEND == 'cloud_tasks':
+                backend = CloudTasksQueueBackend(
+                    get_tasks_client(),
+                    os.environ.get('GCP_PROJECT_ID', ''),
+                    config.QUEUE_TASKS_LOCATION,
+                    config.QUEUE_NAME,
+                    config.QUEUE_TASKS_URL,
+                    config.QUEUE_TASKS_SERVICE_ACCOUNT or None
+                )
+            else:
+                backend = MemoryQueueBackend()
+            _job_queue = JobQueue(backend, run_flow_job, config.QUEUE_WORKERS, config.QUEUE_MAX_DEPTH)
+        return _job_queue
+
+def submit_job(kind: str, payload: Dict[str, Any], request_json: Dict[str, Any]):
+    """Queue a job for an HTTP entry point and wait for it unless the request sets wait=false"""
+    try:
+        priority = JobPriority(request_json.get('priority', 'normal'))
+    except ValueError:
+        return {'error': f"Unknown priority: {request_json.get('priority')}"}, 400
+    
+    queue = get_job_queue()
+    try:
+        job = queue.submit(kind, payload, priority)
+    except QueueFull as e:
+        return {'error': str(e), 'retry_after': e.retry_after}, 429, {'Retry-After': str(e.retry_after)}
+    
+    if queue.backend.remote or request_json.get('wait', True) is False:
+        return {'job_id': job.job_id, 'status': 'queued'}, 202
+    
+    record = queue.wait(job.job_id, FlowEngineConfig().QUEUE_WAIT_SECONDS)
+    if record and record['status'] == 'completed':
+        return record['result'], 200
+    if record and record['status'] == 'failed':
+        return {'error': record['error'], 'job_id': job.job_id}, 500
+    return {'job_id': job.job_id, 'status': record['status'] if record else 'unknown'}, 202
 
 # =====================================
 # Main Cloud Function Entry Points
 # =====================================
 
+@report_cold_start
 def execute_flow(request):
     """HTTP Cloud Function to execute a flow"""
     try:
@@ -424,15 +2480,116 @@ def execute_flow(request):
         if not flow_id or not user_id:
             return {'error': 'Missing flow_id or user_id'}, 400
         
-        # Create and run flow engine
-        engine = FlowEngine(flow_id, user_id)
-        result = asyncio.run(engine.execute_flow())
+        # Queued: a burst of triggers waits for a worker instead of each running at once
+        return submit_job('execute_flow', {'flow_id': flow_id, 'user_id': user_id}, request_json)
+        
+    except Exception as e:
+        return {'error': str(e), 'trace': traceback.format_exc()}, 500
+
+@report_cold_start
+def resume_flow(request):
+    """HTTP Cloud Function to resume an execution from its last checkpoint"""
+    try:
+        request_json = request.get_json()
+        execution_id = request_json.get('execution_id')
+        user_id = request_json.get('user_id')
+        
+        if not execution_id or not user_id:
+            return {'error': 'Missing execution_id or user_id'}, 400
+        
+        checkpoint = get_checkpoint_store(FlowEngineConfig()).load(execution_id)
+        if checkpoint is None:
+            return {'error': f'No checkpoint for execution {execution_id}'}, 404
+        if user_id != checkpoint['user_id']:
+            return {'error': 'Execution belongs to another user'}, 403
+        
+        payload = {'flow_id': checkpoint['flow_id'], 'user_id': checkpoint['user_id'], 'execution_id': execution_id}
+        return submit_job('resume_flow', payload, request_json)
+        
+    except Exception as e:
+        return {'error': str(e), 'trace': traceback.format_exc()}, 500
+
+@report_cold_start
+def execute_batch(request):
+    """HTTP Cloud Function to run a flow once per item of a list"""
+    try:
+        request_json = request.get_json()
+        flow_id = request_json.get('flow_id')
+        user_id = request_json.get('user_id')
+        items = request_json.get('items')
+        
+        if not flow_id or not user_id:
+            return {'error': 'Missing flow_id or user_id'}, 400
+        if not isinstance(items, list):
+            return {'error': 'items must be a list'}, 400
+        
+        payload = {
+            'flow_id': flow_id,
+            'user_id': user_id,
+            'items': items,
+            'item_variable': request_json.get('item_variable', 'item'),
+            'max_concurrency': request_json.get('max_concurrency')
+        }
+        return submit_job('execute_batch', payload, request_json)
         
+    except Exception as e:
+        return {'error': str(e), 'trace': traceback.format_exc()}, 500
+
+@report_cold_start
+def job_status(request):
+    """HTTP Cloud Function to get the status (and result, once finished) of a queued job"""
+    try:
+        job_id = (request.get_json(silent=True) or {}).get('job_id') or request.args.get('job_id')
+        if not job_id:
+            return {'error': 'Missing job_id'}, 400
+        
+        record = get_job_queue().status(job_id)
+        if record is None:
+            return {'error': f'Unknown job {job_id}'}, 404
+        return record, 200
+        
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+@report_cold_start
+def run_job(request):
+    """HTTP Cloud Function Cloud Tasks delivers queued jobs to"""
+    try:
+        job = Job.from_dict(request.get_json())
+        result = asyncio.run(run_flow_job(job))
         return result, 200
         
+    except Exception as e:
+        # A non-2xx response makes Cloud Tasks retry the job
+        return {'error': str(e), 'trace': traceback.format_exc()}, 500
+
+@report_cold_start
+def validate_flow(request):
+    """HTTP Cloud Function to validate a flow definition and estimate its run time"""
+    try:
+        request_json = request.get_json()
+        flow_data = request_json.get('flow')
+        flow_id = request_json.get('flow_id')
+        
+        if flow_data is None:
+            if not flow_id:
+                return {'error': 'Missing flow or flow_id'}, 400
+            flow_doc = get_db().collection('flows').document(flow_id).get()
+            if not flow_doc.exists:
+                return {'error': f'Flow {flow_id} not found'}, 404
+            flow_data = flow_doc.to_dict()
+        
+        node_types = {
+            node.get('type') for node in flow_data.get('nodes') or []
+            if isinstance(node, dict) and isinstance(node.get('type'), str)
+        }
+        report = validate_flow_definition(flow_data, stats=component_stats.load(node_types))
+        return report.to_dict(request_json.get('inputs', [])), 200
+        
     except Exception as e:
         return {'error': str(e), 'trace': traceback.format_exc()}, 500
 
+@report_cold_start
 def schedule_flow(request):
     """HTTP Cloud Function to schedule flow execution"""
     try:
@@ -461,7 +2618,7 @@ class AIFlowGenerator:
     
     def load_component_definitions(self) -> List[ComponentDefinition]:
         """Load all available component definitions"""
-        components_ref = db.collection('components')
+        components_ref = get_db().collection('components')
         components = []
         
         for doc in components_ref.stream():
@@ -517,11 +2674,14 @@ class AIFlowGenerator:
             'prompt': prompt,
             **flow_json
         }
+        flow_data['validation'] = validate_flow_definition(flow_data).to_dict()
         
-        db.collection('flows').document(flow_id).set(flow_data)
+        get_db().collection('flows').document(flow_id).set(flow_data)
+        flow_cache.invalidate(flow_id)
         
         return flow_data
 
+@report_cold_start
 def generate_flow_ai(request):
     """HTTP Cloud Function to generate flow with AI"""
     try:
@@ -555,19 +2715,22 @@ class FlowVersionControl:
             'user_id': user_id,
             'timestamp': datetime.utcnow().isoformat(),
             'message': message or 'Auto-saved',
-            'flow_data': flow_data
+            'flow_data': flow_data,
+            # Saving never fails on an invalid flow; the editor shows the report
+            'validation': validate_flow_definition(flow_data).to_dict()
         }
         
         # Save to versions collection
-        db.collection('flow_versions').document(f"{flow_id}_{version_id}").set(version_data)
+        get_db().collection('flow_versions').document(f"{flow_id}_{version_id}").set(version_data)
+        flow_cache.invalidate(flow_id)
         
         return version_id
     
     @staticmethod
     async def get_versions(flow_id: str) -> List[Dict]:
         """Get all versions of a flow"""
-        versions_ref = db.collection('flow_versions')
-        query = versions_ref.where('flow_id', '==', flow_id).order_by('timestamp', direction=firestore.Query.DESCENDING)
+        versions_ref = get_db().collection('flow_versions')
+        query = versions_ref.where('flow_id', '==', flow_id).order_by('timestamp', direction='DESCENDING')
         
         versions = []
         for doc in query.stream():
@@ -578,7 +2741,7 @@ class FlowVersionControl:
     @staticmethod
     async def restore_version(flow_id: str, version_id: str) -> Dict[str, Any]:
         """Restore a specific version of a flow"""
-        version_ref = db.collection('flow_versions').document(f"{flow_id}_{version_id}")
+        version_ref = get_db().collection('flow_versions').document(f"{flow_id}_{version_id}")
         version_doc = version_ref.get()
         
         if not version_doc.exists:
@@ -588,7 +2751,8 @@ class FlowVersionControl:
         flow_data = version_data.get('flow_data')
         
         # Update current flow
-        db.collection('flows').document(flow_id).set(flow_data)
+        get_db().collection('flows').document(flow_id).set(flow_data)
+        flow_cache.invalidate(flow_id)
         
         # Create restore record
         await FlowVersionControl.save_version(
@@ -641,7 +2805,7 @@ class AuthManager:
     async def register_user(email: str, password: str, name: str) -> Dict[str, Any]:
         """Register a new user"""
         # Check if user exists
-        users_ref = db.collection('users')
+        users_ref = get_db().collection('users')
         existing = users_ref.where('email', '==', email).get()
         
         if existing:
@@ -663,7 +2827,7 @@ class AuthManager:
             }
         }
         
-        db.collection('users').document(user_id).set(user_data)
+        get_db().collection('users').document(user_id).set(user_data)
         
         # Create access token
         access_token = AuthManager.create_access_token(
@@ -676,6 +2840,7 @@ class AuthManager:
             'access_token': access_token
         }
 
+@report_cold_start
 def register_user(request):
     """HTTP Cloud Function for user registration"""
     try:
@@ -690,4 +2855,6 @@ def register_user(request):
     except ValueError as e:
         return {'error': str(e)}, 400
     except Exception as e:
-        return {'error': str(e)}, 500
\ No newline at end of file
+        return {'error': str(e)}, 500
+
+record_import(__name__, time.perf_counter() - _import_started)
@@ -0,0 +1,382 @@
+# =====================================
+# DataFrame Joins
+# =====================================
+#
+# Key joins and concatenation for merge nodes. Key columns whose dtypes
+# differ are cast to a common dtype first (integer and float keys to float,
+# anything else to text), so equal keys match instead of silently missing.
+# Inputs larger than the memory budget are joined out of core: both sides
+# are hash-partitioned by key into Arrow files, reading spilled inputs from
+# memory maps, and the partitions are joined one pair at a time into an
+# Arrow result file. Only one partition pair is in memory at once. Every
+# join reports rows in, rows out and the keys on each side without a match.
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+JOIN_MODES = ('inner', 'left', 'right', 'outer')
+
+# Rows converted to Arrow at a time when partitioning an in-memory frame
+SLICE_ROWS = 65536
+
+# Upper bound on hash partitions, which is also the open files per side
+MAX_PARTITIONS = 256
+
+# A DataFrame in memory, or the path of an Arrow IPC file holding one
+FrameSource = Union[pd.DataFrame, str]
+
+@dataclass
+class JoinStats:
+    """Row and key counts of one join"""
+    left_rows: int = 0
+    right_rows: int = 0
+    rows_out: int = 0
+    unmatched_left_keys: int = 0
+    unmatched_right_keys: int = 0
+    key_casts: Dict[str, str] = field(default_factory=dict)
+    partitions: int = 0
+    
+    def add(self, other: 'JoinStats'):
+        self.left_rows += other.left_rows
+        self.right_rows += other.right_rows
+        self.rows_out += other.rows_out
+        self.unmatched_left_keys += other.unmatched_left_keys
+        self.unmatched_right_keys += other.unmatched_right_keys
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+# =====================================
+# Key Alignment
+# =====================================
+
+def _is_number(dtype: Any) -> bool:
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+def common_key_dtype(left: Any, right: Any) -> Optional[str]:
+    """dtype both sides of a key are cast to, or None when they already agree"""
+    if str(left) == str(right):
+        return None
+    if _is_number(left) and _is_number(right):
+        if pd.api.types.is_float_dtype(left) or pd.api.types.is_float_dtype(right):
+            return 'float64'
+        extension = isinstance(left, pd.api.extensions.ExtensionDtype) or isinstance(right, pd.api.extensions.ExtensionDtype)
+        return 'Int64' if extension else 'int64'
+    return 'string'
+
+def key_casts(left_dtypes: pd.Series, right_dtypes: pd.Series, on: List[str]) -> Dict[str, str]:
+    """Casts that make each key column's dtype match across both sides"""
+    for side, dtypes in (('left', left_dtypes), ('right', right_dtypes)):
+        missing = [column for column in on if column not in dtypes.index]
+        if missing:
+            raise ValueError(f"Join keys missing from the {side} frame: {', '.join(missing)}")
+    casts = {}
+    for column in on:
+        target = common_key_dtype(left_dtypes[column], right_dtypes[column])
+        if target:
+            casts[column] = target
+    return casts
+
+def apply_casts(frame: pd.DataFrame, casts: Dict[str, str]) -> pd.DataFrame:
+    """Cast the listed columns whose dtype differs from the target"""
+    needed = {column: dtype for column, dtype in casts.items() if str(frame[column].dtype) != dtype}
+    return frame.astype(needed) if needed else frame
+
+def _unique_keys(frame: pd.DataFrame, on: List[str]) -> pd.Index:
+    if len(on) == 1:
+        return pd.Index(frame[on[0]]).unique()
+    return pd.MultiIndex.from_frame(frame[on]).unique()
+
+# =====================================
+# In-Memory Joins
+# =====================================
+
+def join_frames(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    on: List[str],
+    how: str = 'inner',
+    suffix: str = '_right'
+) -> Tuple[pd.DataFrame, JoinStats]:
+    """Join two frames on key columns; right-side columns named like left ones get suffix"""
+    if how not in JOIN_MODES:
+        raise ValueError(f"Unknown join mode {how!r}; expected one of {', '.join(JOIN_MODES)}")
+    
+    casts = key_casts(left.dtypes, right.dtypes, on)
+    left = apply_casts(left, casts)
+    right = apply_casts(right, casts)
+    
+    left_keys = _unique_keys(left, on)
+    right_keys = _unique_keys(right, on)
+    result = pd.merge(left, right, on=on, how=how, suffixes=('', suffix))
+    
+    return result, JoinStats(
+        left_rows=len(left),
+        right_rows=len(right),
+        rows_out=len(result),
+        unmatched_left_keys=int((~left_keys.isin(right_keys)).sum()),
+        unmatched_right_keys=int((~right_keys.isin(left_keys)).sum()),
+        key_casts=casts
+    )
+
+# =====================================
+# Out-of-Core Joins
+# =====================================
+
+def source_size(source: FrameSource) -> int:
+    """Bytes a source takes in memory, or on disk for an Arrow file"""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return int(source.memory_usage(index=True, deep=True).sum())
+
+def source_rows(source: FrameSource) -> int:
+    """Rows of a source, read from file metadata for an Arrow file"""
+    return arrow_file_shape(source)[0] if isinstance(source, str) else len(source)
+
+def _source_schema(source: FrameSource):
+    """Arrow schema of a source's columns, without pandas index columns or metadata"""
+    import pyarrow as pa
+    
+    if isinstance(source, str):
+        with pa.memory_map(source, 'r') as f:
+            schema = pa.ipc.open_file(f).schema
+    else:
+        schema = pa.Schema.from_pandas(source, preserve_index=False)
+    fields = [schema.field(name) for name in schema.names if not name.startswith('__index_level_')]
+    return pa.schema(fields)
+
+def _nullable_dtype(arrow_type: Any) -> Optional[Any]:
+    """pandas dtype for an Arrow type whose default conversion depends on whether nulls are present
+    
+    Integer and boolean columns become float and object only in the batches
+    that have nulls; mapping them to nullable dtypes keeps a key's values,
+    and so its hash and text form, the same in every batch and partition.
+    """
+    import pyarrow as pa
+    
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    if pa.types.is_integer(arrow_type):
+        return pd.api.types.pandas_dtype(str(arrow_type).replace('uint', 'UInt').replace('int', 'Int'))
+    return None
+
+def _to_pandas(data: Any) -> pd.DataFrame:
+    return data.to_pandas(types_mapper=_nullable_dtype)
+
+def _source_dtypes(source: FrameSource) -> pd.Series:
+    if isinstance(source, str):
+        return _to_pandas(_source_schema(source).empty_table()).dtypes
+    return source.dtypes
+
+def _source_batches(source: FrameSource, schema) -> Iterator[Any]:
+    """A source's rows as Arrow record batches with the given schema, one at a time"""
+    import pyarrow as pa
+    
+    if isinstance(source, str):
+        with pa.memory_map(source, 'r') as f:
+            reader = pa.ipc.open_file(f)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index).select(schema.names).replace_schema_metadata(None)
+        return
+    
+    for start in range(0, len(source), SLICE_ROWS):
+        frame = source.iloc[start:start + SLICE_ROWS]
+        yield pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+def _partition_ids(keys: pd.DataFrame, text_keys: List[str], partitions: int) -> np.ndarray:
+    """Partition of each row; equal keys always land in the same partition
+    
+    Numbers hash as floats so an integer batch and a batch whose nulls made
+    it float agree; keys joined as text hash as text on both sides.
+    """
+    normalized = {}
+    for column in keys.columns:
+        values = keys[column]
+        if column not in text_keys and _is_number(values.dtype):
+            normalized[column] = values.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            normalized[column] = values.astype('string')
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+def _partition(source: FrameSource, on: List[str], text_keys: List[str], partitions: int, directory: str) -> List[str]:
+    """Split a source into one Arrow file per key partition"""
+    import pyarrow as pa
+    
+    schema = _source_schema(source)
+    paths = [os.path.join(directory, f"{index:04d}.arrow") for index in range(partitions)]
+    sinks = [pa.OSFile(path, 'wb') for path in paths]
+    writers = [pa.ipc.new_file(sink, schema) for sink in sinks]
+    try:
+        for batch in _source_batches(source, schema):
+            if not batch.num_rows:
+                continue
+            ids = _partition_ids(_to_pandas(batch.select(on)), text_keys, partitions)
+            order = np.argsort(ids, kind='stable')
+            grouped = batch.take(pa.array(order))
+            offset = 0
+            for index, count in enumerate(np.bincount(ids, minlength=partitions)):
+                if count:
+                    writers[index].write_batch(grouped.slice(offset, count))
+                    offset += count
+    finally:
+        for writer, sink in zip(writers, sinks):
+            writer.close()
+            sink.close()
+    return paths
+
+def _read_frame(path: str) -> pd.DataFrame:
+    import pyarrow as pa
+    
+    with pa.memory_map(path, 'r') as f:
+        return _to_pandas(pa.ipc.open_file(f).read_all())
+
+def _unify_schemas(schemas: List[Any]):
+    import pyarrow as pa
+    
+    try:
+        # Widen int to float where only some partitions had unmatched rows
+        return pa.unify_schemas(schemas, promote_options='permissive')
+    except TypeError:
+        # pyarrow before 14
+        return pa.unify_schemas(schemas)
+
+def write_combined(paths: List[str], output_path: str) -> int:
+    """Append Arrow files into one, promoting column types they disagree on; returns rows"""
+    import pyarrow as pa
+    
+    schemas = []
+    for path in paths:
+        with pa.memory_map(path, 'r') as f:
+            schemas.append(pa.ipc.open_file(f).schema.remove_metadata())
+    schema = _unify_schemas(schemas)
+    
+    rows = 0
+    with pa.OSFile(output_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for path in paths:
+            with pa.memory_map(path, 'r') as f:
+                table = pa.ipc.open_file(f).read_all().replace_schema_metadata(None)
+            for name in schema.names:
+                if name not in table.column_names:
+                    table = table.append_column(name, pa.nulls(table.num_rows, schema.field(name).type))
+            writer.write_table(table.select(schema.names).cast(schema))
+            rows += table.num_rows
+    return rows
+
+def join_partitioned(
+    left: FrameSource,
+    right: FrameSource,
+    on: List[str],
+    how: str,
+    output_path: str,
+    partitions: int,
+    suffix: str = '_right'
+) -> JoinStats:
+    """Join two sources out of core into an Arrow file at output_path"""
+    import pyarrow as pa
+    
+    if how not in JOIN_MODES:
+        raise ValueError(f"Unknown join mode {how!r}; expected one of {', '.join(JOIN_MODES)}")
+    
+    # Cast decisions are made on the whole sides' dtypes, before any rows are split
+    casts = key_casts(_source_dtypes(left), _source_dtypes(right), on)
+    text_keys = [column for column, dtype in casts.items() if dtype == 'string']
+    
+    work_dir = tempfile.mkdtemp(prefix='join_', dir=os.path.dirname(output_path) or None)
+    try:
+        os.makedirs(os.path.join(work_dir, 'left'))
+        os.makedirs(os.path.join(work_dir, 'right'))
+        os.makedirs(os.path.join(work_dir, 'out'))
+        left_paths = _partition(left, on, text_keys, partitions, os.path.join(work_dir, 'left'))
+        right_paths = _partition(right, on, text_keys, partitions, os.path.join(work_dir, 'right'))
+        
+        stats = JoinStats(key_casts=casts, partitions=partitions)
+        result_paths = []
+        for index in range(partitions):
+            result, partition_stats = join_frames(
+                _read_frame(left_paths[index]), _read_frame(right_paths[index]), on, how, suffix
+            )
+            stats.add(partition_stats)
+            
+            path = os.path.join(work_dir, 'out', f"{index:04d}.arrow")
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            result_paths.append(path)
+            
+            os.remove(left_paths[index])
+            os.remove(right_paths[index])
+            del result, table
+        
+        write_combined(result_paths, output_path)
+        return stats
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def concat_partitioned(sources: List[FrameSource], output_path: str) -> int:
+    """Stack sources row-wise into an Arrow file without loading them together; returns rows"""
+    import pyarrow as pa
+    
+    work_dir = tempfile.mkdtemp(prefix='concat_', dir=os.path.dirname(output_path) or None)
+    try:
+        paths = []
+        for index, source in enumerate(sources):
+            if isinstance(source, str):
+                paths.append(source)
+                continue
+            path = os.path.join(work_dir, f"{index:04d}.arrow")
+            schema = _source_schema(source)
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                for batch in _source_batches(source, schema):
+                    writer.write_batch(batch)
+            paths.append(path)
+        return write_combined(paths, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# =====================================
+# Merge Node Entry Points
+# =====================================
+
+def join_many(frames: List[pd.DataFrame], names: List[str], on: List[str], how: str) -> Tuple[pd.DataFrame, List[JoinStats]]:
+    """Join frames left to right; columns of later frames clashing with earlier ones get _<name>"""
+    result = frames[0]
+    steps = []
+    for frame, name in zip(frames[1:], names[1:]):
+        result, stats = join_frames(result, frame, on, how, suffix=f"_{name}")
+        steps.append(stats)
+    return result, steps
+
+def join_many_partitioned(
+    sources: List[FrameSource],
+    names: List[str],
+    on: List[str],
+    how: str,
+    output_path: str,
+    partitions: int
+) -> List[JoinStats]:
+    """join_many out of core, into an Arrow file at output_path"""
+    steps = []
+    left = sources[0]
+    for index, (source, name) in enumerate(zip(sources[1:], names[1:]), start=2):
+        path = output_path if index == len(sources) else f"{output_path}.{index}"
+        steps.append(join_partitioned(left, source, on, how, path, partitions, suffix=f"_{name}"))
+        if isinstance(left, str) and left.startswith(output_path):
+            os.remove(left)
+        left = path
+    return steps
+
+def arrow_file_shape(path: str) -> List[int]:
+    """Rows and columns of an Arrow IPC file, read from its metadata"""
+    import pyarrow as pa
+    
+    with pa.memory_map(path, 'r') as f:
+        reader = pa.ipc.open_file(f)
+        rows = sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+        return [rows, len(reader.schema.names)]
@@ -0,0 +1,239 @@
+# =====================================
+# Variable Interpolation
+# =====================================
+#
+# Node config values may reference flow variables: a whole value such as
+# "${excel_data}" resolves to the variable itself, paths such as
+# "${excel_data.rows}", "${files[0]}" or "${row['Total']}" walk into it, and
+# text such as "report_${date}.xlsx" is interpolated. Values are parsed once
+# into Template objects; resolving them does no string scanning.
+
+import functools
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+_MISSING = object()
+
+# Path segments that are computed when the object has no such key/attribute
+VIRTUAL_ATTRIBUTES = {
+    'rows': len,
+    'length': len
+}
+
+class TemplateError(ValueError):
+    """A variable path could not be resolved"""
+
+class Template:
+    """A parsed config value"""
+    
+    # Variable names the value references
+    references: Set[str] = frozenset()
+    
+    def resolve(self, variables: Mapping[str, Any]) -> Any:
+        raise NotImplementedError
+
+class Constant(Template):
+    """A value with no variable references"""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value: Any):
+        self.value = value
+    
+    def resolve(self, variables: Mapping[str, Any]) -> Any:
+        return self.value
+
+class Reference(Template):
+    """A single ${name.path[0]} reference; resolves to the referenced object"""
+    
+    __slots__ = ('name', 'path', 'text', 'references')
+    
+    def __init__(self, name: str, path: Tuple[Tuple[str, Union[str, int]], ...], text: str):
+        self.name = name
+        self.path = path
+        self.text = text
+        self.references = frozenset([name])
+    
+    def resolve(self, variables: Mapping[str, Any]) -> Any:
+        value = variables.get(self.name, _MISSING)
+        if value is _MISSING:
+            # Unknown variables resolve to the literal text, as they always have
+            return self.text
+        
+        for kind, key in self.path:
+            value = _step(value, kind, key, self.text)
+        return value
+
+class Interpolation(Template):
+    """Text with embedded references; resolves to a string"""
+    
+    __slots__ = ('parts', 'references')
+    
+    def __init__(self, parts: List[Union[str, Reference]]):
+        self.parts = parts
+        self.references = frozenset(
+            part.name for part in parts if isinstance(part, Reference)
+        )
+    
+    def resolve(self, variables: Mapping[str, Any]) -> str:
+        return ''.join(
+            part if isinstance(part, str) else str(part.resolve(variables))
+            for part in self.parts
+        )
+
+class DictTemplate(Template):
+    """A dict whose values contain references"""
+    
+    __slots__ = ('items', 'references')
+    
+    def __init__(self, items: Dict[Any, Template]):
+        self.items = items
+        self.references = frozenset().union(*(t.references for t in items.values()))
+    
+    def resolve(self, variables: Mapping[str, Any]) -> Dict[Any, Any]:
+        return {key: template.resolve(variables) for key, template in self.items.items()}
+
+class ListTemplate(Template):
+    """A list whose items contain references"""
+    
+    __slots__ = ('items', 'references')
+    
+    def __init__(self, items: List[Template]):
+        self.items = items
+        self.references = frozenset().union(*(t.references for t in items))
+    
+    def resolve(self, variables: Mapping[str, Any]) -> List[Any]:
+        return [template.resolve(variables) for template in self.items]
+
+def _step(value: Any, kind: str, key: Union[str, int], text: str) -> Any:
+    """Follow one path segment"""
+    try:
+        if kind == 'index':
+            return value[key]
+        if isinstance(value, Mapping):
+            if key in value:
+                return value[key]
+        elif hasattr(value, key):
+            return getattr(value, key)
+    except (KeyError, IndexError, TypeError) as e:
+        raise TemplateError(f"{text}: {type(e).__name__} {e}") from None
+    
+    virtual = VIRTUAL_ATTRIBUTES.get(key)
+    if virtual is not None:
+        return virtual(value)
+    raise TemplateError(f"{text}: {type(value).__name__} has no attribute or key '{key}'")
+
+# =====================================
+# Parsing
+# =====================================
+
+def _is_identifier_start(char: str) -> bool:
+    return char.isalpha() or char == '_'
+
+def _parse_reference(expression: str, text: str) -> Optional[Reference]:
+    """Parse 'name.attr[0]["key"]'; None if the expression is not a variable path"""
+    expression = expression.strip()
+    length = len(expression)
+    if not length or not _is_identifier_start(expression[0]):
+        return None
+    
+    position = 1
+    while position < length and (expression[position].isalnum() or expression[position] == '_'):
+        position += 1
+    name = expression[:position]
+    path = []
+    
+    while position < length:
+        char = expression[position]
+        if char == '.':
+            start = position + 1
+            position = start
+            while position < length and (expression[position].isalnum() or expression[position] == '_'):
+                position += 1
+            if position == start:
+                return None
+            path.append(('attr', expression[start:position]))
+        elif char == '[':
+            end = expression.find(']', position)
+            if end < 0:
+                return None
+            key = expression[position + 1:end].strip()
+            if len(key) >= 2 and key[0] == key[-1] and key[0] in ('"', "'"):
+                path.append(('index', key[1:-1]))
+            else:
+                try:
+                    path.append(('index', int(key)))
+                except ValueError:
+                    return None
+            position = end + 1
+        else:
+            return None
+    
+    return Reference(name, tuple(path), text)
+
+@functools.lru_cache(maxsize=4096)
+def _compile_string(value: str) -> Template:
+    if '${' not in value:
+        return Constant(value)
+    
+    parts: List[Union[str, Reference]] = []
+    position = 0
+    while True:
+        start = value.find('${', position)
+        end = value.find('}', start + 2) if start >= 0 else -1
+        if start < 0 or end < 0:
+            parts.append(value[position:])
+            break
+        
+        reference = _parse_reference(value[start + 2:end], value[start:end + 1])
+        if reference is None:
+            # Not a variable path: keep the text as written
+            parts.append(value[position:end + 1])
+        else:
+            parts.append(value[position:start])
+            parts.append(reference)
+        position = end + 1
+    
+    parts = [part for part in parts if part != '']
+    if len(parts) == 1 and isinstance(parts[0], Reference):
+        return parts[0]
+    if not any(isinstance(part, Reference) for part in parts):
+        return Constant(value)
+    
+    # Merge adjacent literals left by unparseable expressions
+    merged: List[Union[str, Reference]] = []
+    for part in parts:
+        if isinstance(part, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+    return Interpolation(merged)
+
+def compile_template(value: Any) -> Template:
+    """Parse a config value (string, dict, list or scalar) into a Template"""
+    if isinstance(value, str):
+        return _compile_string(value)
+    
+    if isinstance(value, dict):
+        items = {key: compile_template(item) for key, item in value.items()}
+        if all(isinstance(item, Constant) for item in items.values()):
+            return Constant(value)
+        return DictTemplate(items)
+    
+    if isinstance(value, (list, tuple)):
+        items = [compile_template(item) for item in value]
+        if all(isinstance(item, Constant) for item in items):
+            return Constant(value)
+        return ListTemplate(items)
+    
+    return Constant(value)
+
+def compile_config(config: Dict[str, Any]) -> Dict[str, Template]:
+    """Compile every value of a node config"""
+    return {key: compile_template(value) for key, value in config.items()}
+
+def template_references(templates: Sequence[Template]) -> Set[str]:
+    """Variable names referenced by a group of templates"""
+    names = set()
+    for template in templates:
+        names |= template.references
+    return names
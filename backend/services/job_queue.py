@@ -0,0 +1,382 @@
+# =====================================
+# Execution Job Queue
+# =====================================
+#
+# Flow runs submitted by the HTTP entry points go through a bounded priority
+# queue instead of each request starting its own event loop. A process runs
+# a fixed number of async workers on one background loop; when the queue is
+# full, submissions are rejected with a retry-after hint so bursts are shed
+# instead of piling up. Backends: in-memory (one process), Redis (shared by
+# every instance) and Cloud Tasks (jobs are pushed to the run_job endpoint).
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+class JobPriority(Enum):
+    """Priority classes; higher classes are always dequeued first"""
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+# Dequeue order of the priority classes
+PRIORITY_RANK = {JobPriority.HIGH: 0, JobPriority.NORMAL: 1, JobPriority.LOW: 2}
+
+# Statuses a job never leaves
+TERMINAL_STATUSES = ('completed', 'failed', 'rejected')
+
+class QueueFull(Exception):
+    """The queue is at its depth limit; retry after retry_after seconds"""
+    
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Job queue is full ({depth} jobs waiting), retry in {retry_after}s")
+        self.depth = depth
+        self.retry_after = retry_after
+
+@dataclass
+class Job:
+    """A queued unit of work: a job kind and its JSON payload"""
+    kind: str
+    payload: Dict[str, Any]
+    priority: JobPriority = JobPriority.NORMAL
+    job_id: str = field(default_factory=lambda: f"job_{uuid.uuid4().hex}")
+    submitted_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['priority'] = self.priority.value
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Job':
+        return cls(**{**data, 'priority': JobPriority(data.get('priority', 'normal'))})
+
+# =====================================
+# Backends
+# =====================================
+
+class JobQueueBackend:
+    """Storage for queued jobs and their status records"""
+    
+    # Whether jobs are delivered elsewhere (no local workers pop them)
+    remote = False
+    
+    def push(self, job: Job, max_depth: int = 0) -> bool:
+        """Enqueue a job; False if the queue already holds max_depth jobs"""
+        raise NotImplementedError
+    
+    def pop(self, timeout: float) -> Optional[Job]:
+        """Dequeue the highest-priority, oldest job, waiting up to timeout seconds (blocking)"""
+        raise NotImplementedError
+    
+    def depth(self) -> int:
+        """Jobs waiting to be picked up"""
+        raise NotImplementedError
+    
+    def save_status(self, job_id: str, record: Dict[str, Any]):
+        """Store a job's status record"""
+        raise NotImplementedError
+    
+    def load_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's status record, if still known"""
+        raise NotImplementedError
+
+class MemoryQueueBackend(JobQueueBackend):
+    """Jobs in a process-local heap; statuses of the last max_statuses jobs are kept"""
+    
+    def __init__(self, max_statuses: int = 1000):
+        self.max_statuses = max_statuses
+        self._heap: List[Tuple[int, int, Job]] = []
+        self._sequence = itertools.count()
+        self._statuses: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._condition = threading.Condition()
+    
+    def push(self, job: Job, max_depth: int = 0) -> bool:
+        with self._condition:
+            if max_depth and len(self._heap) >= max_depth:
+                return False
+            heapq.heappush(self._heap, (PRIORITY_RANK[job.priority], next(self._sequence), job))
+            self._condition.notify()
+            return True
+    
+    def pop(self, timeout: float) -> Optional[Job]:
+        with self._condition:
+            if not self._heap:
+                self._condition.wait(timeout)
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+    
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._heap)
+    
+    def save_status(self, job_id: str, record: Dict[str, Any]):
+        with self._condition:
+            self._statuses.pop(job_id, None)
+            self._statuses[job_id] = record
+            while len(self._statuses) > self.max_statuses:
+                self._statuses.popitem(last=False)
+    
+    def load_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            return self._statuses.get(job_id)
+
+class RedisQueueBackend(JobQueueBackend):
+    """Jobs in a Redis sorted set shared by every instance
+    
+    The score orders by priority class, then by a submission counter, so
+    BZPOPMIN hands out the highest-priority, oldest job. The depth check
+    and the push are separate commands, so a burst can overshoot max_depth
+    by the number of concurrent submitters.
+    """
+    
+    def __init__(self, client, name: str = 'agentiqware:jobs', status_ttl: int = 86400):
+        self.client = client
+        self.name = name
+        self.status_ttl = status_ttl
+    
+    def push(self, job: Job, max_depth: int = 0) -> bool:
+        if max_depth and self.client.zcard(self.name) >= max_depth:
+            return False
+        sequence = self.client.incr(f"{self.name}:sequence")
+        score = PRIORITY_RANK[job.priority] * 10 ** 12 + sequence
+        self.client.zadd(self.name, {json.dumps(job.to_dict()): score})
+        return True
+    
+    def pop(self, timeout: float) -> Optional[Job]:
+        # BZPOPMIN takes whole seconds, and 0 would block forever
+        popped = self.client.bzpopmin(self.name, timeout=max(1, math.ceil(timeout)))
+        if not popped:
+            return None
+        return Job.from_dict(json.loads(popped[1]))
+    
+    def depth(self) -> int:
+        return int(self.client.zcard(self.name))
+    
+    def save_status(self, job_id: str, record: Dict[str, Any]):
+        self.client.set(f"{self.name}:status:{job_id}", json.dumps(record, default=str), ex=self.status_ttl)
+    
+    def load_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        record = self.client.get(f"{self.name}:status:{job_id}")
+        return json.loads(record) if record else None
+
+class CloudTasksQueueBackend(JobQueueBackend):
+    """Jobs created as Cloud Tasks that POST to the run_job endpoint
+    
+    Each priority class is its own queue ('<queue>-high', ...), so the
+    queues' dispatch rates set the relative priority and Cloud Tasks does
+    the rate limiting; there is no local depth or status to report.
+    """
+    
+    remote = True
+    
+    def __init__(
+        self,
+        client,
+        project: str,
+        location: str,
+        queue: str,
+        url: str,
+        service_account: Optional[str] = None
+    ):
+        self.client = client
+        self.project = project
+        self.location = location
+        self.queue = queue
+        self.url = url
+        self.service_account = service_account
+    
+    def push(self, job: Job, max_depth: int = 0) -> bool:
+        parent = self.client.queue_path(self.project, self.location, f"{self.queue}-{job.priority.value}")
+        http_request = {
+            'http_method': 'POST',
+            'url': self.url,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps(job.to_dict()).encode()
+        }
+        if self.service_account:
+            http_request['oidc_token'] = {'service_account_email': self.service_account}
+        
+        self.client.create_task(request={'parent': parent, 'task': {'http_request': http_request}})
+        return True
+    
+    def pop(self, timeout: float) -> Optional[Job]:
+        raise NotImplementedError("Cloud Tasks delivers jobs to the run_job endpoint")
+    
+    def depth(self) -> int:
+        return 0
+    
+    def save_status(self, job_id: str, record: Dict[str, Any]):
+        pass
+    
+    def load_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+# =====================================
+# Queue and Workers
+# =====================================
+
+JobHandler = Callable[[Job], Awaitable[Any]]
+
+class JobQueue:
+    """Bounded priority queue with a pool of async workers on a background loop"""
+    
+    # Seconds a worker waits in pop() before checking for shutdown
+    POLL_SECONDS = 1.0
+    
+    # Backoff between status reads in wait(), doubling from the first to the last
+    WAIT_POLL_SECONDS = (0.05, 2.0)
+    
+    def __init__(
+        self,
+        backend: JobQueueBackend,
+        handler: JobHandler,
+        workers: int = 4,
+        max_depth: int = 100
+    ):
+        self.backend = backend
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pop_pool: Optional[ThreadPoolExecutor] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        
+        # Jobs someone in this process is waiting for, set when a local worker finishes them
+        self._done: Dict[str, threading.Event] = {}
+        
+        # Moving average of job durations, for the retry-after hint
+        self._average_seconds: Optional[float] = None
+    
+    def submit(self, kind: str, payload: Dict[str, Any], priority: Any = JobPriority.NORMAL) -> Job:
+        """Enqueue a job, raising QueueFull with a retry hint at the depth limit"""
+        job = Job(kind=kind, payload=payload, priority=JobPriority(priority))
+        
+        if not self.backend.remote:
+            self.start()
+        self.backend.save_status(job.job_id, self._record(job, 'queued'))
+        
+        if not self.backend.push(job, self.max_depth):
+            depth = self.backend.depth()
+            self.backend.save_status(job.job_id, self._record(job, 'rejected'))
+            raise QueueFull(depth, self.retry_after(depth))
+        return job
+    
+    def retry_after(self, depth: Optional[int] = None) -> int:
+        """Seconds for the workers to drain the jobs ahead, at the average job duration"""
+        depth = self.backend.depth() if depth is None else depth
+        average = self._average_seconds or 1.0
+        return max(1, math.ceil(average * max(depth, 1) / self.workers))
+    
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's status record: queued, running, completed, failed or rejected"""
+        return self.backend.load_status(job_id)
+    
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a job finishes or timeout passes; returns its latest status record
+        
+        The job may run on any instance sharing the backend, so its status is
+        polled with backoff; a local worker finishing it wakes the wait early.
+        Unknown jobs (no status record) return None at once.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            done = self._done.setdefault(job_id, threading.Event())
+        delay, max_delay = self.WAIT_POLL_SECONDS
+        try:
+            while True:
+                record = self.status(job_id)
+                if record is None or record.get('status') in TERMINAL_STATUSES:
+                    return record
+                
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return record
+                done.wait(delay if remaining is None else min(delay, remaining))
+                delay = min(delay * 2, max_delay)
+        finally:
+            with self._lock:
+                if self._done.get(job_id) is done:
+                    del self._done[job_id]
+    
+    # Workers
+    
+    def start(self):
+        """Start the worker loop thread if it isn't running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._pop_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-pop')
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, name='job-workers', daemon=True)
+            self._thread.start()
+    
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        workers = [self._worker() for _ in range(self.workers)]
+        self._loop.run_until_complete(asyncio.gather(*workers))
+        self._loop.close()
+    
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            job = await loop.run_in_executor(self._pop_pool, self.backend.pop, self.POLL_SECONDS)
+            if job is not None:
+                await self.run_job(job)
+    
+    async def run_job(self, job: Job) -> Dict[str, Any]:
+        """Run a job through the handler and record its outcome"""
+        started = time.perf_counter()
+        self.backend.save_status(job.job_id, self._record(job, 'running'))
+        try:
+            result = await self.handler(job)
+            record = self._record(job, 'completed', result=result)
+        except Exception as e:
+            record = self._record(job, 'failed', error=str(e))
+        
+        elapsed = time.perf_counter() - started
+        self._average_seconds = elapsed if self._average_seconds is None else 0.8 * self._average_seconds + 0.2 * elapsed
+        record['duration_ms'] = round(elapsed * 1000, 1)
+        
+        self.backend.save_status(job.job_id, record)
+        with self._lock:
+            done = self._done.get(job.job_id)
+        if done is not None:
+            done.set()
+        return record
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the workers once their current jobs finish"""
+        self._stopping.set()
+        thread = self._thread
+        if wait and thread is not None:
+            thread.join()
+        if self._pop_pool is not None:
+            self._pop_pool.shutdown(wait=wait)
+    
+    @staticmethod
+    def _record(job: Job, status: str, **extra) -> Dict[str, Any]:
+        return {
+            'job_id': job.job_id,
+            'kind': job.kind,
+            'priority': job.priority.value,
+            'status': status,
+            'submitted_at': job.submitted_at,
+            'updated_at': datetime.utcnow().isoformat(),
+            **extra
+        }
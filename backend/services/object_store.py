@@ -0,0 +1,303 @@
+# =====================================
+# Object Store
+# =====================================
+#
+# How executors read gs:// objects. Whole objects are streamed to a spool
+# file in a local cache keyed by bucket, path and generation, so an
+# unchanged object is downloaded once per instance however many flows read
+# it, and readers get a local path instead of the object's bytes in memory.
+# Formats that can seek (the zip behind an xlsx, Parquet footers) read
+# byte ranges through open() without downloading the rest; streamed Excel
+# reads that bypass the Parquet cache do. The local
+# backend serves gs:// URLs from a directory, for tests and offline runs.
+
+import hashlib
+import io
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Any, BinaryIO, Callable, Optional, Tuple
+
+def parse_url(url: str) -> Tuple[str, str]:
+    """Bucket and object path of a gs:// URL"""
+    if not url.startswith('gs://'):
+        raise ValueError(f"Not a gs:// URL: {url}")
+    bucket, _, path = url[len('gs://'):].partition('/')
+    if not bucket or not path:
+        raise ValueError(f"gs:// URL needs a bucket and object path: {url}")
+    return bucket, path
+
+@dataclass
+class ObjectInfo:
+    """Metadata of one object version"""
+    url: str
+    size: int
+    generation: str
+
+# =====================================
+# Backends
+# =====================================
+
+class ObjectBackend:
+    """Reads objects from a bucket store"""
+    
+    def stat(self, url: str) -> ObjectInfo:
+        """Current version of an object; FileNotFoundError if it does not exist (blocking)"""
+        raise NotImplementedError
+    
+    def download(self, info: ObjectInfo, file: BinaryIO):
+        """Stream an object version into a file (blocking)"""
+        raise NotImplementedError
+    
+    def read_range(self, info: ObjectInfo, start: int, length: int) -> bytes:
+        """Up to length bytes of an object version from offset start (blocking)"""
+        raise NotImplementedError
+
+class GCSObjectBackend(ObjectBackend):
+    """Cloud Storage; downloads are pinned to the generation that was stat'ed"""
+    
+    def __init__(self, client_factory: Callable[[], Any]):
+        self.client_factory = client_factory
+    
+    def _blob(self, info: ObjectInfo):
+        bucket, path = parse_url(info.url)
+        return self.client_factory().bucket(bucket).blob(path, generation=int(info.generation))
+    
+    def stat(self, url: str) -> ObjectInfo:
+        bucket, path = parse_url(url)
+        blob = self.client_factory().bucket(bucket).get_blob(path)
+        if blob is None:
+            raise FileNotFoundError(f"Object not found: {url}")
+        return ObjectInfo(url, blob.size, str(blob.generation))
+    
+    def download(self, info: ObjectInfo, file: BinaryIO):
+        self._blob(info).download_to_file(file)
+    
+    def read_range(self, info: ObjectInfo, start: int, length: int) -> bytes:
+        if length <= 0 or start >= info.size:
+            return b''
+        # The end offset is inclusive
+        return self._blob(info).download_as_bytes(start=start, end=min(start + length, info.size) - 1)
+
+class LocalObjectBackend(ObjectBackend):
+    """gs://bucket/path served from root/bucket/path; the generation is the file's mtime"""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _path(self, url: str) -> str:
+        bucket, path = parse_url(url)
+        return os.path.join(self.root, bucket, *path.split('/'))
+    
+    def stat(self, url: str) -> ObjectInfo:
+        try:
+            stat = os.stat(self._path(url))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Object not found: {url}") from None
+        return ObjectInfo(url, stat.st_size, str(stat.st_mtime_ns))
+    
+    def _open(self, info: ObjectInfo) -> BinaryIO:
+        f = open(self._path(info.url), 'rb')
+        if str(os.fstat(f.fileno()).st_mtime_ns) != info.generation:
+            f.close()
+            raise FileNotFoundError(f"Object {info.url} generation {info.generation} no longer exists")
+        return f
+    
+    def download(self, info: ObjectInfo, file: BinaryIO):
+        with self._open(info) as f:
+            shutil.copyfileobj(f, file)
+    
+    def read_range(self, info: ObjectInfo, start: int, length: int) -> bytes:
+        with self._open(info) as f:
+            f.seek(start)
+            return f.read(max(length, 0))
+
+# =====================================
+# Ranged Reads
+# =====================================
+
+class RangedObjectReader(io.RawIOBase):
+    """Seekable, read-only file over an object version; each read is a ranged request"""
+    
+    def __init__(self, backend: ObjectBackend, info: ObjectInfo):
+        self.backend = backend
+        self.info = info
+        self._position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.info.size}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+    
+    def readinto(self, buffer) -> int:
+        data = self.backend.read_range(self.info, self._position, len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+# =====================================
+# Object Store
+# =====================================
+
+class ObjectStore:
+    """Object access with a local, size-capped LRU cache of downloaded versions"""
+    
+    def __init__(self, backend: ObjectBackend, cache_dir: str, max_bytes: int = 0, read_buffer: int = 1024 * 1024):
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.read_buffer = read_buffer
+        self.hits = 0
+        self.downloads = 0
+        self.downloaded_bytes = 0
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Tuple[str, int]]] = None
+        self._total_bytes = 0
+        
+        # One download per object version at a time; others wait for it
+        self._downloading: Dict[str, threading.Lock] = {}
+    
+    def stat(self, url: str) -> ObjectInfo:
+        return self.backend.stat(url)
+    
+    @staticmethod
+    def _key(info: ObjectInfo) -> str:
+        bucket, path = parse_url(info.url)
+        return hashlib.sha256(f"{bucket}/{path}#{info.generation}".encode('utf-8')).hexdigest()
+    
+    def _index(self) -> Dict[str, Tuple[str, int]]:
+        """Cached file names and sizes in least-recently-used order, read from disk once"""
+        if self._entries is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            found = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime_ns, entry.name.split('.', 1)[0], entry.name, stat.st_size))
+            found.sort()
+            self._entries = {key: (name, size) for _, key, name, size in found}
+            self._total_bytes = sum(size for _, size in self._entries.values())
+        return self._entries
+    
+    def _cached(self, key: str) -> Optional[str]:
+        """Path of a cached version, marked recently used"""
+        with self._lock:
+            entries = self._index()
+            if key not in entries:
+                return None
+            path = os.path.join(self.cache_dir, entries[key][0])
+            try:
+                os.utime(path)
+            except OSError:
+                # Evicted by another process
+                self._total_bytes -= entries.pop(key)[1]
+                return None
+            entries[key] = entries.pop(key)
+            return path
+    
+    def local_path(self, url: str, info: Optional[ObjectInfo] = None) -> str:
+        """Local copy of an object version, downloaded on first use (blocking)
+        
+        The copy keeps the object's extension, so readers that pick a
+        format by file name still can.
+        """
+        info = info or self.stat(url)
+        key = self._key(info)
+        path = self._cached(key)
+        if path is not None:
+            self.hits += 1
+            return path
+        
+        with self._lock:
+            download_lock = self._downloading.setdefault(key, threading.Lock())
+        try:
+            with download_lock:
+                # Another caller may have finished the download meanwhile
+                path = self._cached(key)
+                if path is not None:
+                    self.hits += 1
+                    return path
+                
+                os.makedirs(self.cache_dir, exist_ok=True)
+                name = key + os.path.splitext(parse_url(url)[1])[1].lower()
+                staging_path = os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+                try:
+                    with open(staging_path, 'wb') as f:
+                        self.backend.download(info, f)
+                except BaseException:
+                    if os.path.exists(staging_path):
+                        os.remove(staging_path)
+                    raise
+                return self._add(key, name, staging_path)
+        finally:
+            # Failed downloads too, or the lock would stay behind for every key
+            with self._lock:
+                if self._downloading.get(key) is download_lock:
+                    del self._downloading[key]
+    
+    def _add(self, key: str, name: str, staging_path: str) -> str:
+        """Move a download into place, evicting old entries over the cap"""
+        with self._lock:
+            entries = self._index()
+            path = os.path.join(self.cache_dir, name)
+            os.replace(staging_path, path)
+            
+            size = os.path.getsize(path)
+            self.downloads += 1
+            self.downloaded_bytes += size
+            entries[key] = (name, size)
+            self._total_bytes += size
+            
+            while self.max_bytes and self._total_bytes > self.max_bytes and len(entries) > 1:
+                oldest = next(iter(entries))
+                oldest_name, oldest_size = entries.pop(oldest)
+                self._total_bytes -= oldest_size
+                try:
+                    os.remove(os.path.join(self.cache_dir, oldest_name))
+                except OSError:
+                    pass
+            return path
+    
+    def open(self, url: str, info: Optional[ObjectInfo] = None) -> BinaryIO:
+        """Seekable binary file over an object version (blocking)
+        
+        A cached copy is opened directly; otherwise reads are ranged
+        requests through a read_buffer-sized buffer, and nothing is cached.
+        """
+        info = info or self.stat(url)
+        path = self._cached(self._key(info))
+        if path is not None:
+            return open(path, 'rb')
+        return io.BufferedReader(RangedObjectReader(self.backend, info), buffer_size=self.read_buffer)
+    
+    def clear(self):
+        """Remove every cached copy"""
+        with self._lock:
+            for name, _ in self._index().values():
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+            self._entries = {}
+            self._total_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit, download and size counters"""
+        return {
+            'hits': self.hits,
+            'downloads': self.downloads,
+            'downloaded_bytes': self.downloaded_bytes,
+            'entries': len(self._entries or {}),
+            'bytes': self._total_bytes
+        }
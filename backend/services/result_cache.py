@@ -0,0 +1,242 @@
+# =====================================
+# Node Result Cache
+# =====================================
+#
+# Opt-in memoization of node results for incremental re-runs. A node's key
+# hashes its flow, type, executor, resolved config and fingerprints of the
+# variables it reads (DataFrame content hashes, file mtime and size, every
+# entry under a folder or a lazy search's folder, gs:// object generations). The node's result and
+# the variables it wrote are stored under that key in a local directory
+# with a size cap and least-recently-used eviction.
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+from services.file_index import FileWalk
+
+# Bump to invalidate every stored entry when the key or entry format changes
+CACHE_FORMAT_VERSION = 2
+
+# Current version of a gs:// object (ObjectStore.stat); raises FileNotFoundError if missing
+ObjectStat = Callable[[str], Any]
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+def _fingerprint_directory(path: str) -> str:
+    """Digest of the names, sizes and mtimes of everything under a directory"""
+    entries = []
+    for root, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for name in sorted(filenames) + dirnames:
+            full_path = os.path.join(root, name)
+            try:
+                stat = os.stat(full_path, follow_symlinks=False)
+            except OSError:
+                continue
+            entries.append([os.path.relpath(full_path, path), stat.st_size, stat.st_mtime_ns])
+    return _digest(json.dumps(entries).encode('utf-8'))
+
+def _fingerprint_object(url: str, stat_object: Optional[ObjectStat]) -> Any:
+    """A gs:// object's current generation"""
+    if stat_object is None:
+        # No way to tell whether the object changed, so never a hit
+        return ['object', url, time.monotonic()]
+    try:
+        info = stat_object(url)
+    except FileNotFoundError:
+        return ['object', url, None]
+    except Exception:
+        return ['object', url, time.monotonic()]
+    return ['object', url, str(info.generation)]
+
+def fingerprint(value: Any, memo: Optional[Dict[int, Any]] = None, stat_object: Optional[ObjectStat] = None) -> Any:
+    """JSON-able fingerprint that changes whenever the value's content changes
+    
+    stat_object looks up gs:// object versions; without it, values naming
+    objects never match a previous fingerprint.
+    """
+    if memo is None:
+        memo = {}
+    if id(value) in memo:
+        return memo[id(value)]
+    
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    
+    if isinstance(value, str):
+        # Paths to local files and folders change with their contents
+        if value.startswith('gs://') and '/' in value[len('gs://'):]:
+            result = _fingerprint_object(value, stat_object)
+        elif value and len(value) < 4096 and os.path.isdir(value):
+            result = ['dir', value, _fingerprint_directory(value)]
+        elif value and len(value) < 4096 and os.path.exists(value):
+            stat = os.stat(value)
+            result = ['file', value, stat.st_size, stat.st_mtime_ns]
+        else:
+            result = value
+    elif isinstance(value, bytes):
+        result = ['bytes', _digest(value)]
+    elif isinstance(value, dict):
+        result = {str(key): fingerprint(item, memo, stat_object) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        result = [fingerprint(item, memo, stat_object) for item in value]
+    elif hasattr(value, 'shape') and hasattr(value, 'memory_usage'):
+        result = _fingerprint_pandas(value)
+    elif isinstance(value, FileWalk):
+        # The search runs when iterated, so its result follows the folder's contents
+        result = [
+            'FileWalk', value.folder, value.pattern, value.recursive, value.max_depth, value.max_results,
+            _fingerprint_directory(value.folder)
+        ]
+    else:
+        try:
+            result = [type(value).__name__, _digest(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))]
+        except Exception:
+            # Unpicklable objects never produce a cache hit
+            result = [type(value).__name__, id(value), time.monotonic()]
+    
+    memo[id(value)] = result
+    return result
+
+def _fingerprint_pandas(value: Any) -> Any:
+    """Fingerprint a DataFrame or Series by hashing its rows"""
+    import pandas as pd
+    
+    try:
+        row_hashes = pd.util.hash_pandas_object(value, index=True).values
+        content = _digest(row_hashes.tobytes())
+    except TypeError:
+        # Unhashable cells (lists, dicts)
+        content = _digest(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    
+    columns = [str(column) for column in getattr(value, 'columns', [])]
+    dtypes = [str(dtype) for dtype in value.dtypes] if hasattr(value, 'columns') else [str(value.dtype)]
+    return [type(value).__name__, list(value.shape), columns, dtypes, content]
+
+def node_cache_key(
+    flow_id: str,
+    node_type: str,
+    executor: str,
+    config: Dict[str, Any],
+    inputs: Dict[str, Any],
+    stat_object: Optional[ObjectStat] = None
+) -> str:
+    """Content address of a node run, scoped to its flow"""
+    memo = {}
+    payload = json.dumps(
+        {
+            'format': CACHE_FORMAT_VERSION,
+            'flow': flow_id,
+            'type': node_type,
+            'executor': executor,
+            'config': fingerprint(config, memo, stat_object),
+            'inputs': {name: fingerprint(value, memo, stat_object) for name, value in inputs.items()}
+        },
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class NodeResultCache:
+    """Local, size-capped LRU store of node results and the variables they wrote"""
+    
+    def __init__(self, directory: str, max_bytes: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, int]] = None
+        self._total_bytes = 0
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+    
+    def _index(self) -> Dict[str, int]:
+        """Entry sizes in least-recently-used order, read from disk once"""
+        if self._entries is None:
+            os.makedirs(self.directory, exist_ok=True)
+            found = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime_ns, entry.name[:-4], stat.st_size))
+            found.sort()
+            self._entries = {key: size for _, key, size in found}
+            self._total_bytes = sum(self._entries.values())
+        return self._entries
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load an entry ({'result', 'outputs'}) and mark it recently used (blocking)"""
+        with self._lock:
+            entries = self._index()
+            if key not in entries:
+                self.misses += 1
+                return None
+            
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    entry = pickle.load(f)
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                # Evicted by another process, or a torn write
+                self._total_bytes -= entries.pop(key)
+                self.misses += 1
+                return None
+            
+            entries[key] = entries.pop(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: str, result: Any, outputs: Dict[str, Any]):
+        """Store a node's result and written variables, evicting old entries over the cap (blocking)"""
+        with self._lock:
+            entries = self._index()
+            path = self._path(key)
+            try:
+                with open(path + '.tmp', 'wb') as f:
+                    pickle.dump({'result': result, 'outputs': outputs}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                # Results holding handles or locks are not cacheable
+                os.remove(path + '.tmp')
+                return
+            os.replace(path + '.tmp', path)
+            
+            self._total_bytes -= entries.pop(key, 0)
+            entries[key] = os.path.getsize(path)
+            self._total_bytes += entries[key]
+            
+            while self.max_bytes and self._total_bytes > self.max_bytes and len(entries) > 1:
+                oldest = next(iter(entries))
+                self._total_bytes -= entries.pop(oldest)
+                try:
+                    os.remove(self._path(oldest))
+                except OSError:
+                    pass
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            for key in list(self._index()):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries = {}
+            self._total_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and size counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries or {}),
+            'bytes': self._total_bytes
+        }
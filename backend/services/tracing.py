@@ -0,0 +1,297 @@
+# =====================================
+# Execution Tracing
+# =====================================
+#
+# One span per node run, with the time the node waited in the ready queue,
+# its run time, and what the process's peak RSS and I/O counters did while
+# it ran. Traces are written at the end of an execution as Chrome
+# trace-event JSON (chrome://tracing, Perfetto) and as OTLP JSON, both
+# readable offline. Memory and I/O come from process-wide counters, so
+# nodes running at the same time share them; each span records how many
+# nodes overlapped it.
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows desktop agents
+    resource = None
+
+def resource_usage() -> Dict[str, Optional[int]]:
+    """Current RSS, peak RSS and bytes read/written by the process, where the platform reports them"""
+    usage = {'rss': None, 'peak_rss': None, 'read_bytes': None, 'write_bytes': None}
+    
+    if resource is not None:
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage['peak_rss'] = peak if sys.platform == 'darwin' else peak * 1024
+    
+    try:
+        with open('/proc/self/statm') as f:
+            usage['rss'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        
+        # rchar/wchar count every read and write call: files, shares and sockets
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        usage['read_bytes'] = int(counters['rchar'])
+        usage['write_bytes'] = int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        pass
+    
+    return usage
+
+def _delta(before: Optional[int], after: Optional[int]) -> Optional[int]:
+    return None if before is None or after is None else after - before
+
+@dataclass
+class Span:
+    """A timed operation: an execution, a batch item or a node run"""
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    
+    # Row in the Chrome trace; overlapping spans get different rows
+    slot: int = 0
+    
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else round((self.end_ns - self.start_ns) / 1e6, 3)
+
+class NodeSpan:
+    """A running node's span; end() takes the closing measurements once"""
+    
+    def __init__(self, tracer: 'Tracer', span: Span, usage: Dict[str, Optional[int]], started: float):
+        self.tracer = tracer
+        self.span = span
+        self._usage = usage
+        self._started = started
+        self._timing: Optional[Dict[str, Any]] = None
+    
+    def end(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Close the span and return its timing summary"""
+        if self._timing is None:
+            usage = resource_usage()
+            self.span.end_ns = time.time_ns()
+            self.span.error = None if error is None else (str(error) or type(error).__name__)
+            self.span.attributes.update({
+                'run_ms': round((time.perf_counter() - self._started) * 1000, 3),
+                'rss_delta_bytes': _delta(self._usage['rss'], usage['rss']),
+                'peak_rss_delta_bytes': _delta(self._usage['peak_rss'], usage['peak_rss']),
+                'read_bytes': _delta(self._usage['read_bytes'], usage['read_bytes']),
+                'write_bytes': _delta(self._usage['write_bytes'], usage['write_bytes'])
+            })
+            self.tracer._close(self.span)
+            self._timing = {
+                key: self.span.attributes[key]
+                for key in ('queue_wait_ms', 'run_ms', 'peak_rss_delta_bytes', 'read_bytes', 'write_bytes')
+            }
+        return self._timing
+
+class Tracer:
+    """Collects the spans of one execution"""
+    
+    def __init__(self, name: str, trace_id: Optional[str] = None, max_spans: int = 100000):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._busy_slots: set = set()
+        self.root = Span(name=name, span_id=uuid.uuid4().hex[:16], parent_id=None, start_ns=time.time_ns())
+    
+    def _open(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        with self._lock:
+            slot = 1
+            while slot in self._busy_slots:
+                slot += 1
+            self._busy_slots.add(slot)
+            return Span(
+                name=name,
+                span_id=uuid.uuid4().hex[:16],
+                parent_id=parent_id,
+                start_ns=time.time_ns(),
+                attributes=dict(attributes, concurrent=len(self._busy_slots) - 1),
+                slot=slot
+            )
+    
+    def _close(self, span: Span):
+        with self._lock:
+            self._busy_slots.discard(span.slot)
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+    
+    def start_node(
+        self,
+        node_id: str,
+        node_type: str,
+        queue_wait: Optional[float] = None,
+        parent: Optional[Span] = None
+    ) -> NodeSpan:
+        """Open a node span; queue_wait is the seconds the node sat in the ready queue"""
+        attributes = {
+            'node.id': node_id,
+            'node.type': node_type,
+            'queue_wait_ms': round((queue_wait or 0) * 1000, 3)
+        }
+        span = self._open(node_id, (parent or self.root).span_id, attributes)
+        return NodeSpan(self, span, resource_usage(), time.perf_counter())
+    
+    def finish(self, error: Optional[str] = None):
+        """Close the root span"""
+        if self.root.end_ns is None:
+            self.root.error = error
+            self.root.end_ns = time.time_ns()
+            self._close(self.root)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Span counts and the slowest nodes, for the execution record"""
+        nodes = [span for span in self.spans if 'node.id' in span.attributes]
+        slowest = sorted(nodes, key=lambda span: span.end_ns - span.start_ns, reverse=True)[:5]
+        return {
+            'trace_id': self.trace_id,
+            'spans': len(self.spans),
+            'dropped': self.dropped,
+            'slowest': [
+                {'node_id': span.attributes['node.id'], 'duration_ms': span.duration_ms}
+                for span in slowest
+            ]
+        }
+    
+    # Export
+    
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace-event format: one complete ('X') event per span"""
+        events = []
+        for span in self.spans:
+            args = dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id)
+            if span.error:
+                args['error'] = span.error
+            events.append({
+                'name': span.name,
+                'cat': 'node' if 'node.id' in span.attributes else 'execution',
+                'ph': 'X',
+                'ts': span.start_ns / 1000,
+                'dur': (span.end_ns - span.start_ns) / 1000,
+                'pid': 1,
+                'tid': span.slot,
+                'args': args
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'trace_id': self.trace_id}}
+    
+    def to_otlp(self, service_name: str = 'agentiqware-flow-engine') -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest with every span"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({'service.name': service_name})},
+                'scopeSpans': [{
+                    'scope': {'name': 'agentiqware.flow_engine'},
+                    'spans': [self._otlp_span(span) for span in self.spans]
+                }]
+            }]
+        }
+    
+    def _otlp_span(self, span: Span) -> Dict[str, Any]:
+        otlp = {
+            'traceId': self.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': _otlp_attributes(span.attributes),
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+        if span.parent_id:
+            otlp['parentSpanId'] = span.parent_id
+        return otlp
+    
+    def export(
+        self, directory: str, name: str, formats: List[str], max_files: int = 0, max_bytes: int = 0
+    ) -> List[str]:
+        """Write the trace in each format ('chrome', 'otlp') and return the file paths
+        
+        Older trace files in the directory are then pruned down to max_files
+        and max_bytes (0 = no limit)
+        """
+        os.makedirs(directory, exist_ok=True)
+        writers = {'chrome': ('trace.json', self.to_chrome_trace), 'otlp': ('otlp.json', self.to_otlp)}
+        
+        paths = []
+        for trace_format in formats:
+            if trace_format not in writers:
+                continue
+            suffix, build = writers[trace_format]
+            path = os.path.join(directory, f"{name}.{suffix}")
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(build(), f, default=str)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        prune_traces(directory, max_files, max_bytes, keep=paths)
+        return paths
+
+TRACE_SUFFIXES = ('.trace.json', '.otlp.json')
+
+def prune_traces(directory: str, max_files: int, max_bytes: int, keep: List[str] = ()) -> List[str]:
+    """Delete the oldest trace files beyond max_files / max_bytes; return the removed paths"""
+    if max_files <= 0 and max_bytes <= 0:
+        return []
+    
+    traces = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(TRACE_SUFFIXES):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                traces.append((stat.st_mtime, entry.path, stat.st_size))
+    traces.sort(reverse=True)
+    
+    kept = {os.path.abspath(path) for path in keep}
+    removed = []
+    files = total = 0
+    for _, path, size in traces:
+        files += 1
+        total += size
+        within = (max_files <= 0 or files <= max_files) and (max_bytes <= 0 or total <= max_bytes)
+        if within or os.path.abspath(path) in kept:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        files -= 1
+        total -= size
+        removed.append(path)
+    return removed
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """OTLP AnyValue key/values; 64-bit ints are strings in OTLP/JSON"""
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            any_value = {'boolValue': value}
+        elif isinstance(value, int):
+            any_value = {'intValue': str(value)}
+        elif isinstance(value, float):
+            any_value = {'doubleValue': value}
+        else:
+            any_value = {'stringValue': str(value)}
+        converted.append({'key': key, 'value': any_value})
+    return converted
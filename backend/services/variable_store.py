@@ -0,0 +1,438 @@
+# =====================================
+# Variable Store
+# =====================================
+#
+# Flow variables with a per-execution memory budget. When the DataFrames in
+# memory exceed the budget, the least recently used ones are spilled to
+# Arrow IPC files and memory-mapped back in on access. The engine spills
+# and reloads through enforce_budget() and load(), which do the file I/O
+# on a worker thread between nodes. Variables no downstream node will read
+# can be freed early. Checkpoints persist every variable to a directory and
+# describe them with JSON pointers.
+
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple
+
+from services.execution_log import describe_variable
+
+# Largest value stored inline in a checkpoint instead of in its own file
+CHECKPOINT_INLINE_BYTES = 64 * 1024
+
+# Runs blocking file I/O off the event loop: run(func, *args) -> func(*args)
+BlockingRunner = Callable[..., Awaitable[Any]]
+
+def is_dataframe(value: Any) -> bool:
+    """Check for a pandas DataFrame without importing pandas"""
+    return type(value).__name__ == 'DataFrame' and hasattr(value, 'memory_usage')
+
+def estimate_size(value: Any) -> int:
+    """Approximate in-memory size of a variable in bytes"""
+    if is_dataframe(value):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(value)
+
+def write_spill_file(value: Any, path: str) -> str:
+    """Write a DataFrame to an uncompressed Arrow IPC file (pickle if Arrow can't hold it)"""
+    try:
+        import pyarrow as pa
+        
+        table = pa.Table.from_pandas(value)
+        with pa.OSFile(path + '.arrow', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return path + '.arrow'
+    except Exception:
+        # pyarrow missing, or columns Arrow cannot represent
+        with open(path + '.pkl', 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path + '.pkl'
+
+def write_checkpoint_files(directory: str, writes: List[Tuple[Dict[str, Any], Optional[str], Any]]):
+    """Copy spill files and write values for checkpoint pointers, setting each pointer's final path"""
+    os.makedirs(directory, exist_ok=True)
+    for pointer, source, value in writes:
+        if source is not None:
+            shutil.copyfile(source, pointer['path'])
+        else:
+            pointer['path'] = write_spill_file(value, pointer['path'])
+
+def read_spill_file(path: str) -> Any:
+    """Load a spilled variable, memory-mapping Arrow files"""
+    if path.endswith('.arrow'):
+        import pyarrow as pa
+        
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+    
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def iterate_frame(frame: Any, chunk_size: int = 0) -> Iterator[Any]:
+    """Yield a DataFrame's rows as dicts, or chunk_size-row DataFrames"""
+    if chunk_size:
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+        return
+    
+    columns = [str(column) for column in frame.columns]
+    for row in frame.itertuples(index=False, name=None):
+        yield dict(zip(columns, row))
+
+def _is_inline_value(value: Any) -> bool:
+    """Small values that survive a JSON round trip unchanged"""
+    if is_dataframe(value) or estimate_size(value) > CHECKPOINT_INLINE_BYTES:
+        return False
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+class VariableStore(MutableMapping):
+    """Flow variables with a memory budget and spill-to-disk for DataFrames"""
+    
+    def __init__(self, memory_budget_bytes: int = 0, spill_dir: Optional[str] = None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_root = spill_dir or tempfile.gettempdir()
+        self._values: 'OrderedDict[str, Any]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._spilled: Dict[str, str] = {}
+        self._descriptors: Dict[str, Dict[str, Any]] = {}
+        self._spill_dir: Optional[str] = None
+        
+        # Variables whose spill file is being written by enforce_budget
+        self._spilling: Set[str] = set()
+        self.memory_bytes = 0
+        self.spill_count = 0
+        self.freed_count = 0
+        
+        # Checkpoint bookkeeping: assignments bump a variable's version, and
+        # variables unchanged since the last checkpoint keep their pointer
+        self._versions: Dict[str, int] = {}
+        self._version_counter = 0
+        self._checkpointed: Dict[str, Dict[str, Any]] = {}
+        self._external: Set[str] = set()
+        self.checkpoint_files = 0
+        
+        # Spill files a checkpoint is copying, and those of them dropped meanwhile
+        self._copying: Set[str] = set()
+        self._orphaned: Set[str] = set()
+    
+    # MutableMapping interface
+    
+    def __getitem__(self, name: str) -> Any:
+        if name in self._values:
+            self._values.move_to_end(name)
+            return self._values[name]
+        
+        if name in self._spilled:
+            # Blocking; the engine loads what a node reads with load() first
+            path = self._spilled[name]
+            return self._loaded(name, path, read_spill_file(path))
+        
+        raise KeyError(name)
+    
+    def __setitem__(self, name: str, value: Any):
+        self._discard(name)
+        self._version_counter += 1
+        self._versions[name] = self._version_counter
+        self._put(name, value)
+    
+    def __delitem__(self, name: str):
+        if name not in self:
+            raise KeyError(name)
+        self._discard(name)
+        self._descriptors.pop(name, None)
+    
+    def __contains__(self, name: object) -> bool:
+        return name in self._values or name in self._spilled
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._values) + list(self._spilled))
+    
+    def __len__(self) -> int:
+        return len(self._values) + len(self._spilled)
+    
+    # Budget management
+    
+    def _put(self, name: str, value: Any):
+        size = estimate_size(value)
+        self._values[name] = value
+        self._sizes[name] = size
+        self.memory_bytes += size
+        self._descriptors.pop(name, None)
+    
+    def _loaded(self, name: str, path: str, value: Any) -> Any:
+        """Move a variable read back from its spill file into memory"""
+        del self._spilled[name]
+        if name in self._external:
+            # Checkpoint files outlive the load
+            self._external.discard(name)
+        else:
+            self._remove_file(path)
+        self._put(name, value)
+        return value
+    
+    def _discard(self, name: str):
+        if name in self._values:
+            del self._values[name]
+            self.memory_bytes -= self._sizes.pop(name, 0)
+        path = self._spilled.pop(name, None)
+        if name in self._external:
+            self._external.discard(name)
+        elif path and os.path.exists(path):
+            self._remove_file(path)
+    
+    def _remove_file(self, path: str):
+        if path in self._copying:
+            self._orphaned.add(path)
+        else:
+            os.remove(path)
+    
+    def spill_candidates(self, keep: Iterable[str] = ()) -> List[str]:
+        """Least recently used DataFrames to spill for memory to fit the budget"""
+        if not self.memory_budget_bytes:
+            return []
+        
+        keep = set(keep)
+        excess = self.memory_bytes - self.memory_budget_bytes
+        excess -= sum(self._sizes.get(name, 0) for name in self._spilling)
+        candidates = []
+        for name, value in self._values.items():
+            if excess <= 0:
+                break
+            if name not in keep and name not in self._spilling and is_dataframe(value):
+                candidates.append(name)
+                excess -= self._sizes.get(name, 0)
+        return candidates
+    
+    async def enforce_budget(self, run: Optional[BlockingRunner] = None, keep: Iterable[str] = ()) -> int:
+        """Spill least recently used DataFrames until memory fits the budget; returns how many
+        
+        Files are written through run (a worker thread by default) while the
+        value stays readable in memory. A variable reassigned or freed
+        meanwhile keeps its new state and the file is dropped.
+        """
+        run = run or asyncio.to_thread
+        spilled = 0
+        for name in self.spill_candidates(keep):
+            if name in self._spilling or name not in self._values:
+                continue
+            value = self._values[name]
+            version = self._versions.get(name)
+            base = os.path.join(self.spill_directory(), f"{self.spill_count:06d}")
+            self.spill_count += 1
+            
+            self._spilling.add(name)
+            try:
+                path = await run(write_spill_file, value, base)
+            finally:
+                self._spilling.discard(name)
+            
+            if self._values.get(name) is not value or self._versions.get(name) != version:
+                os.remove(path)
+                continue
+            self._spilled_to(name, path)
+            spilled += 1
+        return spilled
+    
+    async def load(self, name: str, run: Optional[BlockingRunner] = None) -> Any:
+        """Value of a variable, reading a spill file back through run (a worker thread by default)"""
+        path = self._spilled.get(name)
+        if path is None:
+            return self[name]
+        
+        value = await (run or asyncio.to_thread)(read_spill_file, path)
+        if self._spilled.get(name) != path:
+            # Reassigned, freed or loaded by someone else while the file was read
+            return self[name]
+        return self._loaded(name, path, value)
+    
+    def spill_directory(self) -> str:
+        """This store's spill directory, created on first use"""
+        if self._spill_dir is None:
+            os.makedirs(self.spill_root, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix='vars_', dir=self.spill_root)
+        return self._spill_dir
+    
+    def spill(self, name: str) -> str:
+        """Move a DataFrame from memory to a spill file (blocking)"""
+        path = write_spill_file(self._values[name], os.path.join(self.spill_directory(), f"{self.spill_count:06d}"))
+        self.spill_count += 1
+        self._spilled_to(name, path)
+        return path
+    
+    def _spilled_to(self, name: str, path: str):
+        """Drop an in-memory value now held by a spill file"""
+        value = self._values.pop(name)
+        self._descriptors[name] = describe_variable(value)
+        self.memory_bytes -= self._sizes.pop(name, 0)
+        self._spilled[name] = path
+    
+    def free(self, name: str):
+        """Drop a variable nothing will read again, keeping its descriptor"""
+        if name in self._values:
+            self._descriptors[name] = describe_variable(self._values[name])
+        elif name not in self._spilled:
+            return
+        self._discard(name)
+        self.freed_count += 1
+    
+    def is_spilled(self, name: str) -> bool:
+        """Check whether a variable currently lives in a spill file"""
+        return name in self._spilled
+    
+    def spill_file(self, name: str) -> Optional[str]:
+        """Arrow file a spilled DataFrame lives in, for reading it without loading it"""
+        path = self._spilled.get(name)
+        return path if path is not None and path.endswith('.arrow') else None
+    
+    def put_spilled(self, name: str, path: str, descriptor: Dict[str, Any]):
+        """Assign a DataFrame already written to an Arrow file in the spill directory
+        
+        The file becomes the store's, as if the value had been spilled.
+        """
+        self._discard(name)
+        self._version_counter += 1
+        self._versions[name] = self._version_counter
+        self._spilled[name] = path
+        self._descriptors[name] = descriptor
+    
+    def iter_frame(self, name: str, chunk_size: int = 0, batch_rows: int = 4096) -> Iterator[Any]:
+        """Iterate a DataFrame variable by row or by chunk without loading it if spilled
+        
+        Spilled Arrow files are memory-mapped and converted batch_rows (or
+        chunk_size) rows at a time, so a loop over a large frame never holds
+        the whole thing in memory.
+        """
+        path = self._spilled.get(name)
+        if path is None or not path.endswith('.arrow'):
+            yield from iterate_frame(self[name], chunk_size)
+            return
+        
+        import pyarrow as pa
+        
+        step = chunk_size or batch_rows
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+            for start in range(0, table.num_rows, step):
+                frame = table.slice(start, step).to_pandas()
+                if chunk_size:
+                    yield frame
+                else:
+                    yield from iterate_frame(frame)
+    
+    def descriptors(self) -> Dict[str, Dict[str, Any]]:
+        """Descriptors of every variable, including spilled and freed ones, without loading them"""
+        descriptors = dict(self._descriptors)
+        for name, value in self._values.items():
+            descriptors[name] = describe_variable(value)
+        return descriptors
+    
+    def stats(self) -> Dict[str, Any]:
+        """Memory accounting for the execution summary"""
+        return {
+            'memory_bytes': self.memory_bytes,
+            'memory_budget_bytes': self.memory_budget_bytes,
+            'spilled': len(self._spilled),
+            'spill_count': self.spill_count,
+            'freed_count': self.freed_count
+        }
+    
+    # Checkpoints
+    
+    async def checkpoint(self, directory: str, run: Optional[BlockingRunner] = None) -> Dict[str, Dict[str, Any]]:
+        """Persist every variable under directory and return JSON pointers to them
+        
+        Small JSON values are stored inline; others are written as Arrow or
+        pickle files through run (a worker thread by default). Which values
+        go in is decided before the files are written, so the checkpoint is
+        the state at the call. Variables unchanged since the previous
+        checkpoint reuse their pointer, so only new values are written.
+        """
+        pointers = {}
+        writes = []
+        for name in list(self):
+            version = self._versions.get(name, 0)
+            previous = self._checkpointed.get(name)
+            if previous is not None and previous['version'] == version:
+                pointers[name] = previous
+                continue
+            
+            pointer = {'version': version}
+            if name in self._spilled:
+                path = self._spilled[name]
+                target = os.path.join(directory, f"{self.checkpoint_files:06d}{os.path.splitext(path)[1]}")
+                pointer.update(kind='file', path=target, descriptor=self._descriptors.get(name))
+                writes.append((pointer, path, None))
+                self.checkpoint_files += 1
+            else:
+                value = self._values[name]
+                if _is_inline_value(value):
+                    # Copy, so later in-place changes don't leak into the snapshot
+                    pointer.update(kind='inline', value=json.loads(json.dumps(value)))
+                else:
+                    target = os.path.join(directory, f"{self.checkpoint_files:06d}")
+                    pointer.update(kind='file', path=target, descriptor=describe_variable(value))
+                    writes.append((pointer, None, value))
+                    self.checkpoint_files += 1
+            pointers[name] = pointer
+        
+        # Spill files being copied outlive a reassignment until the copy is done
+        copying = {source for _, source, _ in writes if source}
+        self._copying |= copying
+        try:
+            await (run or asyncio.to_thread)(write_checkpoint_files, directory, writes)
+        finally:
+            self._copying -= copying
+            for path in copying & self._orphaned:
+                self._orphaned.discard(path)
+                os.remove(path)
+        
+        for name, pointer in pointers.items():
+            self._checkpointed[name] = pointer
+        
+        # Freed variables keep their descriptor for the execution summary
+        for name, descriptor in self._descriptors.items():
+            if name not in pointers:
+                pointers[name] = {'version': self._versions.get(name, 0), 'kind': 'freed', 'descriptor': descriptor}
+        
+        return pointers
+    
+    def prune_checkpoint_files(self, directory: str, pointers: Dict[str, Dict[str, Any]]):
+        """Remove files in directory no longer referenced by the latest pointers"""
+        referenced = {pointer.get('path') for pointer in pointers.values()}
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.path not in referenced:
+                os.remove(entry.path)
+    
+    def restore(self, pointers: Dict[str, Dict[str, Any]]):
+        """Load variables from checkpoint pointers; file-backed ones load on first access"""
+        for name, pointer in pointers.items():
+            kind = pointer['kind']
+            if kind == 'inline':
+                self._put(name, pointer['value'])
+            elif kind == 'file':
+                self._spilled[name] = pointer['path']
+                self._external.add(name)
+                self._descriptors[name] = pointer['descriptor']
+            else:
+                self._descriptors[name] = pointer['descriptor']
+            
+            self._versions[name] = pointer['version']
+            self._version_counter = max(self._version_counter, pointer['version'])
+            if kind != 'freed':
+                self._checkpointed[name] = pointer
+    
+    def close(self):
+        """Remove spill files"""
+        self._spilled.clear()
+        if self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
@@ -0,0 +1,62 @@
+# =====================================
+# Google Cloud Clients
+# =====================================
+#
+# Process-wide client singletons, created on first use instead of at import
+# time. Importing a client library and building its client costs hundreds
+# of milliseconds, which cold starts should only pay for the clients a
+# request actually needs. Creation times go into the startup report.
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.startup import record_client, timed_import
+
+_clients: Dict[Hashable, Any] = {}
+_lock = threading.Lock()
+
+def _get_client(key: Hashable, name: str, create: Callable[[], Any]) -> Any:
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            started = time.perf_counter()
+            client = create()
+            record_client(name, time.perf_counter() - started)
+            _clients[key] = client
+        return client
+
+def get_firestore_client(database: Optional[str] = None, project: Optional[str] = None):
+    """Firestore client for a project/database pair"""
+    def create():
+        firestore = timed_import('google.cloud.firestore')
+        kwargs = {key: value for key, value in (('project', project), ('database', database)) if value}
+        return firestore.Client(**kwargs)
+    
+    name = f"firestore:{database or '(default)'}"
+    return _get_client(('firestore', project, database), name, create)
+
+def get_storage_client():
+    """Cloud Storage client"""
+    return _get_client('storage', 'storage', lambda: timed_import('google.cloud.storage').Client())
+
+def get_publisher_client():
+    """Pub/Sub publisher client"""
+    return _get_client('pubsub', 'pubsub', lambda: timed_import('google.cloud.pubsub_v1').PublisherClient())
+
+def get_tasks_client():
+    """Cloud Tasks client"""
+    return _get_client('tasks', 'tasks', lambda: timed_import('google.cloud.tasks_v2').CloudTasksClient())
+
+def get_logging_client():
+    """Cloud Logging client"""
+    return _get_client('logging', 'logging', lambda: timed_import('google.cloud.logging').Client())
+
+def reset_clients():
+    """Forget every client (tests, or after fork)"""
+    with _lock:
+        _clients.clear()
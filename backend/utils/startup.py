@@ -0,0 +1,85 @@
+# =====================================
+# Startup Timing
+# =====================================
+#
+# Cold-start accounting for Cloud Function and Cloud Run instances: how long
+# each lazily imported module and each Google Cloud client took, and how
+# long the first request waited. Reported once per process.
+
+import functools
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Close to process start: this module is among the first the entry points import
+PROCESS_STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_imports: Dict[str, float] = {}
+_clients: Dict[str, float] = {}
+_first_request: Dict[str, Any] = {}
+_reported = False
+
+def record_import(module: str, seconds: float):
+    """Record how long importing a module took"""
+    with _lock:
+        _imports.setdefault(module, seconds)
+
+def record_client(name: str, seconds: float):
+    """Record how long creating a client took"""
+    with _lock:
+        _clients.setdefault(name, seconds)
+
+def timed_import(module: str):
+    """Import a module, recording the time if this is its first import"""
+    if module in sys.modules:
+        return sys.modules[module]
+    
+    started = time.perf_counter()
+    imported = importlib.import_module(module)
+    record_import(module, time.perf_counter() - started)
+    return imported
+
+def startup_report() -> Dict[str, Any]:
+    """Import and client creation times so far, slowest first, in milliseconds"""
+    def in_ms(timings: Dict[str, float]) -> Dict[str, float]:
+        ordered = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+        return {name: round(seconds * 1000, 1) for name, seconds in ordered}
+    
+    with _lock:
+        return {
+            'since_process_start_ms': round((time.perf_counter() - PROCESS_STARTED) * 1000, 1),
+            'imports_ms': in_ms(_imports),
+            'clients_ms': in_ms(_clients),
+            'first_request': dict(_first_request)
+        }
+
+def report_cold_start(func: Callable) -> Callable:
+    """Decorate an entry point to log the startup report after the first request"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _reported
+        if _reported:
+            return func(*args, **kwargs)
+        
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with _lock:
+                first = not _reported
+                _reported = True
+                if first:
+                    _first_request.update(
+                        entry_point=func.__name__,
+                        duration_ms=round((time.perf_counter() - started) * 1000, 1)
+                    )
+            if first:
+                logger.info("Cold start report: %s", startup_report())
+    
+    return wrapper